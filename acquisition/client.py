@@ -0,0 +1,135 @@
+# File: acquisition/client.py
+"""
+Subscriber side of the acquisition daemon's socket.
+
+    for timestamp, values in Subscription():
+        ...
+
+yields every published cycle as (Unix timestamp, {column: value}).
+latest() returns the last published cycle at once, and subscribe() runs a
+callback for every cycle in a background thread, reconnecting whenever the
+daemon restarts.
+"""
+
+import socket
+import threading
+import time
+
+from acquisition import protocol
+from acquisition.daemon import DEFAULT_SOCKET
+from hardware import DeviceUnavailable
+
+RECONNECT_DELAY = 5.0
+
+
+class Subscription:
+    """
+    One connection to the daemon. Iterating yields (timestamp, values) until
+    the daemon goes away; 'timeout' bounds the wait for each reading.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, replay=True, timeout=None):
+        self.socket_path = socket_path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(socket_path)
+            self._sock.sendall(protocol.encode_subscribe(replay))
+        except OSError as e:
+            self._sock.close()
+            raise DeviceUnavailable(f"sensors unavailable: no acquisition daemon at {socket_path} ({e})") from e
+        self._sock.settimeout(timeout)
+        self._decoder = protocol.FrameDecoder()
+        self._pending = []
+        self.columns = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            while self._pending:
+                frame_type, payload = self._pending.pop(0)
+                if frame_type == protocol.FRAME_SCHEMA:
+                    self.columns = protocol.decode_schema(payload)
+                elif frame_type == protocol.FRAME_READING:
+                    return protocol.decode_reading(payload, self.columns)
+            try:
+                data = self._sock.recv(4096)
+            except socket.timeout:
+                raise TimeoutError(f"No reading from {self.socket_path}") from None
+            except OSError:
+                data = b""
+            if not data:
+                self.close()
+                raise StopIteration
+            self._pending.extend(self._decoder.feed(data))
+
+    def close(self):
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def latest(socket_path=DEFAULT_SOCKET, timeout=2.0, max_age=None):
+    """
+    Return the daemon's last published (timestamp, values). Raises
+    DeviceUnavailable if the daemon is not running, has nothing yet or the
+    reading is older than 'max_age' seconds.
+    """
+    with Subscription(socket_path, replay=True, timeout=timeout) as sub:
+        try:
+            timestamp, values = next(sub)
+        except (StopIteration, TimeoutError):
+            raise DeviceUnavailable("sensors unavailable: acquisition daemon has no reading yet") from None
+    if max_age is not None and time.time() - timestamp > max_age:
+        raise DeviceUnavailable(f"sensors unavailable: last reading is {time.time() - timestamp:.0f}s old")
+    return timestamp, values
+
+
+def is_running(socket_path=DEFAULT_SOCKET):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def subscribe(callback, socket_path=DEFAULT_SOCKET, replay=False, name="sensor-subscriber"):
+    """
+    Call callback(timestamp, values) for every published cycle from a daemon
+    thread, reconnecting after RECONNECT_DELAY when the daemon is down or
+    its stream cannot be decoded. Returns the thread.
+    """
+    def run():
+        warned = False
+        while True:
+            try:
+                with Subscription(socket_path, replay=replay) as sub:
+                    warned = False
+                    for timestamp, values in sub:
+                        try:
+                            callback(timestamp, values)
+                        except Exception as e:
+                            print(f"{name}: callback failed: {e}")
+            except DeviceUnavailable as e:
+                if not warned:
+                    print(f"{name}: {e}; retrying every {RECONNECT_DELAY:.0f}s.")
+                    warned = True
+            except (protocol.ProtocolError, OSError) as e:
+                # A corrupt stream or a schema this client cannot follow: start over.
+                print(f"{name}: lost the stream from {socket_path}: {e}; reconnecting.")
+            time.sleep(RECONNECT_DELAY)
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,247 @@
+# File: acquisition/daemon.py
+"""
+Sensor acquisition daemon.
+
+The only process that talks to the I2C probes. It samples every probe on a
+fixed cadence and publishes each cycle to every subscriber on a Unix domain
+socket (see acquisition/protocol.py). The logger, the dosing loop and the
+web app subscribe instead of opening the devices themselves, so adding a
+consumer never adds bus traffic.
+
+Its I2C and sampling metrics are recorded in its own process, so it serves
+them itself at http://127.0.0.1:<metrics port>/metrics.
+
+Usage:
+    python -m acquisition.daemon [--socket PATH] [--interval SECONDS] [--metrics-port PORT]
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+
+from acquisition import protocol
+from data import schema
+from metrics import ACQUISITION_SAMPLES, ACQUISITION_SUBSCRIBERS, acquisition_metrics, serve
+
+DEFAULT_SOCKET = os.environ.get("HYDRO_SENSOR_SOCKET", "/tmp/hydro-sensors.sock")
+# The cadence start_continuous_logging() always logged at.
+DEFAULT_INTERVAL = 10
+DEFAULT_METRICS_PORT = int(os.environ.get("HYDRO_SENSOR_METRICS_PORT", "9101"))
+HANDSHAKE_TIMEOUT = 2.0
+SEND_TIMEOUT = 1.0
+
+
+class AcquisitionDaemon:
+    """
+    Samples the probes every 'interval' seconds and fans the readings out.
+
+    read_record:  callable returning one cycle as {column: value}; defaults
+                  to the shared SensorReader from the hardware registry.
+    metrics_port: port serving the acquisition metrics (0 = not served).
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, interval=DEFAULT_INTERVAL, read_record=None,
+                 metrics_port=DEFAULT_METRICS_PORT):
+        self.socket_path = socket_path
+        self.interval = interval
+        self.metrics_port = metrics_port
+        self._metrics_server = None
+        self._read_record = read_record or self._read_from_registry
+        self._columns = [c.name for c in schema.columns()]
+        self._schema_frame = protocol.encode_schema(self._columns)
+        self._last_frame = None
+        self._last_reading = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+
+    @staticmethod
+    def _read_from_registry():
+        from hardware import get_sensors
+        sensor = get_sensors()
+        with sensor.lock:
+            return sensor.read_record()
+
+    @property
+    def last_reading(self):
+        """
+        (timestamp, values) of the last published cycle, or None.
+        """
+        return self._last_reading
+
+    def start(self):
+        """
+        Bind the socket and start the accept and sampling threads.
+        """
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                # Left behind by a daemon that did not shut down cleanly.
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError(f"An acquisition daemon is already serving {self.socket_path}")
+            finally:
+                probe.close()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen(16)
+        for target in (self._accept_loop, self._sample_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.metrics_port:
+            try:
+                self._metrics_server = serve(acquisition_metrics, self.metrics_port)
+            except OSError as e:
+                print(f"Could not serve acquisition metrics on port {self.metrics_port}: {e}")
+        print(f"Sensor acquisition publishing on {self.socket_path} every {self.interval}s.")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            try:
+                self._server.close()
+            except OSError:
+                pass
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for conn in subscribers:
+            conn.close()
+        ACQUISITION_SUBSCRIBERS.set(0)
+        if self._metrics_server is not None:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+            self._metrics_server = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            print("Interrupted.")
+        finally:
+            self.stop()
+
+    def publish(self, values, timestamp=None):
+        """
+        Send one cycle to every subscriber and keep it for last-value replay.
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+        frame = protocol.encode_reading(timestamp, values, self._columns)
+        with self._lock:
+            self._last_frame = frame
+            self._last_reading = (timestamp, dict(values))
+            subscribers = list(self._subscribers)
+        for conn in subscribers:
+            self._send(conn, frame)
+
+    def _send(self, conn, frame):
+        try:
+            conn.sendall(frame)
+            return True
+        except OSError:
+            # Gone, or too slow to keep up: drop it, it can reconnect.
+            self._drop(conn)
+            return False
+
+    def _drop(self, conn):
+        with self._lock:
+            if conn in self._subscribers:
+                self._subscribers.remove(conn)
+            ACQUISITION_SUBSCRIBERS.set(len(self._subscribers))
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                if self._stop.is_set():
+                    return
+                continue
+            threading.Thread(target=self._handshake, args=(conn,), daemon=True).start()
+
+    def _handshake(self, conn):
+        replay = False
+        conn.settimeout(HANDSHAKE_TIMEOUT)
+        try:
+            decoder = protocol.FrameDecoder()
+            frames = []
+            while not frames:
+                data = conn.recv(64)
+                if not data:
+                    conn.close()
+                    return
+                frames = decoder.feed(data)
+            frame_type, payload = frames[0]
+            if frame_type == protocol.FRAME_SUBSCRIBE:
+                replay = protocol.decode_subscribe(payload)
+        except socket.timeout:
+            pass
+        except (OSError, protocol.ProtocolError):
+            conn.close()
+            return
+        conn.settimeout(SEND_TIMEOUT)
+        # Register under the lock together with the replayed frame so the
+        # subscriber cannot miss or duplicate a reading published meanwhile.
+        with self._lock:
+            try:
+                conn.sendall(self._schema_frame)
+                if replay and self._last_frame is not None:
+                    conn.sendall(self._last_frame)
+            except OSError:
+                conn.close()
+                return
+            self._subscribers.append(conn)
+            ACQUISITION_SUBSCRIBERS.set(len(self._subscribers))
+
+    def _sample_loop(self):
+        next_due = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                values = self._read_record()
+            except Exception as e:
+                values = None
+                print(f"Sensor acquisition failed: {e}")
+            if values:
+                ACQUISITION_SAMPLES.inc(status="ok")
+                self.publish(values)
+            else:
+                ACQUISITION_SAMPLES.inc(status="failed")
+            # Fixed cadence: the next cycle is due 'interval' after the last
+            # one was due, however long the read took.
+            next_due = max(next_due + self.interval, time.monotonic())
+            self._stop.wait(next_due - time.monotonic())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sample the sensors and publish readings on a Unix socket.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between cycles")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_METRICS_PORT,
+                        help="port for the acquisition metrics (0: do not serve them)")
+    args = parser.parse_args(argv)
+    try:
+        AcquisitionDaemon(args.socket, args.interval, metrics_port=args.metrics_port).serve_forever()
+    finally:
+        from hardware import registry
+        registry.close_all()
+
+
+if __name__ == "__main__":
+    main()
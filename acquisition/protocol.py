@@ -0,0 +1,140 @@
+# File: acquisition/protocol.py
+"""
+Framed binary protocol between the acquisition daemon and its subscribers.
+
+Every frame starts with an 8-byte header:
+
+    magic    2 bytes  b"HY"
+    version  1 byte   PROTOCOL_VERSION
+    type     1 byte   FRAME_SUBSCRIBE, FRAME_SCHEMA or FRAME_READING
+    length   4 bytes  payload length, unsigned big-endian
+
+followed by 'length' payload bytes:
+
+    SUBSCRIBE (client -> daemon)  1 byte of flags; FLAG_REPLAY asks for the
+                                  last published reading straight away.
+    SCHEMA    (daemon -> client)  UTF-8 column names separated by commas.
+                                  Sent first, and again if the columns change.
+    READING   (daemon -> client)  float64 Unix timestamp, uint64 bitmask of
+                                  the columns present, then one float32 per
+                                  present column in schema order.
+
+A full pH + EC cycle is 8 + 16 + 5 * 4 = 44 bytes.
+"""
+
+import struct
+
+MAGIC = b"HY"
+PROTOCOL_VERSION = 1
+
+FRAME_SUBSCRIBE = 1
+FRAME_SCHEMA = 2
+FRAME_READING = 3
+
+FLAG_REPLAY = 0x01
+
+MAX_COLUMNS = 64
+MAX_PAYLOAD = 64 * 1024
+
+_HEADER = struct.Struct("!2sBBI")
+_READING_HEAD = struct.Struct("!dQ")
+
+
+class ProtocolError(ValueError):
+    """
+    Raised for malformed frames or payloads.
+    """
+
+
+def encode_frame(frame_type, payload=b""):
+    return _HEADER.pack(MAGIC, PROTOCOL_VERSION, frame_type, len(payload)) + payload
+
+
+def encode_subscribe(replay=True):
+    return encode_frame(FRAME_SUBSCRIBE, bytes([FLAG_REPLAY if replay else 0]))
+
+
+def encode_schema(columns):
+    if len(columns) > MAX_COLUMNS:
+        raise ProtocolError(f"At most {MAX_COLUMNS} columns are supported")
+    return encode_frame(FRAME_SCHEMA, ",".join(columns).encode("utf-8"))
+
+
+def encode_reading(timestamp, values, columns):
+    """
+    Encode a reading. 'values' maps column names to numbers; names that are
+    missing or None are left out of the bitmask.
+    """
+    mask = 0
+    present = []
+    for i, name in enumerate(columns):
+        value = values.get(name)
+        if value is not None:
+            mask |= 1 << i
+            present.append(float(value))
+    payload = _READING_HEAD.pack(timestamp, mask) + struct.pack(f"!{len(present)}f", *present)
+    return encode_frame(FRAME_READING, payload)
+
+
+def decode_subscribe(payload):
+    """
+    Return True if the subscriber asked for last-value replay.
+    """
+    return bool(payload and payload[0] & FLAG_REPLAY)
+
+
+def decode_schema(payload):
+    try:
+        text = payload.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise ProtocolError(f"Schema is not UTF-8: {e}") from None
+    return text.split(",") if text else []
+
+
+def decode_reading(payload, columns):
+    """
+    Return (timestamp, {column: value}) for a READING payload.
+    """
+    if len(payload) < _READING_HEAD.size:
+        raise ProtocolError("Reading frame too short")
+    timestamp, mask = _READING_HEAD.unpack_from(payload)
+    indices = [i for i in range(len(columns)) if mask >> i & 1]
+    if mask >> len(columns):
+        raise ProtocolError("Reading has columns beyond the schema")
+    expected = _READING_HEAD.size + 4 * len(indices)
+    if len(payload) != expected:
+        raise ProtocolError(f"Reading frame is {len(payload)} bytes, expected {expected}")
+    values = struct.unpack_from(f"!{len(indices)}f", payload, _READING_HEAD.size)
+    # float32 keeps ~7 significant digits; drop the binary noise beyond them.
+    return timestamp, {columns[i]: float(f"{v:.7g}") for i, v in zip(indices, values)}
+
+
+class FrameDecoder:
+    """
+    Incremental decoder: feed() raw bytes as they arrive and get back the
+    complete (frame_type, payload) pairs.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        self._buffer += data
+        frames = []
+        offset = 0
+        while len(self._buffer) - offset >= _HEADER.size:
+            magic, version, frame_type, length = _HEADER.unpack_from(self._buffer, offset)
+            if magic != MAGIC:
+                raise ProtocolError(f"Bad magic {bytes(magic)!r}")
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"Unsupported protocol version {version}")
+            if length > MAX_PAYLOAD:
+                raise ProtocolError(f"Frame of {length} bytes exceeds the limit")
+            start = offset + _HEADER.size
+            if len(self._buffer) < start + length:
+                break
+            frames.append((frame_type, bytes(self._buffer[start:start + length])))
+            offset = start + length
+        # Drop everything consumed in one go rather than once per frame.
+        del self._buffer[:offset]
+        return frames
@@ -0,0 +1,67 @@
+# File: acquisition/test_client.py
+
+import json
+import socket
+import threading
+import time
+import urllib.request
+
+import acquisition.client
+from acquisition import protocol
+from acquisition.client import latest, subscribe
+from acquisition.daemon import AcquisitionDaemon
+from metrics import metrics
+
+COLUMNS = ["ph", "ec"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_daemon_publishes_and_serves_its_metrics(tmp_path):
+    port = free_port()
+    daemon = AcquisitionDaemon(str(tmp_path / "sock"), interval=0.05,
+                               read_record=lambda: {"ph": 6.0, "ec": 1.2}, metrics_port=port).start()
+    try:
+        timestamp, values = latest(str(tmp_path / "sock"), timeout=2.0)
+        assert values["ph"] == 6.0 and values["ec"] == 1.2
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics.json", timeout=2) as response:
+            exported = json.load(response)
+        assert exported["hydro_acquisition_samples_total"]["values"]['{status="ok"}'] >= 1
+    finally:
+        daemon.stop()
+    # The web app's registry has no daemon-owned series.
+    assert "hydro_acquisition_samples" not in metrics.render_prometheus()
+    assert "hydro_i2c" not in metrics.render_prometheus()
+
+
+def test_subscriber_reconnects_after_a_corrupt_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(acquisition.client, "RECONNECT_DELAY", 0.05)
+    path = str(tmp_path / "sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(4)
+
+    def serve():
+        conn, _ = server.accept()
+        conn.recv(64)
+        conn.sendall(b"XX" + protocol.encode_schema(COLUMNS)[2:])
+        conn.close()
+        conn, _ = server.accept()
+        conn.recv(64)
+        conn.sendall(protocol.encode_schema(COLUMNS) + protocol.encode_reading(1.0, {"ph": 6.1}, COLUMNS))
+        time.sleep(1)
+        conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    received = threading.Event()
+    readings = []
+    subscribe(lambda timestamp, values: (readings.append(values), received.set()), path, name="test")
+    try:
+        assert received.wait(3)
+        assert readings == [{"ph": 6.1}]
+    finally:
+        server.close()
@@ -0,0 +1,40 @@
+# File: acquisition/test_protocol.py
+
+import pytest
+
+from acquisition.protocol import (FRAME_READING, FRAME_SCHEMA, FRAME_SUBSCRIBE, FrameDecoder, ProtocolError,
+                                  decode_reading, decode_schema, decode_subscribe, encode_frame, encode_reading,
+                                  encode_schema, encode_subscribe)
+
+COLUMNS = ["ph", "ec", "temperature"]
+
+
+def test_round_trip():
+    stream = (encode_subscribe(replay=True) + encode_schema(COLUMNS)
+              + encode_reading(1739000000.5, {"ph": 6.02, "temperature": 21.4}, COLUMNS))
+    frames = FrameDecoder().feed(stream)
+    assert [t for t, _ in frames] == [FRAME_SUBSCRIBE, FRAME_SCHEMA, FRAME_READING]
+    assert decode_subscribe(frames[0][1]) is True
+    columns = decode_schema(frames[1][1])
+    assert columns == COLUMNS
+    assert decode_reading(frames[2][1], columns) == (1739000000.5, {"ph": 6.02, "temperature": 21.4})
+
+
+def test_decoder_handles_split_frames():
+    stream = encode_schema(COLUMNS) + encode_reading(1.0, {"ec": 1.2}, COLUMNS)
+    decoder = FrameDecoder()
+    frames = []
+    for i in range(len(stream)):
+        frames += decoder.feed(stream[i:i + 1])
+    assert [t for t, _ in frames] == [FRAME_SCHEMA, FRAME_READING]
+    assert decode_reading(frames[1][1], COLUMNS) == (1.0, {"ec": 1.2})
+
+
+def test_malformed_input():
+    with pytest.raises(ProtocolError):
+        FrameDecoder().feed(b"XX" + encode_frame(FRAME_SCHEMA)[2:])
+    payload = FrameDecoder().feed(encode_reading(1.0, {"ec": 1.2}, COLUMNS))[0][1]
+    with pytest.raises(ProtocolError):
+        decode_reading(payload[:-1], COLUMNS)
+    with pytest.raises(ProtocolError):
+        decode_reading(payload, ["ph"])
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Module: aggregator.py
+Fleet aggregator: receives telemetry batches from many controllers (see
+data/uploader.py) and serves a cross-node dashboard.
+
+Each node's records are appended to its own sensor_data.csv and
+hydro_events.csv under the fleet directory, in exactly the formats the
+controllers write, so the regular sensors and events blueprints serve them
+unchanged under /nodes/<node_id>/. Batches carry an id; a batch resent
+after a lost response is acknowledged without being stored twice.
+
+Usage:
+    python aggregator.py [--data-dir fleet] [--host 0.0.0.0] [--port 5100]
+
+Set HYDRO_FLEET_TOKEN to require "Authorization: Bearer <token>" on /ingest.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import Flask, abort, g, jsonify, render_template, request
+
+from blueprints.events import events_bp
+from blueprints.sensors import sensors_bp
+from data import schema
+from data.events import EVENT_FIELDS, OUTCOME_TRIGGERED, format_row, read_events
+from data.records import read_header, tail, value_range
+from render_cache import file_version
+
+FLEET_DIR = os.environ.get("HYDRO_FLEET_DIR", "fleet")
+FLEET_TOKEN = os.environ.get("HYDRO_FLEET_TOKEN", "")
+NODE_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+# Limit on a decompressed batch, against gzip bombs.
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+# Batch ids remembered per node for duplicate detection.
+SEEN_BATCHES = 2000
+# Blueprint routes that talk to a controller's own hardware.
+HARDWARE_ENDPOINTS = {"sensors.get_sensors_data"}
+
+
+class NodeStore:
+    """
+    One node's copies of sensor_data.csv and hydro_events.csv.
+    """
+
+    def __init__(self, root, node_id):
+        self.node_id = node_id
+        self.directory = os.path.join(root, node_id)
+        self.sensor_csv = os.path.join(self.directory, "sensor_data.csv")
+        self.events_csv = os.path.join(self.directory, "hydro_events.csv")
+        self.batches_log = os.path.join(self.directory, "batches.log")
+        self.lock = threading.Lock()
+        self._seen = None
+        self._summary = None
+
+    @property
+    def last_seen(self):
+        version = file_version(self.batches_log)
+        return version[0] / 1e9 if version else None
+
+    def _seen_batches(self):
+        if self._seen is None:
+            self._seen = OrderedDict()
+            if os.path.exists(self.batches_log):
+                with open(self.batches_log, "r", encoding="utf-8") as f:
+                    for line in f:
+                        self._remember(line.strip())
+        return self._seen
+
+    def _remember(self, batch_id):
+        self._seen[batch_id] = True
+        while len(self._seen) > SEEN_BATCHES:
+            self._seen.popitem(last=False)
+
+    def _sensor_columns(self):
+        if not os.path.exists(self.sensor_csv):
+            with open(self.sensor_csv, "w", encoding="utf-8") as f:
+                f.write(",".join(schema.header()) + "\n")
+        return read_header(self.sensor_csv)[1:]
+
+    def ingest(self, batch_id, records):
+        """
+        Append a batch of {"kind": "sensor" | "event", ...} records.
+        Returns (accepted, skipped, duplicate).
+        """
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            seen = self._seen_batches()
+            if batch_id and batch_id in seen:
+                return 0, 0, True
+            columns = self._sensor_columns()
+            sensor_lines, event_rows, skipped = [], [], 0
+            for record in records:
+                try:
+                    if record["kind"] == "sensor":
+                        timestamp = record["timestamp"]
+                        datetime.strptime(timestamp, schema.TIMESTAMP_FORMAT)
+                        values = {schema.ALIASES.get(k, k): float(v)
+                                  for k, v in record["values"].items() if v is not None}
+                        fields = [schema.format_value(name, values.get(name)) for name in columns]
+                        sensor_lines.append(timestamp + "," + ",".join(fields) + "\n")
+                    elif record["kind"] == "event":
+                        datetime.strptime(record["timestamp"], schema.TIMESTAMP_FORMAT)
+                        event_rows.append(format_row(record))
+                    else:
+                        skipped += 1
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    # Malformed records are skipped, like malformed CSV rows.
+                    skipped += 1
+            if sensor_lines:
+                with open(self.sensor_csv, "a", encoding="utf-8") as f:
+                    f.writelines(sensor_lines)
+            if event_rows:
+                new_file = not os.path.exists(self.events_csv)
+                with open(self.events_csv, "a", encoding="utf-8", newline="") as f:
+                    writer = csv.writer(f, lineterminator="\n")
+                    if new_file:
+                        writer.writerow(EVENT_FIELDS)
+                    writer.writerows(event_rows)
+            with open(self.batches_log, "a", encoding="utf-8") as f:
+                f.write((batch_id or "-") + "\n")
+            if batch_id:
+                self._remember(batch_id)
+            return len(sensor_lines) + len(event_rows), skipped, False
+
+    def summary(self):
+        """
+        Latest readings, today's pH range and the last day's alerts;
+        recomputed only when the node's files change.
+        """
+        versions = (file_version(self.sensor_csv), file_version(self.events_csv))
+        cached = self._summary
+        if cached is not None and cached[0] == versions:
+            return dict(cached[1], last_seen=self.last_seen)
+        today = datetime.now().date()
+        latest = {}
+        for column in ("ph", "ec"):
+            rows = tail(self.sensor_csv, column, 1)
+            latest[column] = rows[0] if rows else None
+        ph_min, ph_max = value_range(self.sensor_csv, "ph", today.isoformat(),
+                                     (today + timedelta(days=1)).isoformat())
+        since = (datetime.now() - timedelta(days=1)).strftime(schema.TIMESTAMP_FORMAT)
+        alerts = [e for e in read_events(self.events_csv)
+                  if e["event"] == "alert" and e["outcome"] == OUTCOME_TRIGGERED and e["timestamp"] >= since]
+        result = {
+            "node_id": self.node_id,
+            "ph": latest["ph"],
+            "ec": latest["ec"],
+            "ph_min_today": ph_min,
+            "ph_max_today": ph_max,
+            "alerts_24h": len(alerts),
+            "last_alert": alerts[-1]["details"] if alerts else None,
+        }
+        self._summary = (versions, result)
+        return dict(result, last_seen=self.last_seen)
+
+
+class Fleet:
+    """
+    The NodeStores under 'root', created as nodes first report.
+    """
+
+    def __init__(self, root=FLEET_DIR):
+        self.root = root
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    def node(self, node_id, create=False):
+        if not NODE_ID.match(node_id or ""):
+            return None
+        with self._lock:
+            store = self._nodes.get(node_id)
+            if store is None and (create or os.path.isdir(os.path.join(self.root, node_id))):
+                store = self._nodes[node_id] = NodeStore(self.root, node_id)
+            return store
+
+    def nodes(self):
+        try:
+            names = sorted(os.listdir(self.root))
+        except FileNotFoundError:
+            return []
+        return [store for store in (self.node(name) for name in names) if store is not None]
+
+
+fleet = Fleet()
+
+app = Flask(__name__)
+
+# The controller's own blueprints, once per node: /nodes/<node_id>/sensors/...
+app.register_blueprint(sensors_bp, url_prefix="/nodes/<node_id>/sensors")
+app.register_blueprint(events_bp, url_prefix="/nodes/<node_id>/events")
+
+@app.url_value_preprocessor
+def select_node(endpoint, values):
+    if not values or "node_id" not in values:
+        return
+    store = fleet.node(values.pop("node_id"))
+    if store is None:
+        abort(404)
+    g.node_id = store.node_id
+    g.sensor_csv = store.sensor_csv
+    g.events_csv = store.events_csv
+
+@app.url_defaults
+def add_node(endpoint, values):
+    if "node_id" not in values and app.url_map.is_endpoint_expecting(endpoint, "node_id"):
+        values["node_id"] = g.get("node_id")
+
+@app.before_request
+def no_hardware():
+    if request.endpoint in HARDWARE_ENDPOINTS:
+        return jsonify({"status": "error", "message": "Not available on the aggregator"}), 404
+
+@app.context_processor
+def fleet_context():
+    # Also switches base.html to the fleet navigation.
+    return {"fleet_node": g.get("node_id", "")}
+
+def read_batch(body, encoding):
+    """
+    Decode a (possibly gzip-compressed) NDJSON batch into a list of records,
+    skipping lines that are not JSON objects. Returns (records, skipped).
+    """
+    if encoding == "gzip":
+        decompressor = zlib.decompressobj(wbits=31)
+        body = decompressor.decompress(body, MAX_BATCH_BYTES)
+        if decompressor.unconsumed_tail:
+            raise OverflowError("batch too large")
+    elif len(body) > MAX_BATCH_BYTES:
+        raise OverflowError("batch too large")
+    records, skipped = [], 0
+    for line in body.decode("utf-8", errors="replace").splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            skipped += 1
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+        else:
+            skipped += 1
+    return records, skipped
+
+@app.route("/ingest", methods=["POST"])
+def ingest():
+    if FLEET_TOKEN and request.headers.get("Authorization") != f"Bearer {FLEET_TOKEN}":
+        return jsonify({"status": "error", "message": "Invalid token"}), 401
+    store = fleet.node(request.headers.get("X-Hydro-Node", ""), create=True)
+    if store is None:
+        return jsonify({"status": "error", "message": "Missing or invalid X-Hydro-Node"}), 400
+    try:
+        records, bad_lines = read_batch(request.get_data(), request.headers.get("Content-Encoding"))
+    except OverflowError as e:
+        return jsonify({"status": "error", "message": str(e)}), 413
+    except zlib.error as e:
+        return jsonify({"status": "error", "message": f"Bad gzip data: {e}"}), 400
+    accepted, skipped, duplicate = store.ingest(request.headers.get("X-Hydro-Batch"), records)
+    return jsonify({"status": "success", "accepted": accepted, "skipped": skipped + bad_lines,
+                    "duplicate": duplicate})
+
+@app.route("/")
+def index():
+    summaries = [store.summary() for store in fleet.nodes()]
+    return render_template("fleet.html", nodes=summaries, now=time.time())
+
+@app.route("/nodes.json")
+def nodes_json():
+    return jsonify({"status": "success", "nodes": [store.summary() for store in fleet.nodes()]})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect telemetry from hydroponic controllers.")
+    parser.add_argument("--data-dir", default=FLEET_DIR, help="directory for the per-node logs")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5100)
+    args = parser.parse_args(argv)
+    fleet.root = args.data_dir
+    os.makedirs(fleet.root, exist_ok=True)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
@@ -5,93 +5,42 @@ This app uses Flask with modular blueprints for sensors, pumps, camera, events,
 It also reads sensor and event data from CSV files.
 """
 
-from flask import Flask, render_template
+from flask import Flask, Response, g, jsonify, render_template, request
 from blueprints.sensors import sensors_bp
 from blueprints.pumps import pumps_bp
 from blueprints.camera import camera_bp
 from blueprints.events import events_bp
 from blueprints.config import config_bp
 from blueprints.automation import automation_bp
-import json
+from blueprints.profiling import profiling_bp
+from hardware import registry
+from config_store import config_store
+from render_cache import file_version, render_cache
+from data.events import pump_usage_by_day, recent_events
+from data.records import tail, value_range
+from metrics import CSV_SCAN_SECONDS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS, metrics, timed
+from profiling import profiler
+import time
 import os
-import csv
-from datetime import datetime
-
-# Global configuration file and default values
-CONFIG_FILE = "config.json"
-GLOBAL_CONFIG = {
-    "ph_min": 5.8,
-    "ph_max": 6.2,
-    "ec_min": 1.0,
-    "pump_calibration": {}
-}
-
-def load_config():
-    global GLOBAL_CONFIG
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            loaded = json.load(f)
-            GLOBAL_CONFIG.update(loaded)
-
-def save_config():
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(GLOBAL_CONFIG, f, indent=2)
+from datetime import datetime, timedelta
 
 # Data file paths
 DATA_DIR = "/home/nikita/hydroponic-controller/data"
 SENSOR_CSV = os.path.join(DATA_DIR, "sensor_data.csv")
 EVENTS_CSV = os.path.join(DATA_DIR, "hydro_events.csv")
 
-# Helper function: Aggregate sensor data for today (for pH readings)
+# Helper function: Aggregate sensor data for today (for pH readings).
+# Only today's rows are read: the reader seeks to the first one.
+@timed(CSV_SCAN_SECONDS, helper="aggregate_sensor_data_for_today")
 def aggregate_sensor_data_for_today():
-    today = datetime.now().strftime("%Y-%m-%d")
-    ph_values = []
-    if os.path.exists(SENSOR_CSV):
-        with open(SENSOR_CSV, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                ts_str, sensor_name, val_str = row[:3]
-                try:
-                    dt = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                except Exception:
-                    continue
-                if dt.strftime("%Y-%m-%d") == today and sensor_name == "pH":
-                    try:
-                        ph_val = float(val_str)
-                        ph_values.append(ph_val)
-                    except ValueError:
-                        continue
-    if ph_values:
-        return min(ph_values), max(ph_values)
-    else:
-        return None, None
-
-# Helper function: Aggregate event data from the hydro events CSV
+    today = datetime.now().date()
+    return value_range(SENSOR_CSV, "ph", today.isoformat(), (today + timedelta(days=1)).isoformat())
+
+# Helper function: Pump run seconds per day and pump, summed from the
+# structured event columns
+@timed(CSV_SCAN_SECONDS, helper="aggregate_event_data")
 def aggregate_event_data():
-    aggregator = {}
-    if os.path.exists(EVENTS_CSV):
-        with open(EVENTS_CSV, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                ts_str, pump, usage_str = row[:3]
-                try:
-                    usage = float(usage_str)
-                except ValueError:
-                    continue
-                try:
-                    dt = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                    date_str = dt.strftime("%Y-%m-%d")
-                except Exception:
-                    continue
-                aggregator.setdefault(date_str, {})
-                aggregator[date_str][pump] = aggregator[date_str].get(pump, 0) + usage
-    return aggregator
+    return pump_usage_by_day(EVENTS_CSV, "seconds")
 
 # Helper function: Get total pump usage for today
 def get_daily_pump_usage(aggregator):
@@ -101,35 +50,14 @@ def get_daily_pump_usage(aggregator):
     return 0
 
 # Helper function: Get the 5 most recent events
+@timed(CSV_SCAN_SECONDS, helper="get_recent_interesting_events")
 def get_recent_interesting_events():
-    events = []
-    if os.path.exists(EVENTS_CSV):
-        with open(EVENTS_CSV, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            events = list(reader)
-        events.sort(key=lambda x: datetime.strptime(x[0], "%Y-%m-%d %H:%M:%S") if x[0] else datetime.min, reverse=True)
-        return events[:5]
-    return events
+    return recent_events(EVENTS_CSV, 5)
 
 # Helper function: Get recent sensor readings for a given sensor (default count=20)
+@timed(CSV_SCAN_SECONDS, helper="get_recent_sensor_readings")
 def get_recent_sensor_readings(sensor_name, count=20):
-    readings = []
-    if os.path.exists(SENSOR_CSV):
-        with open(SENSOR_CSV, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                ts_str, name, val_str = row[:3]
-                if name == sensor_name:
-                    try:
-                        value = float(val_str)
-                        readings.append([ts_str, value])
-                    except ValueError:
-                        continue
-    return readings[-count:]
+    return tail(SENSOR_CSV, sensor_name, count)
 
 # Helper function: Build usage bar chart data from event aggregator
 def build_usage_bar_data(aggregator):
@@ -155,37 +83,98 @@ app.register_blueprint(camera_bp, url_prefix="/camera")
 app.register_blueprint(events_bp, url_prefix="/events")
 app.register_blueprint(config_bp, url_prefix="/config")
 app.register_blueprint(automation_bp, url_prefix="/automation")
+app.register_blueprint(profiling_bp, url_prefix="/profiling")
+
+# On-demand request profiling; see profiling.py. Idle unless armed.
+profiler.init_app(app)
+
+# Per-route request latency, labelled by endpoint to keep cardinality bounded.
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        endpoint = request.endpoint or "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    return response
 
 # Main dashboard route – it now reads data from the CSV files.
+# Each fragment is keyed on the version of the data it depends on, so only
+# fragments whose files changed are recomputed, and an unchanged dashboard
+# answers 304 without reading or rendering anything.
 @app.route("/")
 def index():
-    # Get today's pH min and max
-    daily_pH_min, daily_pH_max = aggregate_sensor_data_for_today()
-    # Aggregate hydro events
-    aggregator = aggregate_event_data()
-    # Calculate today's total pump usage
-    daily_pump_usage = get_daily_pump_usage(aggregator)
-    # Get the 5 most recent interesting events
-    interesting_events = get_recent_interesting_events()
-    # Get the last 20 sensor readings for pH and EC
-    ph_data = get_recent_sensor_readings("pH", 20)
-    ec_data = get_recent_sensor_readings("EC", 20)
-    # Build data for a usage bar chart and get list of all pumps
-    usage_bar_data, all_pumps = build_usage_bar_data(aggregator)
-    
-    return render_template("dashboard.html",
-                           config=GLOBAL_CONFIG,
-                           daily_pH_min=daily_pH_min,
-                           daily_pH_max=daily_pH_max,
-                           daily_pump_usage=daily_pump_usage,
-                           interesting_events=interesting_events,
-                           ph_data=ph_data,
-                           ec_data=ec_data,
-                           usage_bar_data=usage_bar_data,
-                           all_pumps=all_pumps)
+    sensors_version = file_version(SENSOR_CSV)
+    events_version = file_version(EVENTS_CSV)
+    config = config_store.get()
+    today = datetime.now().strftime("%Y-%m-%d")
+    versions = (sensors_version, events_version, config.version, today)
+
+    def render_page():
+        aggregator = {}
+
+        def event_aggregator():
+            # Shared by the stats and chart fragments, computed at most once.
+            if "data" not in aggregator:
+                aggregator["data"] = aggregate_event_data()
+            return aggregator["data"]
+
+        def render_stats():
+            # Get today's pH min and max
+            daily_pH_min, daily_pH_max = aggregate_sensor_data_for_today()
+            # Calculate today's total pump usage
+            daily_pump_usage = get_daily_pump_usage(event_aggregator())
+            return render_template("partials/dashboard_stats.html",
+                                   daily_pH_min=daily_pH_min,
+                                   daily_pH_max=daily_pH_max,
+                                   daily_pump_usage=daily_pump_usage)
+
+        def render_events():
+            # Get the 5 most recent interesting events
+            return render_template("partials/dashboard_events.html",
+                                   interesting_events=get_recent_interesting_events())
+
+        def render_charts():
+            # Build data for a usage bar chart and get list of all pumps
+            usage_bar_data, all_pumps = build_usage_bar_data(event_aggregator())
+            # Get the last 20 sensor readings for pH and EC
+            return render_template("partials/dashboard_charts.html",
+                                   ph_data=get_recent_sensor_readings("pH", 20),
+                                   ec_data=get_recent_sensor_readings("EC", 20),
+                                   usage_bar_data=usage_bar_data,
+                                   all_pumps=all_pumps)
+
+        return render_template("dashboard.html",
+                               config=config,
+                               stats_html=render_cache.fragment(
+                                   "dashboard_stats", (sensors_version, events_version, today), render_stats),
+                               events_html=render_cache.fragment(
+                                   "dashboard_events", events_version, render_events),
+                               charts_html=render_cache.fragment(
+                                   "dashboard_charts", (sensors_version, events_version), render_charts))
+
+    return render_cache.page("dashboard", versions, render_page)
+
+# Hardware health: devices are initialized lazily, so a subsystem reports
+# "not_initialized" until something first uses it.
+@app.route("/health")
+def health():
+    return jsonify({"status": "success", "hardware": registry.status()})
+
+# Metrics in Prometheus text format, and as JSON for the dashboard.
+@app.route("/metrics")
+def metrics_prometheus():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics.json")
+def metrics_json():
+    return jsonify(metrics.to_dict())
 
 if __name__ == "__main__":
-    load_config()
     app.run(host="0.0.0.0", port=5001, debug=True)
 
 
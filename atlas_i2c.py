@@ -2,14 +2,132 @@
 """
 AtlasI2C driver for Atlas Scientific sensors.
 This module provides an interface for communicating with sensors over I2C.
+
+The device files are blocking and have no timeout, so every transaction runs
+on a per-device worker thread and the caller waits at most
+'transaction_timeout' for it. A worker stuck on a wedged board is abandoned,
+and the device is re-opened and re-addressed on a fresh one (bus recovery).
+Repeated failures open a circuit breaker: the address is not touched again
+until its back-off expires, which doubles with every failed trial.
 """
 
 import io
+import queue
 import sys
 import fcntl
+import threading
 import time
 import copy
 
+from metrics import I2C_CIRCUIT_OPEN, I2C_RECOVERIES, I2C_TIMEOUTS
+
+I2C_SLAVE = 0x703
+
+
+class I2CError(IOError):
+    """
+    An I2C transaction failed or was not attempted.
+    """
+
+
+class I2CTimeout(I2CError):
+    """
+    An I2C transaction did not complete before its deadline.
+    """
+
+
+class CircuitOpen(I2CError):
+    """
+    The address is backing off after repeated failures.
+    """
+
+
+class CircuitBreaker:
+    """
+    Closed while transactions succeed. After 'failure_threshold' consecutive
+    failures it opens for 'reset_timeout' seconds; once that passes one
+    trial is let through, and a failed trial reopens it for twice as long,
+    up to 'max_reset_timeout'.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, max_reset_timeout=600.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.open_until = None
+        self._timeout = reset_timeout
+
+    @property
+    def is_open(self):
+        return self.open_until is not None
+
+    def allow(self):
+        with self._lock:
+            return self.open_until is None or self._clock() >= self.open_until
+
+    def retry_in(self):
+        with self._lock:
+            return max(0.0, self.open_until - self._clock()) if self.open_until is not None else 0.0
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.open_until = None
+            self._timeout = self.reset_timeout
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.open_until is not None:
+                # The trial after a back-off failed: back off for longer.
+                self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+            elif self.failures < self.failure_threshold:
+                return
+            self.open_until = self._clock() + self._timeout
+
+
+class _Worker:
+    """
+    Thread that runs one device's blocking file I/O so the caller can give
+    up on a call that hangs. Once retired it drains its queue, which
+    includes closing the files it used, if its current call ever returns.
+    """
+
+    def __init__(self, name):
+        self._jobs = queue.Queue()
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            func, args, done, result = job
+            try:
+                result.append((True, func(*args)))
+            except BaseException as e:
+                result.append((False, e))
+            done.set()
+
+    def call(self, func, args=(), timeout=None):
+        done, result = threading.Event(), []
+        self._jobs.put((func, args, done, result))
+        if not done.wait(timeout):
+            raise I2CTimeout(f"I2C call did not complete within {timeout:.2f}s")
+        ok, value = result[0]
+        if ok:
+            return value
+        raise value
+
+    def retire(self, cleanup=None):
+        if cleanup is not None:
+            self._jobs.put((cleanup, (), threading.Event(), []))
+        self._jobs.put(None)
+
+
 class AtlasI2C:
     LONG_TIMEOUT = 1.5
     SHORT_TIMEOUT = 0.3
@@ -17,17 +135,26 @@ class AtlasI2C:
     DEFAULT_ADDRESS = 98
     LONG_TIMEOUT_COMMANDS = ("R", "CAL")
     SLEEP_COMMANDS = ("SLEEP",)
+    # Seconds a single read, write or ioctl may take before it is abandoned.
+    TRANSACTION_TIMEOUT = 1.0
 
-    def __init__(self, address=None, moduletype="", name="", bus=None):
+    def __init__(self, address=None, moduletype="", name="", bus=None,
+                 transaction_timeout=TRANSACTION_TIMEOUT, breaker=None):
         self._address = address or self.DEFAULT_ADDRESS
         self.bus = bus or self.DEFAULT_BUS
         self._long_timeout = self.LONG_TIMEOUT
         self._short_timeout = self.SHORT_TIMEOUT
-        self.file_read = io.open("/dev/i2c-{}".format(self.bus), mode="rb", buffering=0)
-        self.file_write = io.open("/dev/i2c-{}".format(self.bus), mode="wb", buffering=0)
-        self.set_i2c_address(self._address)
         self._name = name
         self._module = moduletype
+        self.transaction_timeout = transaction_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.file_read = self.file_write = None
+        self._worker = _Worker(f"i2c-{self.bus}-{self._address:#04x}")
+        try:
+            self.file_read, self.file_write = self._worker.call(self._open_files, timeout=self.transaction_timeout)
+        except Exception:
+            self._worker.retire()
+            raise
 
     @property
     def long_timeout(self):
@@ -49,15 +176,89 @@ class AtlasI2C:
     def moduletype(self):
         return self._module
 
-    def set_i2c_address(self, addr):
-        I2C_SLAVE = 0x703
+    @property
+    def label(self):
+        return self._name or "{:#04x}".format(self._address)
+
+    def _open_files(self):
+        """
+        Open the bus device files and address them. Runs on the worker and
+        returns the files, so a call abandoned halfway changes nothing.
+        """
+        path = "/dev/i2c-{}".format(self.bus)
+        files = (io.open(path, mode="rb", buffering=0), io.open(path, mode="wb", buffering=0))
+        for f in files:
+            fcntl.ioctl(f, I2C_SLAVE, self._address)
+        return files
+
+    def _ioctl_address(self, addr):
         fcntl.ioctl(self.file_read, I2C_SLAVE, addr)
         fcntl.ioctl(self.file_write, I2C_SLAVE, addr)
         self._address = addr
 
-    def write(self, cmd):
+    def _read_bytes(self, num_of_bytes):
+        return self.file_read.read(num_of_bytes)
+
+    def _write_bytes(self, data):
+        return self.file_write.write(data)
+
+    def _close_files(self, files=None):
+        for f in files or (self.file_read, self.file_write):
+            if f is not None:
+                f.close()
+
+    def _transact(self, func, *args, timeout=None):
+        """
+        Run one blocking transaction on the worker within 'timeout' seconds
+        (default transaction_timeout). Failures count against the circuit
+        breaker and trigger bus recovery.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpen(f"{self.label}: backing off, retry in {self.breaker.retry_in():.0f}s")
+        timeout = self.transaction_timeout if timeout is None else min(timeout, self.transaction_timeout)
+        try:
+            if self.file_read is None:
+                # The last recovery did not get the device back open.
+                self.recover(timeout)
+            result = self._worker.call(func, args, timeout)
+        except OSError as e:
+            if isinstance(e, I2CTimeout):
+                I2C_TIMEOUTS.inc(device=self.label)
+            self.breaker.failure()
+            I2C_CIRCUIT_OPEN.set(int(self.breaker.is_open), device=self.label)
+            if self.file_read is not None:
+                # Otherwise recovery is what just failed; it is retried on
+                # the next transaction the breaker lets through.
+                try:
+                    self.recover(timeout)
+                except OSError as recovery_error:
+                    print(f"I2C recovery for {self.label} failed: {recovery_error}")
+            raise
+        if self.breaker.is_open:
+            I2C_CIRCUIT_OPEN.set(0, device=self.label)
+        self.breaker.success()
+        return result
+
+    def recover(self, timeout=None):
+        """
+        Bus recovery: abandon the current worker (it may be stuck in a call),
+        then re-open the device and re-set the address on a new one. The old
+        files are closed by the old worker if its call ever returns.
+        """
+        I2C_RECOVERIES.inc(device=self.label)
+        old_files = (self.file_read, self.file_write)
+        self._worker.retire(lambda: self._close_files(old_files))
+        self.file_read = self.file_write = None
+        self._worker = _Worker(f"i2c-{self.bus}-{self._address:#04x}")
+        self.file_read, self.file_write = self._worker.call(self._open_files,
+                                                            timeout=timeout or self.transaction_timeout)
+
+    def set_i2c_address(self, addr):
+        self._transact(self._ioctl_address, addr)
+
+    def write(self, cmd, timeout=None):
         cmd += "\00"
-        self.file_write.write(cmd.encode('latin-1'))
+        self._transact(self._write_bytes, cmd.encode('latin-1'), timeout=timeout)
 
     def handle_raspi_glitch(self, response):
         if self.app_using_python_two():
@@ -93,8 +294,11 @@ class AtlasI2C:
         else:
             return "{} {} {}".format(self._module, self.address, self._name)
 
-    def read(self, num_of_bytes=31):
-        raw_data = self.file_read.read(num_of_bytes)
+    def read(self, num_of_bytes=31, timeout=None):
+        raw_data = self._transact(self._read_bytes, num_of_bytes, timeout=timeout)
+        return self.parse_response(raw_data)
+
+    def parse_response(self, raw_data):
         response = self.get_response(raw_data=raw_data)
         is_valid, error_code = self.response_valid(response=response)
         if is_valid:
@@ -122,19 +326,21 @@ class AtlasI2C:
             return self.read()
 
     def close(self):
-        self.file_read.close()
-        self.file_write.close()
+        # Closed by the worker, after any call it is still stuck in.
+        self._worker.retire(self._close_files)
 
     def list_i2c_devices(self):
+        # Absent addresses are expected to fail here, so this bypasses the
+        # breaker and recovery.
         prev_addr = copy.deepcopy(self._address)
         i2c_devices = []
         for i in range(0, 128):
             try:
-                self.set_i2c_address(i)
-                self.read(1)
+                self._worker.call(self._ioctl_address, (i,), self.transaction_timeout)
+                self._worker.call(self._read_bytes, (1,), self.transaction_timeout)
                 i2c_devices.append(i)
             except IOError:
                 pass
-        self.set_i2c_address(prev_addr)
+        self._worker.call(self._ioctl_address, (prev_addr,), self.transaction_timeout)
         return i2c_devices
 
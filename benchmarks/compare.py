@@ -0,0 +1,78 @@
+# File: benchmarks/compare.py
+"""
+Compare two benchmark result files written by benchmarks/run.py.
+
+Usage:
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 10]
+
+Prints the median time of each benchmark in both runs and the relative
+change. Exits with status 1 if any benchmark got slower by more than
+--threshold percent, so it can gate a change in CI or a pre-push hook.
+Only compare results recorded on the same machine.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline, candidate, threshold=10.0):
+    """
+    Return (rows, regressions). Each row is
+    (name, baseline_median, candidate_median, percent_change or None).
+    """
+    base_results = baseline.get("results", {})
+    cand_results = candidate.get("results", {})
+    rows, regressions = [], []
+    for name in sorted(set(base_results) | set(cand_results)):
+        before = base_results.get(name, {})
+        after = cand_results.get(name, {})
+        b = before.get("median") if before.get("status") == "ok" else None
+        a = after.get("median") if after.get("status") == "ok" else None
+        change = (a - b) / b * 100 if a is not None and b else None
+        rows.append((name, b, a, change))
+        if change is not None and change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def _ms(value):
+    return f"{value * 1000:10.3f}" if value is not None else f"{'-':>10s}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    for label, report in (("baseline", baseline), ("candidate", candidate)):
+        meta = report.get("meta", {})
+        print(f"{label:10s} {meta.get('commit')} {meta.get('timestamp')} "
+              f"python {meta.get('python')} {meta.get('machine')}")
+    if baseline.get("meta", {}).get("machine") != candidate.get("meta", {}).get("machine"):
+        print("Warning: results come from different machines.")
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f"\n{'benchmark':40s} {'base ms':>10s} {'new ms':>10s} {'change':>8s}")
+    for name, b, a, change in rows:
+        pct = f"{change:+7.1f}%" if change is not None else f"{'-':>8s}"
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:40s} {_ms(b)} {_ms(a)} {pct}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,524 @@
+# File: benchmarks/run.py
+"""
+Benchmark suite for the controller's hot paths.
+
+Usage:
+    python -m benchmarks.run [--quick] [--only PREFIX] [--output results.json]
+
+Synthetic multi-year sensor and event CSVs are generated into a temporary
+directory (or --data-dir, reused if present), every benchmark is run a fixed
+number of times and the timings are written as JSON. Compare two result
+files from the same machine with benchmarks/compare.py.
+
+Benchmarks whose dependencies are not installed are reported as skipped.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks import synthetic
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARKS = []
+
+
+class Skip(Exception):
+    """
+    Raised by a benchmark whose dependencies are not available.
+    """
+
+
+def benchmark(name):
+    def decorator(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return decorator
+
+
+def measure(func, repeat=5, number=1, warmup=1):
+    """
+    Call func() 'number' times per round for 'repeat' rounds and return
+    per-call timing statistics in seconds.
+    """
+    for _ in range(warmup):
+        func()
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(rounds),
+        "median": statistics.median(rounds),
+        "mean": statistics.fmean(rounds),
+        "stdev": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+class Context:
+    def __init__(self, data_dir, quick):
+        self.data_dir = data_dir
+        self.quick = quick
+        self.repeat = 3 if quick else 7
+        self.sensor_csv = os.path.join(data_dir, "sensor_data.csv")
+        self.events_csv = os.path.join(data_dir, "hydro_events.csv")
+        self.sensor_rows = None
+        self.event_rows = None
+
+    def generate(self):
+        days = 90 if self.quick else 730
+        if not os.path.exists(self.sensor_csv):
+            print(f"Generating {days} days of sensor data...")
+            synthetic.generate_sensor_csv(self.sensor_csv, days=days)
+        if not os.path.exists(self.events_csv):
+            print(f"Generating {days} days of events...")
+            synthetic.generate_events_csv(self.events_csv, days=days)
+        with open(self.sensor_csv, "rb") as f:
+            self.sensor_rows = sum(1 for _ in f) - 1
+        with open(self.events_csv, "rb") as f:
+            self.event_rows = sum(1 for _ in f) - 1
+
+
+def _import(module):
+    try:
+        return __import__(module, fromlist=["*"])
+    except ImportError as e:
+        raise Skip(f"{module}: {e}")
+
+
+def _app(ctx):
+    app_module = _import("app")
+    app_module.SENSOR_CSV = ctx.sensor_csv
+    app_module.EVENTS_CSV = ctx.events_csv
+    return app_module
+
+
+def _per_row(result, rows):
+    result["rows"] = rows
+    result["rows_per_second"] = rows / result["median"] if result["median"] else None
+    return result
+
+
+# --- app.py dashboard helpers -------------------------------------------
+
+@benchmark("app.aggregate_sensor_data_for_today")
+def bench_app_sensor_today(ctx):
+    app_module = _app(ctx)
+    return _per_row(measure(app_module.aggregate_sensor_data_for_today, ctx.repeat), ctx.sensor_rows)
+
+
+@benchmark("app.aggregate_event_data")
+def bench_app_event_data(ctx):
+    app_module = _app(ctx)
+    return _per_row(measure(app_module.aggregate_event_data, ctx.repeat), ctx.event_rows)
+
+
+@benchmark("app.get_recent_interesting_events")
+def bench_app_recent_events(ctx):
+    app_module = _app(ctx)
+    return _per_row(measure(app_module.get_recent_interesting_events, ctx.repeat), ctx.event_rows)
+
+
+@benchmark("app.get_recent_sensor_readings")
+def bench_app_recent_readings(ctx):
+    app_module = _app(ctx)
+    return _per_row(measure(lambda: app_module.get_recent_sensor_readings("pH", 20), ctx.repeat),
+                    ctx.sensor_rows)
+
+
+@benchmark("app.index.cold")
+def bench_app_index_cold(ctx):
+    app_module = _app(ctx)
+    from render_cache import render_cache
+    client = app_module.app.test_client()
+
+    def run():
+        render_cache.clear()
+        assert client.get("/").status_code == 200
+    return measure(run, ctx.repeat)
+
+
+@benchmark("app.index.not_modified")
+def bench_app_index_304(ctx):
+    app_module = _app(ctx)
+    client = app_module.app.test_client()
+    etag = client.get("/").headers["ETag"]
+
+    def run():
+        assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+    return measure(run, ctx.repeat, number=50)
+
+
+# --- blueprints ---------------------------------------------------------
+
+@benchmark("events.aggregate_event_data")
+def bench_events_aggregate(ctx):
+    _app(ctx)
+    events = _import("blueprints.events")
+    events.EVENTS_CSV = ctx.events_csv
+    return _per_row(measure(events.aggregate_event_data, ctx.repeat), ctx.event_rows)
+
+
+@benchmark("events.summary.cold")
+def bench_events_summary(ctx):
+    app_module = _app(ctx)
+    events = _import("blueprints.events")
+    events.EVENTS_CSV = ctx.events_csv
+    from render_cache import render_cache
+    client = app_module.app.test_client()
+
+    def run():
+        render_cache.clear()
+        assert client.get("/events/summary").status_code == 200
+    return measure(run, ctx.repeat)
+
+
+@benchmark("events.dashboard")
+def bench_events_dashboard(ctx):
+    app_module = _app(ctx)
+    events = _import("blueprints.events")
+    events.EVENTS_CSV = ctx.events_csv
+    client = app_module.app.test_client()
+    return _per_row(measure(lambda: client.get("/events/"), ctx.repeat), ctx.event_rows)
+
+
+@benchmark("sensors.data_page")
+def bench_sensors_data_page(ctx):
+    app_module = _app(ctx)
+    sensors = _import("blueprints.sensors")
+    sensors.SENSOR_CSV = ctx.sensor_csv
+    client = app_module.app.test_client()
+    return _per_row(measure(lambda: client.get("/sensors/data"), max(2, ctx.repeat // 2)),
+                    ctx.sensor_rows)
+
+
+
+@benchmark("sensors.series_cold")
+def bench_series_cold(ctx):
+    downsample = _import("data.downsample")
+    # Ends at today's midnight: a closed range covering the whole file.
+    until = datetime.now().strftime("%Y-%m-%d")
+
+    def run():
+        downsample.cache.clear()
+        downsample.series(ctx.sensor_csv, "ph", until=until, points=1000)
+    return _per_row(measure(run, max(2, ctx.repeat // 2)), ctx.sensor_rows)
+
+
+@benchmark("sensors.series_cached")
+def bench_series_cached(ctx):
+    downsample = _import("data.downsample")
+    until = datetime.now().strftime("%Y-%m-%d")
+    downsample.series(ctx.sensor_csv, "ph", until=until, points=1000)
+    return measure(lambda: downsample.series(ctx.sensor_csv, "ph", until=until, points=1000), ctx.repeat)
+
+
+# --- data/logger.py -------------------------------------------------------
+
+@benchmark("logger.log_record")
+def bench_logger_record(ctx):
+    logger = _import("data.logger")
+    logger.SENSOR_LOG = os.path.join(ctx.data_dir, "bench_sensor_log.csv")
+    logger.init_sensor_log()
+    record = {"ph": 6.01, "ec": 1.21, "tds": 605.0, "sal": 0.66, "sg": 1.0}
+    n = 2000
+    result = measure(lambda: [logger.log_record(record) for _ in range(n)], ctx.repeat)
+    result["writes_per_second"] = n / result["median"]
+    return result
+
+
+@benchmark("logger.log_event")
+def bench_logger_event(ctx):
+    logger = _import("data.logger")
+    logger.EVENT_LOG = os.path.join(ctx.data_dir, "bench_event_log.csv")
+    logger.init_event_log()
+    n = 2000
+    result = measure(lambda: [logger.log_event("ph_control", "pH=5.6 => Dosed pH_up 1s")
+                              for _ in range(n)], ctx.repeat)
+    result["writes_per_second"] = n / result["median"]
+    return result
+
+
+@benchmark("records.project_ph")
+def bench_records_project(ctx):
+    records = _import("data.records")
+    result = measure(lambda: sum(1 for _ in records.read_records(ctx.sensor_csv, ["ph"])), ctx.repeat)
+    return _per_row(result, ctx.sensor_rows)
+
+
+@benchmark("migrate.long_sensor_log")
+def bench_migrate_sensors(ctx):
+    migrate = _import("data.migrate")
+    source = os.path.join(ctx.data_dir, "long_sensor_data.csv")
+    target = os.path.join(ctx.data_dir, "long_sensor_data_work.csv")
+    rows = synthetic.generate_sensor_csv(source, days=30 if ctx.quick else 180, long=True)
+
+    def run():
+        shutil.copyfile(source, target)
+        migrate.migrate_sensor_log(target, backup=False)
+    return _per_row(measure(run, max(2, ctx.repeat // 2)), rows)
+
+
+@benchmark("migrate.legacy_events")
+def bench_migrate(ctx):
+    migrate = _import("data.migrate")
+    source = os.path.join(ctx.data_dir, "legacy_events.csv")
+    target = os.path.join(ctx.data_dir, "legacy_events_work.csv")
+    synthetic.generate_events_csv(source, days=90 if ctx.quick else 730, legacy=True)
+
+    def run():
+        shutil.copyfile(source, target)
+        migrate.migrate_event_log(target, {"pH_up": {"test_run_seconds": 10, "measured_ml": 15}},
+                                  backup=False)
+    return _per_row(measure(run, max(2, ctx.repeat // 2)), ctx.event_rows)
+
+
+@benchmark("bulk_import.sensors")
+def bench_bulk_import(ctx):
+    bulk_import = _import("data.bulk_import")
+    target = os.path.join(ctx.data_dir, "imported_sensor_data.csv")
+
+    def run():
+        if os.path.exists(target):
+            os.remove(target)
+        bulk_import.bulk_import("sensors", [ctx.sensor_csv], target, chunk_bytes=4 * 1024 * 1024,
+                                progress=False)
+    return _per_row(measure(run, max(2, ctx.repeat // 2)), ctx.sensor_rows)
+
+
+# --- atlas_i2c.py -----------------------------------------------------------
+
+@benchmark("atlas_i2c.read_parse")
+def bench_atlas_parse(ctx):
+    atlas = _import("atlas_i2c")
+    # Bypass __init__ so no /dev/i2c device is opened (nor its worker
+    # thread started); only the response parsing is measured.
+    dev = atlas.AtlasI2C.__new__(atlas.AtlasI2C)
+    dev._address, dev._name, dev._module = 0x64, "EC_sensor", "EC"
+    payload = b"\x01" + b"1413,764,0.69,1.000" + b"\x00" * 11
+    n = 1000
+
+    def run():
+        for _ in range(n):
+            dev.parse_response(payload)
+    result = measure(run, ctx.repeat)
+    result["reads_per_second"] = n / result["median"]
+    return result
+
+
+# --- acquisition/protocol.py ---------------------------------------------------
+
+@benchmark("acquisition.protocol_roundtrip")
+def bench_protocol(ctx):
+    protocol = _import("acquisition.protocol")
+    schema = _import("data.schema")
+    columns = [c.name for c in schema.columns()]
+    values = {"ph": 6.01, "ec": 1.21, "tds": 605.0, "sal": 0.66, "sg": 1.0}
+    n = 5000
+
+    def run():
+        decoder = protocol.FrameDecoder()
+        stream = b"".join(protocol.encode_reading(1700000000.0 + i, values, columns) for i in range(n))
+        for _, payload in decoder.feed(stream):
+            protocol.decode_reading(payload, columns)
+    result = measure(run, ctx.repeat)
+    result["readings_per_second"] = n / result["median"]
+    return result
+
+
+# --- MJPEG streaming ----------------------------------------------------------
+
+class FakeFrameSource:
+    """
+    Stands in for PlantCamera: returns a pre-rendered frame instantly.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def capture_single_frame(self):
+        return self.frame
+
+
+def _frame():
+    try:
+        return synthetic.synthetic_frame()
+    except ImportError as e:
+        raise Skip(str(e))
+
+
+@benchmark("mjpeg.encode.full")
+def bench_mjpeg_encode_full(ctx):
+    streaming = _import("camera.streaming")
+    image = _frame()
+    counter = iter(range(10 ** 9))
+    result = measure(lambda: streaming.Frame(next(counter), image).jpeg(), ctx.repeat, number=5)
+    result["fps"] = 1 / result["median"]
+    return result
+
+
+@benchmark("mjpeg.encode.640w_q60")
+def bench_mjpeg_encode_small(ctx):
+    streaming = _import("camera.streaming")
+    image = _frame()
+    counter = iter(range(10 ** 9))
+    result = measure(lambda: streaming.Frame(next(counter), image).jpeg(640, 60), ctx.repeat, number=5)
+    result["fps"] = 1 / result["median"]
+    return result
+
+
+@benchmark("mjpeg.broadcast.4_clients")
+def bench_mjpeg_broadcast(ctx):
+    streaming = _import("camera.streaming")
+    broadcaster = streaming.FrameBroadcaster(FakeFrameSource(_frame()))
+    frames = 20
+
+    def run():
+        clients = [streaming.StreamClient(fps=0, threshold=0, max_width=w)
+                   for w in (None, None, 640, 640)]
+        gens = [streaming.stream_frames(broadcaster, c) for c in clients]
+        for _ in range(frames):
+            for g in gens:
+                next(g)
+        for g in gens:
+            g.close()
+    result = measure(run, max(2, ctx.repeat // 2), warmup=0)
+    result["frames_per_second_per_client"] = frames / result["median"]
+    return result
+
+
+# --- controller/dosing_logic.py -------------------------------------------------
+
+@benchmark("dosing.simple_control")
+def bench_dosing(ctx):
+    dosing = _import("controller.dosing_logic")
+    logger = _import("data.logger")
+    logger.EVENT_LOG = os.path.join(ctx.data_dir, "bench_dosing_events.csv")
+    logger.init_event_log()
+    # No hardware: the pump call becomes a no-op for the benchmark.
+    controller = dosing.DosingController(pump=lambda pump_name, seconds: None)
+    values = [5.5, 6.0, 6.5, 5.9, 6.1] * 200
+
+    def run():
+        for v in values:
+            controller.ph_control(v)
+            controller.ec_control(v / 5)
+    result = measure(run, ctx.repeat)
+    result["decisions_per_second"] = 2 * len(values) / result["median"]
+    return result
+
+
+@benchmark("dosing.replay")
+def bench_replay(ctx):
+    replay = _import("controller.replay")
+    spans = []
+
+    def run():
+        spans.append(replay.replay(ctx.sensor_csv, 5.8, 6.2, 1.0)[2])
+    result = _per_row(measure(run, max(2, ctx.repeat // 2)), ctx.sensor_rows)
+    result["speedup"] = spans[-1] / result["median"]
+    return result
+
+
+
+@benchmark("rules.process")
+def bench_rules(ctx):
+    rules = _import("controller.rules")
+    config_store = _import("config_store")
+    specs = config_store.DEFAULT_CONFIG["automation"]["triggers"]["sensor_rules"]
+    # A day of one-minute cycles; the cost per reading must not grow with the window.
+    readings = [(i * 60.0, {"ph": 6.0 + 0.4 * ((i % 97) / 97 - 0.5), "ec": 1.0}) for i in range(1440)]
+
+    def run():
+        engine = rules.RulesEngine(rules.build_rules(specs), lambda *alert: None)
+        for timestamp, values in readings:
+            engine.process(timestamp, values)
+    result = measure(run, ctx.repeat)
+    result["readings_per_second"] = len(readings) / result["median"]
+    return result
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(ctx, only=None):
+    results = {}
+    for name, func in BENCHMARKS:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        try:
+            result = func(ctx)
+            result["status"] = "ok"
+            print(f"{name:40s} median {result['median'] * 1000:10.3f} ms")
+        except Skip as e:
+            result = {"status": "skipped", "reason": str(e)}
+            print(f"{name:40s} skipped ({e})")
+        except Exception as e:
+            result = {"status": "error", "reason": f"{e.__class__.__name__}: {e}"}
+            print(f"{name:40s} error ({result['reason']})")
+        results[name] = result
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="90 days of data and fewer rounds")
+    parser.add_argument("--only", action="append", help="run benchmarks whose name starts with this")
+    parser.add_argument("--data-dir", help="directory for synthetic data (kept between runs)")
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, REPO_ROOT)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.abspath(args.data_dir or tmp)
+        os.makedirs(data_dir, exist_ok=True)
+        ctx = Context(data_dir, args.quick)
+        ctx.generate()
+        # Keep the app's relative data/ paths inside the scratch directory.
+        cwd = os.getcwd()
+        os.chdir(data_dir)
+        try:
+            results = run(ctx, args.only)
+        finally:
+            os.chdir(cwd)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "quick": args.quick,
+            "sensor_rows": ctx.sensor_rows,
+            "event_rows": ctx.event_rows,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
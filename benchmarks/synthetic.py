@@ -0,0 +1,116 @@
+# File: benchmarks/synthetic.py
+"""
+Synthetic data generators for the benchmark suite.
+
+The generated files use the same layout the logger writes, so the app
+helpers and blueprints can be pointed at them unchanged. Output is fully
+determined by the seed, which keeps benchmark runs comparable.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+DEFAULT_START = datetime(2023, 1, 1)
+
+
+def generate_sensor_csv(path, days=730, interval_seconds=300, start=DEFAULT_START, seed=1, long=False):
+    """
+    Write 'days' of sampling cycles every 'interval_seconds' seconds to
+    'path': wide rows with pH and the four EC circuit values, or with
+    'long' the pre-wide layout (timestamp,sensor_name,value) holding pH and
+    EC only. Returns the number of rows.
+    """
+    rng = random.Random(seed)
+    step = timedelta(seconds=interval_seconds)
+    samples = int(days * 86400 / interval_seconds)
+    ph, ec = 6.0, 1.2
+    rows = 0
+    ts = start
+    with open(path, "w", encoding="utf-8") as f:
+        if long:
+            f.write("timestamp,sensor_name,value\n")
+        else:
+            f.write("timestamp,ph,ec,tds,sal,sg,do,do_sat,orp,temperature\n")
+        for i in range(samples):
+            # Slow drift with a daily cycle, occasional corrections and spikes.
+            ph += rng.gauss(0, 0.01) + 0.002 * math.sin(i * 2 * math.pi * interval_seconds / 86400)
+            ec -= abs(rng.gauss(0, 0.002))
+            if ph < 5.7 or ph > 6.3:
+                ph = 6.0 + rng.gauss(0, 0.05)
+            if ec < 0.9:
+                ec = 1.3
+            value = ph + (rng.choice((-0.6, 0.6)) if rng.random() < 0.0005 else 0.0)
+            ts_str = ts.strftime("%Y-%m-%d %H:%M:%S")
+            if long:
+                f.write(f"{ts_str},pH,{value:.2f}\n")
+                ts_ec = (ts + timedelta(seconds=2)).strftime("%Y-%m-%d %H:%M:%S")
+                f.write(f"{ts_ec},EC,{ec:.2f}\n")
+                rows += 2
+            else:
+                f.write(f"{ts_str},{value:.2f},{ec:.2f},{ec * 500:.1f},{ec * 0.55:.2f},1.000,,,,\n")
+                rows += 1
+            ts += step
+    return rows
+
+
+def generate_events_csv(path, days=730, doses_per_day=12, start=DEFAULT_START, seed=2, legacy=False):
+    """
+    Write dosing events to 'path' in the structured event schema, or in the
+    pre-migration free-text format (timestamp,event,details) if 'legacy'.
+    Returns the number of rows.
+    """
+    rng = random.Random(seed)
+    rows = 0
+    with open(path, "w", encoding="utf-8") as f:
+        if legacy:
+            f.write("timestamp,event,details\n")
+        else:
+            f.write("timestamp,event,pump,seconds,ml,reading,outcome,details\n")
+        for day in range(days):
+            base = start + timedelta(days=day)
+            offsets = sorted(rng.randrange(86400) for _ in range(doses_per_day))
+            for offset in offsets:
+                ts_str = (base + timedelta(seconds=offset)).strftime("%Y-%m-%d %H:%M:%S")
+                kind = rng.random()
+                if kind < 0.4:
+                    event, label, pump, seconds = "ph_control", "pH", "pH_up", 1
+                    reading = round(rng.uniform(5.4, 5.79), 2)
+                elif kind < 0.8:
+                    event, label, pump, seconds = "ph_control", "pH", "pH_down", 1
+                    reading = round(rng.uniform(6.21, 6.6), 2)
+                elif kind < 0.97:
+                    event, label, pump, seconds = "ec_control", "EC", "nutrientA", 2
+                    reading = round(rng.uniform(0.6, 0.99), 2)
+                else:
+                    event, label, pump, seconds = "ph_control", "pH", "pH_up", None
+                    reading = round(rng.uniform(5.0, 5.5), 2)
+                if legacy:
+                    if seconds is None:
+                        f.write(f"{ts_str},{event},{label}={reading} => limit reached for {pump}\n")
+                    else:
+                        f.write(f"{ts_str},{event},{label}={reading} => Dosed {pump} {seconds}s\n")
+                elif seconds is None:
+                    f.write(f"{ts_str},{event},{pump},,,{reading},limit_reached,\n")
+                else:
+                    f.write(f"{ts_str},{event},{pump},{seconds},{seconds * 1.5},{reading},dosed,\n")
+                rows += 1
+    return rows
+
+
+def synthetic_frame(width=1920, height=1080, seed=3):
+    """
+    Return a deterministic BGR test frame with plant-like green blobs.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), np.uint8)
+    frame[:] = (60, 80, 100)
+    yy, xx = np.mgrid[0:height, 0:width]
+    for _ in range(12):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        r = rng.integers(height // 12, height // 4)
+        mask = (xx - cx) ** 2 + (yy - cy) ** 2 < r * r
+        frame[mask] = (40, 160 + rng.integers(0, 60), 50)
+    noise = rng.integers(0, 12, frame.shape, dtype=np.uint8)
+    return frame + noise
@@ -0,0 +1,73 @@
+# File: benchmarks/test_benchmarks.py
+
+import pytest
+
+from benchmarks import synthetic
+from benchmarks.compare import compare
+from benchmarks.run import measure
+from data.events import read_events
+from data.records import read_records
+
+
+def test_sensor_csv_is_readable_and_deterministic(tmp_path):
+    path = tmp_path / "sensor_data.csv"
+    rows = synthetic.generate_sensor_csv(str(path), days=1)
+    assert rows == 288
+    records = list(read_records(str(path), ["pH", "EC"]))
+    assert len(records) == rows
+    assert records[0][0] == "2023-01-01 00:00:00"
+    assert all(5 < ph < 7 and ec > 0 for _, ph, ec in records)
+    again = tmp_path / "again.csv"
+    synthetic.generate_sensor_csv(str(again), days=1)
+    assert again.read_bytes() == path.read_bytes()
+
+
+def test_long_sensor_csv(tmp_path):
+    path = tmp_path / "sensor_data.csv"
+    assert synthetic.generate_sensor_csv(str(path), days=1, long=True) == 576
+    lines = path.read_text().splitlines()
+    assert lines[0] == "timestamp,sensor_name,value"
+    assert lines[1].split(",")[1] == "pH" and lines[2].split(",")[1] == "EC"
+
+
+def test_events_csv_in_both_formats(tmp_path):
+    for legacy in (False, True):
+        path = tmp_path / f"events_{legacy}.csv"
+        rows = synthetic.generate_events_csv(str(path), days=2, legacy=legacy)
+        assert rows == 24
+        events = list(read_events(str(path)))
+        assert len(events) == rows
+        assert {e["pump"] for e in events} <= {"pH_up", "pH_down", "nutrientA"}
+        assert [e["timestamp"] for e in events] == sorted(e["timestamp"] for e in events)
+
+
+def test_synthetic_frame():
+    frame = synthetic.synthetic_frame(64, 48)
+    assert frame.shape == (48, 64, 3)
+    assert (frame == synthetic.synthetic_frame(64, 48)).all()
+
+
+def test_measure_reports_per_call_stats():
+    calls = []
+    result = measure(lambda: calls.append(1), repeat=3, number=4, warmup=2)
+    assert len(calls) == 2 + 3 * 4
+    assert result["repeat"] == 3 and result["number"] == 4
+    assert 0 <= result["min"] <= result["median"]
+    assert result["stdev"] >= 0
+
+
+def report(**medians):
+    return {"results": {name: {"status": "ok", "median": value} if value else {"status": "skipped"}
+                        for name, value in medians.items()}}
+
+
+def test_compare_flags_regressions_over_threshold():
+    baseline = report(read=1.0, chart=2.0, camera=None)
+    candidate = report(read=1.05, chart=2.5, camera=0.1, new=1.0)
+    rows, regressions = compare(baseline, candidate, threshold=10.0)
+    by_name = {name: (b, a, change) for name, b, a, change in rows}
+    assert regressions == ["chart"]
+    assert by_name["read"][2] == pytest.approx(5.0)
+    assert by_name["camera"] == (None, 0.1, None)
+    assert by_name["new"] == (None, 1.0, None)
+    assert compare(baseline, candidate, threshold=30.0)[1] == []
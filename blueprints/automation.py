@@ -1,46 +1,169 @@
 #!/usr/bin/env python3
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from blueprints.camera import catalogs
+from hardware import DeviceUnavailable, SNAPSHOT_DIR, get_camera, registry
+from config_store import config_store
+import json
+import os
 
 automation_bp = Blueprint('automation', __name__, template_folder='../templates')
 
-# In-memory sample automation configuration (stub)
-automation_config = {
-    "schedules": {
-        "image_capture": {
-            "enabled": True,
-            "interval_minutes": 60
-        },
-        "timelapse": {
-            "enabled": False,
-            "interval_minutes": 60,
-            "duration_hours": 24
-        }
-    },
-    "triggers": {
-        "plant_health": {
-            "enabled": True,
-            "thresholds": {
-                "min_green_percent": 30
-            }
-        }
-    }
-}
+# The automation configuration lives in the shared config store under
+# "automation"; see config_store.DEFAULT_CONFIG for the defaults.
+def automation_config():
+    return config_store.get()["automation"]
+
+SCHEDULED_TIMELAPSE = "scheduled"
+
+def plant_health_trigger():
+    return automation_config().get("triggers", {}).get("plant_health", {})
+
+def analyze_new_snapshot(filepath, image):
+    """
+    Snapshot listener: analyse each newly written frame and log an event for
+    every plant_health threshold it violates.
+    """
+    from camera.analysis import analyze_snapshot, evaluate_plant_health
+    from data.logger import log_event
+    trigger = plant_health_trigger()
+    result = analyze_snapshot(filepath, roi=trigger.get("roi"), image=image)
+    for message in evaluate_plant_health(result, trigger):
+        log_event("plant_health", f"{result['source']}: {message}")
+
+registry.on_ready("camera", lambda camera: camera.snapshots.add_listener(analyze_new_snapshot))
+
+@automation_bp.errorhandler(DeviceUnavailable)
+def camera_unavailable(e):
+    return jsonify({"status": "error", "message": str(e)}), 503
+
+def newest_snapshot():
+    entries, total = catalogs["snapshots"].page(1, 1)
+    if not entries:
+        return None
+    return os.path.join(SNAPSHOT_DIR, entries[0]["path"])
+
+def apply_timelapse_schedule():
+    """
+    Start or stop the scheduled timelapse session so it matches
+    the "schedules" -> "timelapse" automation settings.
+    """
+    settings = automation_config().get("schedules", {}).get("timelapse", {})
+    if settings.get("enabled"):
+        camera = get_camera()
+    else:
+        # Nothing can be running if the camera was never initialized.
+        camera = registry.peek("camera")
+        if camera is None:
+            return
+    session = camera.timelapse.get(SCHEDULED_TIMELAPSE)
+    running = session is not None and session.running
+    if settings.get("enabled") and not running:
+        camera.timelapse.start(SCHEDULED_TIMELAPSE,
+                               settings.get("interval_minutes", 60),
+                               settings.get("duration_hours", 24))
+    elif not settings.get("enabled") and running:
+        camera.timelapse.stop(SCHEDULED_TIMELAPSE)
+
+def on_config_change(snapshot, changed_keys):
+    """
+    Config store subscriber: re-apply schedules whenever the automation
+    settings change, including external edits of config.json.
+    """
+    if "automation" not in changed_keys:
+        return
+    try:
+        apply_timelapse_schedule()
+    except DeviceUnavailable as e:
+        print(f"Timelapse schedule not applied: {e}")
+
+config_store.subscribe(on_config_change)
+registry.on_ready("camera", lambda camera: on_config_change(config_store.get(), {"automation"}))
 
 @automation_bp.route('/config', methods=['POST'])
 def update_automation_config():
-    global automation_config
     data = request.get_json()
     if data:
-        # Update the automation configuration with provided data
-        automation_config.update(data)
-        return jsonify({"status": "success", "config": automation_config})
+        # Merge the provided settings into the stored automation configuration
+        snapshot = config_store.update({"automation": data})
+        return jsonify({"status": "success", "config": snapshot["automation"]})
     return jsonify({"status": "error", "message": "No data provided"}), 400
 
 @automation_bp.route('/status', methods=['GET'])
 def automation_status():
-    # Return the automation config and a dummy plant health status.
-    plant_health = {
-        "green_percentage": 75.0,
-        "timestamp": "2025-02-08T12:00:00"
-    }
-    return jsonify({"status": "success", "config": automation_config, "plant_health": plant_health})
+    # Return the automation config and the latest plant health analysis.
+    from camera.analysis import analyze_snapshot, evaluate_plant_health, latest_result
+    trigger = plant_health_trigger()
+    result = latest_result()
+    if result is None:
+        filepath = newest_snapshot()
+        if filepath:
+            result = analyze_snapshot(filepath, roi=trigger.get("roi"))
+    plant_health = None
+    if result is not None:
+        plant_health = dict(result)
+        plant_health["alerts"] = evaluate_plant_health(result, trigger)
+    return jsonify({"status": "success", "config": automation_config(), "plant_health": plant_health})
+
+@automation_bp.route('/timelapse', methods=['GET'])
+def timelapse_status():
+    return jsonify({"status": "success", "sessions": get_camera().timelapse.status()})
+
+@automation_bp.route('/timelapse/start', methods=['POST'])
+def timelapse_start():
+    data = request.get_json(silent=True) or request.form
+    try:
+        session = get_camera().timelapse.start(data.get("name", "default"),
+                                         float(data.get("interval_minutes", 60)),
+                                         float(data.get("duration_hours", 24)) or None)
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", "session": session.to_dict()})
+
+@automation_bp.route('/timelapse/<name>/stop', methods=['POST'])
+def timelapse_stop(name):
+    try:
+        session = get_camera().timelapse.stop(name)
+    except KeyError:
+        return jsonify({"status": "error", "message": f"No timelapse named '{name}'"}), 404
+    return jsonify({"status": "success", "session": session.to_dict()})
+
+ALERT_POLL_SECONDS = 1.0
+ALERT_KEEPALIVE_SECONDS = 15
+
+def is_alert(event):
+    return event["event"] in ("alert", "plant_health")
+
+@automation_bp.route('/alerts', methods=['GET'])
+def recent_alerts():
+    # Alerts come from the event log, written by the rules engine in main.py.
+    from blueprints.events import EVENTS_CSV
+    from data.events import read_events
+    count = request.args.get("count", 20, type=int)
+    alerts = [e for e in read_events(EVENTS_CSV) if is_alert(e)][-count:]
+    alerts.reverse()
+    return jsonify({"status": "success", "alerts": alerts})
+
+@automation_bp.route('/alerts/stream', methods=['GET'])
+def alert_stream():
+    """
+    Server-sent events: one "data:" message per alert appended to the event
+    log, with a comment line as keepalive while nothing happens.
+    """
+    from blueprints.events import EVENTS_CSV
+    from data.events import follow_events
+
+    def generate():
+        idle = 0.0
+        yield "retry: 5000\n\n"
+        for event in follow_events(EVENTS_CSV, poll=ALERT_POLL_SECONDS):
+            if event is None:
+                idle += ALERT_POLL_SECONDS
+                if idle >= ALERT_KEEPALIVE_SECONDS:
+                    idle = 0.0
+                    # Also how a closed connection is noticed and the generator ends.
+                    yield ": keepalive\n\n"
+            elif is_alert(event):
+                yield f"data: {json.dumps(event)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
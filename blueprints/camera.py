@@ -1,25 +1,64 @@
 #!/usr/bin/env python3
-from flask import Blueprint, Response, jsonify, request, render_template, send_from_directory
-from camera.camera import PlantCamera, generate_frames
+import os
+import queue
+from flask import Blueprint, Response, abort, jsonify, request, render_template, send_file, send_from_directory, url_for
+from camera.catalog import SnapshotCatalog, THUMB_SIZES
+from hardware import DeviceUnavailable, SNAPSHOT_DIR, TIMELAPSE_DIR, get_camera
 
 camera_bp = Blueprint('camera', __name__, template_folder='../templates')
 
-# Initialize and start the camera (could also be done in app.py)
-camera = PlantCamera(snapshot_dir='data/snapshots')
-camera.start()
+# The camera itself is initialized lazily on first use through the hardware
+# registry; the gallery routes below only need the folders.
+catalogs = {
+    "snapshots": SnapshotCatalog(SNAPSHOT_DIR),
+    "timelapse": SnapshotCatalog(TIMELAPSE_DIR),
+}
+
+# Saved images never change in place, so clients may cache them for a day
+# and revalidate with ETag / Last-Modified after that.
+IMAGE_MAX_AGE = 86400
+
+@camera_bp.errorhandler(DeviceUnavailable)
+def camera_unavailable(e):
+    return jsonify({"status": "error", "message": str(e)}), 503
 
 @camera_bp.route("/video_feed")
 def video_feed():
-    return Response(generate_frames(camera),
+    from camera.camera import generate_frames
+    from camera.streaming import StreamClient
+    camera = get_camera()
+    # Optional query parameters: fps, width, quality, threshold, keepalive
+    client = StreamClient.from_args(request.args, remote_addr=request.remote_addr)
+    return Response(generate_frames(camera, client),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@camera_bp.route("/stream_stats")
+def stream_stats():
+    camera = get_camera()
+    return jsonify({"status": "success",
+                    "frame_seq": camera.broadcaster.seq,
+                    "clients": camera.broadcaster.client_stats()})
+
 @camera_bp.route("/take_snapshot", methods=["POST"])
 def take_snapshot():
+    # The snapshot is captured and written in the background; poll
+    # /camera/snapshot_jobs/<job_id> for completion and the final file path
+    # (a near-duplicate frame may be stored as an earlier snapshot).
+    camera = get_camera()
     try:
-        filepath = camera.take_snapshot()
-        return jsonify({"status": "success", "filepath": filepath})
+        job = camera.take_snapshot_async()
+    except queue.Full:
+        return jsonify({"status": "error", "message": "Snapshot queue is full, try again shortly."}), 503
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)})
+    return jsonify({"status": "queued", "job_id": job.id}), 202
+
+@camera_bp.route("/snapshot_jobs/<job_id>")
+def snapshot_job_status(job_id):
+    job = get_camera().snapshots.get_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify({"status": "success", "job": job.to_dict()})
 
 @camera_bp.route("/")
 def camera_dashboard():
@@ -27,4 +66,50 @@ def camera_dashboard():
 
 @camera_bp.route("/snapshots/<path:filename>")
 def serve_snapshot(filename):
-    return send_from_directory('data/snapshots', filename)
+    # conditional=True adds ETag/Last-Modified validators and Range support.
+    return send_from_directory(os.path.abspath(SNAPSHOT_DIR), filename,
+                               conditional=True, max_age=IMAGE_MAX_AGE)
+
+@camera_bp.route("/timelapse/<path:filename>")
+def serve_timelapse(filename):
+    return send_from_directory(os.path.abspath(TIMELAPSE_DIR), filename,
+                               conditional=True, max_age=IMAGE_MAX_AGE)
+
+@camera_bp.route("/thumbnails/<source>/<int:size>/<path:filename>")
+def serve_thumbnail(source, size, filename):
+    catalog = catalogs.get(source)
+    if catalog is None or size not in THUMB_SIZES or ".." in filename.split("/"):
+        abort(404)
+    thumb = catalog.thumbnail_path(filename, size)
+    if thumb is None:
+        abort(404)
+    return send_file(os.path.abspath(thumb), mimetype="image/jpeg",
+                     conditional=True, max_age=IMAGE_MAX_AGE)
+
+@camera_bp.route("/gallery")
+def gallery():
+    """
+    Paginated JSON listing of the snapshot catalog, newest first.
+    Query parameters: source (snapshots|timelapse), page, per_page.
+    """
+    source = request.args.get("source", "snapshots")
+    catalog = catalogs.get(source)
+    if catalog is None:
+        return jsonify({"status": "error", "message": f"Unknown source '{source}'"}), 400
+    page = request.args.get("page", 1, type=int)
+    per_page = max(1, min(request.args.get("per_page", 50, type=int), 200))
+    entries, total = catalog.page(page, per_page)
+    serve_endpoint = "camera.serve_snapshot" if source == "snapshots" else "camera.serve_timelapse"
+    items = []
+    for entry in entries:
+        item = dict(entry)
+        item["url"] = url_for(serve_endpoint, filename=entry["path"])
+        item["thumbnails"] = {size: url_for("camera.serve_thumbnail", source=source,
+                                            size=size, filename=entry["path"])
+                              for size in THUMB_SIZES}
+        items.append(item)
+    response = jsonify({"status": "success", "source": source, "page": page,
+                        "per_page": per_page, "total": total,
+                        "pages": (total + per_page - 1) // per_page, "items": items})
+    response.set_etag(f"{source}-{catalog.version}-{page}-{per_page}")
+    return response.make_conditional(request)
@@ -1,50 +1,39 @@
 #!/usr/bin/env python3
-from flask import Blueprint, render_template, request
-import csv
+from flask import Blueprint, g, render_template, request
 import os
-from datetime import datetime
+from data.events import pump_usage_by_day, read_events
+from render_cache import file_version, render_cache
+from metrics import CSV_SCAN_SECONDS, timed
 
 events_bp = Blueprint('events', __name__, template_folder='../templates')
 
+EVENTS_CSV = os.path.join(os.path.dirname(__file__), "../data/hydro_events.csv")
+
+def events_csv():
+    # The fleet aggregator (aggregator.py) serves one node's copy per request.
+    return g.get("events_csv") or EVENTS_CSV
+
+@timed(CSV_SCAN_SECONDS, helper="events.aggregate_event_data")
 def aggregate_event_data():
-    events_csv = os.path.join(os.path.dirname(__file__), "../data/hydro_events.csv")
-    aggregator = {}
-    if os.path.exists(events_csv):
-        with open(events_csv, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                ts_str, event, details = row[:3]
-                try:
-                    dt = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                    date_str = dt.strftime("%Y-%m-%d")
-                except Exception:
-                    continue
-                aggregator.setdefault(date_str, {})
-                aggregator[date_str][event] = aggregator[date_str].get(event, 0) + 1
-    return aggregator
+    return pump_usage_by_day(events_csv(), "seconds")
 
 @events_bp.route("/")
 def events_dashboard():
-    events_csv = os.path.join(os.path.dirname(__file__), "../data/hydro_events.csv")
-    event_data = []
-    if os.path.exists(events_csv):
-        with open(events_csv, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            event_data = list(reader)
-    return render_template("events.html", event_data=event_data)
+    return render_template("events.html", event_data=list(read_events(events_csv())))
 
 @events_bp.route("/summary")
 def events_summary():
-    aggregated_data = []
-    all_pumps = []
-    aggregator = aggregate_event_data()
-    for date, usage in aggregator.items():
-        aggregated_data.append({"date": date, "usage": usage})
-        for pump in usage.keys():
-            if pump not in all_pumps:
-                all_pumps.append(pump)
-    return render_template("events_summary.html", aggregated_data=aggregated_data, all_pumps=all_pumps)
+    # Cached on the events file version; unchanged data answers 304.
+    def render_page():
+        aggregated_data = []
+        all_pumps = []
+        aggregator = aggregate_event_data()
+        ml_by_day = pump_usage_by_day(events_csv(), "ml")
+        for date, usage in sorted(aggregator.items()):
+            aggregated_data.append({"date": date, "usage": usage, "ml": ml_by_day.get(date, {})})
+            for pump in usage.keys():
+                if pump not in all_pumps:
+                    all_pumps.append(pump)
+        return render_template("events_summary.html", aggregated_data=aggregated_data, all_pumps=all_pumps)
+    path = events_csv()
+    return render_cache.page("events_summary", (path, file_version(path)), render_page)
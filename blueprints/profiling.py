@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+from flask import Blueprint, Response, abort, jsonify, request
+from profiling import collapsed, profiler
+
+profiling_bp = Blueprint('profiling', __name__)
+
+# Loops run by main.py, in another process; armed through its SIGUSR1 handler.
+CONTROLLER_LOOPS = ("control", "sensor_logger")
+
+@profiling_bp.route("/")
+def list_profiles():
+    return jsonify({"status": "success", "armed": profiler.status(), "profiles": profiler.store.list()})
+
+@profiling_bp.route("/requests", methods=["POST"])
+def arm_requests():
+    """
+    Profile a sampled fraction of requests: fraction (0-1, 0 disarms) and
+    optionally limit, the number of requests to profile.
+    """
+    data = request.get_json(silent=True) or request.form
+    try:
+        limit = data.get("limit")
+        profiler.arm_requests(float(data.get("fraction", 0)), int(limit) if limit else None)
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Invalid fraction or limit: {e}"}), 400
+    return jsonify({"status": "success", "armed": profiler.status()})
+
+@profiling_bp.route("/loops", methods=["POST"])
+def arm_loops():
+    """
+    Profile the next 'iterations' iterations of 'loop', in this process or
+    in the controller (main.py).
+    """
+    data = request.get_json(silent=True) or request.form
+    name = data.get("loop", "")
+    try:
+        iterations = max(1, int(data.get("iterations", 5)))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "iterations must be an integer"}), 400
+    if name in profiler.loops:
+        profiler.arm_loop(name, iterations)
+        return jsonify({"status": "success", "armed": profiler.status()})
+    if name not in CONTROLLER_LOOPS:
+        return jsonify({"status": "error", "message": f"Unknown loop '{name}'"}), 400
+    if not profiler.signal_controller({name: iterations}):
+        return jsonify({"status": "error", "message": "The controller (main.py) is not running."}), 503
+    return jsonify({"status": "success", "signalled": name, "iterations": iterations})
+
+@profiling_bp.route("/<profile_id>")
+def get_profile(profile_id):
+    data = profiler.store.load(profile_id)
+    if data is None:
+        abort(404)
+    return jsonify({"status": "success", "profile": data})
+
+@profiling_bp.route("/<profile_id>.collapsed")
+def download_profile(profile_id):
+    # Collapsed stacks for flamegraph.pl or speedscope.
+    data = profiler.store.load(profile_id)
+    if data is None:
+        abort(404)
+    return Response(collapsed(data["stacks"]), mimetype="text/plain",
+                    headers={"Content-Disposition": f"attachment; filename={profile_id}.collapsed"})
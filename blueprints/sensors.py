@@ -1,22 +1,53 @@
 #!/usr/bin/env python3
-from flask import Blueprint, jsonify, render_template
-from sensors import SensorReader
-import csv
+from flask import Blueprint, g, jsonify, render_template, request
+from acquisition.client import latest
+from hardware import DeviceUnavailable
+from data import schema
+from data.downsample import DEFAULT_POINTS, series
+from data.records import read_records
 import os
+from datetime import datetime
 
 sensors_bp = Blueprint('sensors', __name__, template_folder='../templates')
 
+SENSOR_CSV = os.path.join(os.path.dirname(__file__), "../data/sensor_data.csv")
+
+def sensor_csv():
+    # The fleet aggregator (aggregator.py) serves one node's copy per request.
+    return g.get("sensor_csv") or SENSOR_CSV
+
+# Readings come from the acquisition daemon, which owns the I2C bus, so a
+# request never adds bus traffic.
+MAX_READING_AGE = 180
+
 @sensors_bp.route("/")
 def get_sensors_data():
-    sensor = SensorReader()
-    ph = sensor.read_ph_sensor()
-    ec = sensor.read_ec_sensor()
-    sensor.close()
+    try:
+        timestamp, values = latest(max_age=MAX_READING_AGE)
+    except DeviceUnavailable as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    ec = {name: values[name] for name in schema.probe_columns("ec") if name in values}
     return jsonify({
-        "ph": ph,
-        "ec": ec
+        "timestamp": datetime.fromtimestamp(timestamp).strftime(schema.TIMESTAMP_FORMAT),
+        "ph": values.get("ph"),
+        "ec": ec or None,
+        "values": values
     })
 
+@sensors_bp.route("/series")
+def get_series():
+    # Chart data for one column over [since, until), downsampled with LTTB to
+    # at most 'points' points; closed ranges are served from a cache.
+    name = request.args.get("column", "ph")
+    try:
+        column = schema.column(name).name
+    except KeyError:
+        return jsonify({"status": "error", "message": f"Unknown column '{name}'"}), 400
+    points = max(3, min(request.args.get("points", DEFAULT_POINTS, type=int), 10000))
+    result = series(sensor_csv(), column, request.args.get("since") or None,
+                    request.args.get("until") or None, points)
+    return jsonify({"status": "success", **result})
+
 # Override the endpoint name so that url_for('sensors.dashboard') works.
 @sensors_bp.route("/dashboard", endpoint="dashboard")
 def sensors_dashboard():
@@ -24,11 +55,10 @@ def sensors_dashboard():
 
 @sensors_bp.route("/data")
 def sensor_data_page():
-    sensor_data = []
-    sensor_csv = os.path.join(os.path.dirname(__file__), "../data/sensor_data.csv")
-    if os.path.exists(sensor_csv):
-        with open(sensor_csv, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            sensor_data = list(reader)
-    return render_template("sensors_data.html", sensor_data=sensor_data)
+    # One row per sampling cycle; columns no probe has reported yet are hidden.
+    names = [c.name for c in schema.columns()]
+    records = list(read_records(sensor_csv(), names))
+    present = [i for i in range(len(names)) if any(r[i + 1] is not None for r in records)]
+    columns = [schema.columns()[i] for i in present]
+    sensor_data = [[r[0]] + [r[i + 1] for i in present] for r in records]
+    return render_template("sensors_data.html", columns=columns, sensor_data=sensor_data)
@@ -0,0 +1,133 @@
+# File: camera/analysis.py
+"""
+Plant-health analytics for captured frames.
+
+Frames are downscaled to a small working copy and segmented in HSV space with
+vectorized cv2/NumPy operations into healthy green foliage and yellow/brown
+(stressed or dead) foliage within a configurable region of interest. Results
+for snapshot files are cached by path, size and mtime so a file is never
+analysed twice, and every new result is appended to the plant health log.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from data.logger import log_plant_health
+
+WORK_WIDTH = 320
+
+# OpenCV hue runs 0-179. Each range is (lower HSV, upper HSV).
+GREEN_RANGE = ((35, 40, 40), (85, 255, 255))
+YELLOW_BROWN_RANGE = ((8, 40, 30), (34, 255, 255))
+
+CACHE_SIZE = 512
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_latest = None
+
+
+def _crop_roi(image, roi):
+    """
+    Crop 'image' to 'roi' given as fractions (x, y, width, height) in 0-1.
+    """
+    if not roi:
+        return image
+    height, width = image.shape[:2]
+    x, y, w, h = roi
+    x0, y0 = int(x * width), int(y * height)
+    x1, y1 = int((x + w) * width), int((y + h) * height)
+    cropped = image[y0:y1, x0:x1]
+    return cropped if cropped.size else image
+
+
+def analyze_frame(image, roi=None, work_width=WORK_WIDTH):
+    """
+    Analyse a BGR frame and return a dict with green_percentage and
+    yellow_brown_percentage of the region of interest.
+    """
+    image = _crop_roi(image, roi)
+    height, width = image.shape[:2]
+    if width > work_width:
+        size = (work_width, max(1, round(height * work_width / width)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    green = cv2.inRange(hsv, np.array(GREEN_RANGE[0], np.uint8), np.array(GREEN_RANGE[1], np.uint8))
+    stressed = cv2.inRange(hsv, np.array(YELLOW_BROWN_RANGE[0], np.uint8),
+                           np.array(YELLOW_BROWN_RANGE[1], np.uint8))
+    total = float(green.size)
+    return {
+        "green_percentage": round(100.0 * cv2.countNonZero(green) / total, 2),
+        "yellow_brown_percentage": round(100.0 * cv2.countNonZero(stressed) / total, 2),
+    }
+
+
+def analyze_snapshot(filepath, roi=None, image=None, log=True):
+    """
+    Analyse a snapshot file, reusing the cached result if the file has not
+    changed. 'image' may be passed when the decoded frame is already in
+    memory. Returns the result dict, or None if the file cannot be read.
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    key = (os.path.abspath(filepath), st.st_size, st.st_mtime_ns, tuple(roi) if roi else None)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+    if image is None:
+        # Reduced-size decode is much cheaper than decoding full resolution.
+        image = cv2.imread(filepath, cv2.IMREAD_REDUCED_COLOR_4)
+        if image is None:
+            return None
+    result = analyze_frame(image, roi)
+    result["source"] = os.path.basename(filepath)
+    result["timestamp"] = datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    _set_latest(result)
+    if log:
+        log_plant_health(result["timestamp"], result["source"],
+                         result["green_percentage"], result["yellow_brown_percentage"])
+    return result
+
+
+def _set_latest(result):
+    global _latest
+    if _latest is None or result["timestamp"] >= _latest["timestamp"]:
+        _latest = result
+
+
+def latest_result():
+    """
+    Return the most recent analysis result, or None if nothing was analysed yet.
+    """
+    return _latest
+
+
+def evaluate_plant_health(result, trigger):
+    """
+    Check a result against the plant_health trigger settings.
+    Returns a list of alert messages (empty if healthy or disabled).
+    """
+    if not result or not trigger or not trigger.get("enabled"):
+        return []
+    thresholds = trigger.get("thresholds", {})
+    alerts = []
+    min_green = thresholds.get("min_green_percent")
+    if min_green is not None and result["green_percentage"] < float(min_green):
+        alerts.append(f"Green coverage {result['green_percentage']}% below {min_green}%")
+    max_stressed = thresholds.get("max_yellow_brown_percent")
+    if max_stressed is not None and result["yellow_brown_percentage"] > float(max_stressed):
+        alerts.append(f"Yellow/brown coverage {result['yellow_brown_percentage']}% above {max_stressed}%")
+    return alerts
@@ -1,33 +1,68 @@
 # File: camera/camera.py
 
-from picamera2 import Picamera2
 import os
+import queue
 import time
-from datetime import datetime, timedelta
 import threading
 import cv2
 import numpy as np
+from camera.streaming import FrameBroadcaster, StreamClient, stream_frames
+from camera.snapshots import SnapshotService
+from camera.storage import FrameStorage
+from camera.timelapse import TimelapseManager
+from metrics import CAMERA_CAPTURE_SECONDS, CAMERA_ENCODE_SECONDS
 
 class PlantCamera:
     def __init__(self, snapshot_dir='data/snapshots',
                  timelapse_dir='data/timelapse',
-                 resolution=(1920, 1080)):
+                 resolution=(1920, 1080), cleanup_stale=True):
         """
-        Initialize the camera for on-demand still capture.
-        This version does NOT run a continuous capture loop.
+        Initialize the camera for still capture. Frames are captured on
+        demand; while live preview clients are connected, a shared
+        broadcaster runs one capture loop for all of them. Background
+        services such as frame compaction start in start(), once the
+        camera is known to be available. 'cleanup_stale' allows killing
+        stale camera processes if the first initialization fails.
         """
         self.snapshot_dir = snapshot_dir
         self.timelapse_dir = timelapse_dir
         self.resolution = resolution
         self._picam = None
         self._initialized = False
+        self._driver_missing = False
+        # Serializes access to the capture device between the live preview,
+        # on-demand snapshots and the timelapse.
+        self._capture_lock = threading.RLock()
+        # One capture loop shared by every live preview client.
+        self.broadcaster = FrameBroadcaster(self)
+        # Near-duplicate detection and tiered retention for saved frames.
+        self.storage = FrameStorage([snapshot_dir, timelapse_dir])
+        # Encodes and writes snapshots off the request thread.
+        self.snapshots = SnapshotService(self)
+        # Named, drift-free timelapse sessions.
+        self.timelapse = TimelapseManager(self)
 
         # Create directories if they don't exist.
         for directory in [self.snapshot_dir, self.timelapse_dir]:
             if not os.path.exists(directory):
                 os.makedirs(directory)
 
-        # Optionally, run any cleanup commands if needed.
+        self.setup_camera()
+        if not self._initialized and not self._driver_missing and cleanup_stale:
+            # The device is most likely held by a stale process; clean up
+            # and try once more.
+            self.cleanup_stale_processes()
+            self.setup_camera()
+
+    @property
+    def available(self):
+        return self._initialized
+
+    def cleanup_stale_processes(self):
+        """
+        Kill leftover camera processes and shared-memory buffers that keep
+        the device busy.
+        """
         cleanup_commands = [
             "sudo pkill -f 'python3.*camera'",
             "sudo pkill -f 'libcamera'",
@@ -42,12 +77,18 @@ class PlantCamera:
                 print(f"Cleanup command failed: {e}")
 
         time.sleep(2)  # Give extra time for cleanup.
-        self.setup_camera()
 
     def setup_camera(self):
         """
         Initialize the camera for on-demand still capture using a still configuration.
         """
+        try:
+            # Imported here so that the app starts on machines without picamera2.
+            from picamera2 import Picamera2
+        except ImportError as e:
+            print(f"Camera driver not available: {e}")
+            self._driver_missing = True
+            return
         try:
             self._picam = Picamera2()
             config = self._picam.create_still_configuration(
@@ -63,9 +104,11 @@ class PlantCamera:
 
     def start(self):
         """
-        Dummy start method for compatibility with app.py.
-        For on-demand capture, no continuous loop is required.
+        Start the background services of an available camera (frame
+        compaction). No capture loop is started here.
         """
+        if self._initialized:
+            self.storage.start()
         return True
 
     def capture_single_frame(self):
@@ -73,51 +116,59 @@ class PlantCamera:
         Capture and return a single frame from the camera.
         If the camera instance is unavailable, attempt to reinitialize it.
         """
-        if self._picam is None:
-            print("Camera not initialized, attempting reinitialization...")
-            self.setup_camera()
+        with self._capture_lock:
             if self._picam is None:
-                print("Reinitialization failed.")
+                print("Camera not initialized, attempting reinitialization...")
+                self.setup_camera()
+                if self._picam is None:
+                    print("Reinitialization failed.")
+                    return None
+            try:
+                with CAMERA_CAPTURE_SECONDS.time():
+                    frame = self._picam.capture_array()
+                return frame
+            except Exception as e:
+                print(f"Error capturing frame: {e}")
                 return None
-        try:
-            frame = self._picam.capture_array()
-            return frame
-        except Exception as e:
-            print(f"Error capturing frame: {e}")
-            return None
 
-    def take_snapshot(self, filename=None):
+    def latest_preview_frame(self, max_age=1.0):
+        """
+        Return the newest live preview frame if the preview is running and
+        the frame is at most 'max_age' seconds old, else None.
+        """
+        frame = self.broadcaster.latest(max_age)
+        return frame.image if frame is not None else None
+
+    def take_snapshot(self, filename=None, timeout=30):
         """
         Capture a snapshot on demand and save it as a JPEG file in the snapshots folder.
+        Blocks until the snapshot service has written the file.
         """
-        frame = self.capture_single_frame()
-        if frame is None:
-            print("No frame available for snapshot.")
-            return None
-        if filename is None:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f'snapshot_{timestamp}.jpg'
-        filepath = os.path.join(self.snapshot_dir, filename)
-        success = cv2.imwrite(filepath, frame)
-        if success:
-            print(f"Snapshot saved to {filepath}")
-            return filepath
-        else:
-            print("Failed to write snapshot to file.")
+        try:
+            job = self.snapshots.submit(filename=filename)
+        except queue.Full:
+            print("Snapshot queue is full, snapshot skipped.")
             return None
+        filepath = job.wait(timeout)
+        if filepath is None:
+            print(f"Failed to take snapshot: {job.error or 'timed out'}")
+        return filepath
+
+    def take_snapshot_async(self, filename=None):
+        """
+        Queue a snapshot on the background snapshot service.
+        Returns the SnapshotJob immediately; raises queue.Full if the
+        service is backed up. Only the finished job's filepath is
+        authoritative.
+        """
+        return self.snapshots.submit(filename=filename)
 
-    def start_timelapse(self, interval_minutes=60, duration_hours=24):
+    def start_timelapse(self, interval_minutes=60, duration_hours=24, name="default"):
         """
         Start a timelapse capture that takes snapshots at defined intervals.
-        This runs in a background thread.
+        This runs as a managed session; see camera/timelapse.py.
         """
-        def _timelapse_loop():
-            end_time = datetime.now() + timedelta(hours=duration_hours)
-            while datetime.now() < end_time:
-                self.take_snapshot()
-                time.sleep(interval_minutes * 60)
-        threading.Thread(target=_timelapse_loop, daemon=True).start()
-        print(f"Started timelapse: {interval_minutes} minute intervals for {duration_hours} hours")
+        return self.timelapse.start(name, interval_minutes, duration_hours)
 
     def get_frame(self):
         """
@@ -129,7 +180,8 @@ class PlantCamera:
         if frame is None:
             return None
         try:
-            ret, jpeg = cv2.imencode('.jpg', frame)
+            with CAMERA_ENCODE_SECONDS.time(consumer="get_frame"):
+                ret, jpeg = cv2.imencode('.jpg', frame)
             if ret:
                 return jpeg.tobytes()
             else:
@@ -139,18 +191,13 @@ class PlantCamera:
             print(f"Error encoding frame: {e}")
             return None
 
-def generate_frames(camera):
+def generate_frames(camera, client=None):
     """
     Generator function for MJPEG live preview.
-    Each time a frame is requested, it is captured on demand.
-    (This may yield a lower frame rate compared to a continuous capture loop.)
+    Frames come from the camera's shared broadcaster, so each client only
+    waits for the next published frame instead of capturing its own.
+    'client' carries the per-viewer frame rate, size and quality settings.
     """
-    while True:
-        frame = camera.get_frame()
-        if frame is not None:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-        else:
-            time.sleep(0.1)
-
-
+    if client is None:
+        client = StreamClient()
+    return stream_frames(camera.broadcaster, client)
@@ -0,0 +1,238 @@
+# File: camera/catalog.py
+"""
+Snapshot catalog and thumbnail cache.
+
+The catalog keeps an in-memory index of the JPEG files under a directory
+(relative path, timestamp, size and dimensions) so that galleries can be
+paged without listing the SD card on every request. A directory is only
+re-scanned when its mtime changes, and image dimensions are read from the
+JPEG header instead of decoding the file. The index is persisted next to the
+images so a restart does not re-read every header.
+
+Thumbnails are generated lazily at a few fixed widths and cached on disk
+under <root>/.thumbs/<width>/.
+"""
+
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from datetime import datetime
+
+THUMB_SIZES = (160, 320, 640)
+THUMB_DIR = ".thumbs"
+INDEX_FILE = ".catalog.json"
+
+_TIMESTAMP_RE = re.compile(r"(\d{8}_\d{6})")
+
+
+def jpeg_dimensions(filepath):
+    """
+    Return (width, height) from a JPEG's SOF marker without decoding it,
+    or (None, None) if the header cannot be parsed.
+    """
+    try:
+        with open(filepath, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return None, None
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None, None
+                code = marker[1]
+                if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+                    continue
+                length = struct.unpack(">H", f.read(2))[0]
+                # SOF0-SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+                if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack(">xHH", f.read(5))
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None, None
+
+
+def _timestamp_for(name, mtime):
+    match = _TIMESTAMP_RE.search(name)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class SnapshotCatalog:
+    """
+    Indexed list of the JPEG files below 'root', newest first.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._thumb_lock = threading.Lock()
+        self._entries = {}
+        self._dir_mtimes = {}
+        self._sorted = None
+        self.version = ""
+        self._load_index()
+
+    def _index_path(self):
+        return os.path.join(self.root, INDEX_FILE)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            self._entries = saved.get("entries", {})
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def _save_index(self):
+        tmp_path = self._index_path() + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": self._entries}, f)
+            os.replace(tmp_path, self._index_path())
+        except OSError as e:
+            print(f"Could not save snapshot catalog: {e}")
+
+    def _make_entry(self, relpath, st):
+        width, height = jpeg_dimensions(os.path.join(self.root, relpath))
+        return {
+            "path": relpath,
+            "timestamp": _timestamp_for(os.path.basename(relpath), st.st_mtime),
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "width": width,
+            "height": height,
+        }
+
+    def _scan_dir(self, reldir):
+        """
+        Re-index one directory. Returns (subdirectories, changed).
+        """
+        path = os.path.join(self.root, reldir) if reldir else self.root
+        subdirs = set()
+        seen = set()
+        changed = False
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                relpath = os.path.join(reldir, entry.name) if reldir else entry.name
+                if entry.is_dir():
+                    subdirs.add(relpath)
+                elif entry.name.lower().endswith((".jpg", ".jpeg")):
+                    seen.add(relpath)
+                    st = entry.stat()
+                    cached = self._entries.get(relpath)
+                    if cached is None or cached["size"] != st.st_size or cached["mtime"] != st.st_mtime:
+                        self._entries[relpath] = self._make_entry(relpath, st)
+                        changed = True
+        for relpath in [p for p in self._entries if os.path.dirname(p) == reldir and p not in seen]:
+            del self._entries[relpath]
+            changed = True
+        return subdirs, changed
+
+    def refresh(self):
+        """
+        Re-scan directories whose mtime changed since the last refresh.
+        Cheap when nothing changed: one stat per directory.
+        """
+        with self._lock:
+            changed = False
+            pending = [""]
+            known_dirs = set()
+            while pending:
+                reldir = pending.pop()
+                known_dirs.add(reldir)
+                path = os.path.join(self.root, reldir) if reldir else self.root
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                if self._dir_mtimes.get(reldir, (None,))[0] != mtime:
+                    try:
+                        subdirs, dir_changed = self._scan_dir(reldir)
+                    except OSError as e:
+                        print(f"Could not scan {path}: {e}")
+                        continue
+                    self._dir_mtimes[reldir] = (mtime, subdirs)
+                    changed = changed or dir_changed
+                pending.extend(self._dir_mtimes[reldir][1])
+            for reldir in set(self._dir_mtimes) - known_dirs:
+                del self._dir_mtimes[reldir]
+                for relpath in [p for p in self._entries if os.path.dirname(p) == reldir]:
+                    del self._entries[relpath]
+                changed = True
+            if changed or self._sorted is None:
+                self._sorted = sorted(self._entries.values(),
+                                      key=lambda e: (e["timestamp"], e["path"]), reverse=True)
+                self.version = self._content_version()
+                self._save_index()
+
+    def _content_version(self):
+        # Derived from the entries rather than counted, so it survives a
+        # restart without ever repeating for a different listing.
+        digest = zlib.crc32("".join(f"{e['path']}\0{e['size']}\0{e['mtime']}\n"
+                                    for e in self._sorted).encode("utf-8"))
+        return f"{len(self._sorted)}-{digest:08x}"
+
+    def page(self, page=1, per_page=50):
+        """
+        Return (entries, total) for one page of the catalog, newest first.
+        """
+        self.refresh()
+        page = max(1, page)
+        start = (page - 1) * per_page
+        return self._sorted[start:start + per_page], len(self._sorted)
+
+    def thumbnail_path(self, relpath, width):
+        """
+        Return the path of a cached thumbnail for 'relpath', generating it if
+        it is missing or older than the source. Returns None if the source
+        cannot be read.
+        """
+        source = os.path.join(self.root, relpath)
+        thumb = os.path.join(self.root, THUMB_DIR, str(width), relpath)
+        try:
+            src_mtime = os.stat(source).st_mtime
+        except OSError:
+            return None
+        try:
+            if os.stat(thumb).st_mtime >= src_mtime:
+                return thumb
+        except OSError:
+            pass
+        import cv2
+        with self._thumb_lock:
+            entry = self._entries.get(relpath) or {}
+            # Let libjpeg do most of the downscaling while decoding.
+            flag = cv2.IMREAD_COLOR
+            if entry.get("width"):
+                ratio = entry["width"] / width
+                for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                                        (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                        (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                    if ratio >= factor:
+                        flag = reduced
+                        break
+            image = cv2.imread(source, flag)
+            if image is None:
+                return None
+            h, w = image.shape[:2]
+            if w > width:
+                image = cv2.resize(image, (width, max(1, round(h * width / w))),
+                                   interpolation=cv2.INTER_AREA)
+            os.makedirs(os.path.dirname(thumb), exist_ok=True)
+            ret, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            if not ret:
+                return None
+            tmp_path = thumb + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(jpeg.tobytes())
+            os.replace(tmp_path, thumb)
+        return thumb
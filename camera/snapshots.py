@@ -0,0 +1,188 @@
+# File: camera/snapshots.py
+"""
+Background snapshot service.
+
+Snapshot requests are queued on a bounded queue and handled by a small pool
+of worker threads that capture the frame, encode it as JPEG and write it to
+the SD card. A frame that nearly duplicates the previous one in its folder
+is linked or skipped instead (see camera/storage.py). Callers get a job
+back immediately and can poll it for the final file path.
+"""
+
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import cv2
+
+from camera.storage import fingerprint
+from metrics import CAMERA_ENCODE_SECONDS
+
+JOB_HISTORY = 100
+
+
+class SnapshotJob:
+    """
+    A single queued snapshot. 'status' moves from queued to capturing,
+    writing and finally done or error.
+
+    'filepath' is only final once the job is done: a near-duplicate frame
+    may be stored as the earlier identical snapshot instead (see
+    camera/storage.py), so the requested path might never exist.
+    """
+
+    def __init__(self, filepath, image=None, quality=90):
+        self.id = uuid.uuid4().hex[:12]
+        self.filepath = filepath
+        self.image = image
+        self.quality = quality
+        self.status = "queued"
+        self.error = None
+        self.created_at = datetime.now()
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Block until the job finishes. Returns the file path, or None on error
+        or timeout.
+        """
+        self._done.wait(timeout)
+        return self.filepath if self.status == "done" else None
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.image = None
+        self._done.set()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filepath": self.filepath if self.status == "done" else None,
+            "error": self.error,
+            "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+class SnapshotService:
+    """
+    Captures, encodes and writes snapshots off the request thread.
+    Access to the capture device goes through camera.capture_single_frame,
+    which serializes all consumers.
+    """
+
+    def __init__(self, camera, workers=2, max_pending=8, quality=90, preview_max_age=1.0):
+        self._camera = camera
+        self._workers = workers
+        self._quality = quality
+        self._preview_max_age = preview_max_age
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """
+        Register callback(filepath, image) to run on the worker thread after
+        each snapshot has been written.
+        """
+        self._listeners.append(callback)
+
+    def submit(self, directory=None, filename=None, image=None, quality=None):
+        """
+        Queue a snapshot and return its SnapshotJob without waiting.
+        'image' may be an already captured frame; otherwise the worker
+        captures one. Raises queue.Full when the backlog is full.
+        """
+        directory = directory or self._camera.snapshot_dir
+        if filename is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
+            filename = f'snapshot_{timestamp}.jpg'
+        job = SnapshotJob(os.path.join(directory, filename), image=image,
+                          quality=quality or self._quality)
+        self._ensure_workers()
+        self._queue.put_nowait(job)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > JOB_HISTORY:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self._workers:
+                t = threading.Thread(target=self._worker, daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _capture(self):
+        # A live preview frame is as good as a fresh still and avoids
+        # competing with the preview for the device.
+        image = self._camera.latest_preview_frame(self._preview_max_age)
+        if image is None:
+            image = self._camera.capture_single_frame()
+        return image
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            except Exception as e:
+                print(f"Snapshot job {job.id} failed: {e}")
+                job.finish("error", str(e))
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        image = job.image
+        if image is None:
+            job.status = "capturing"
+            image = self._capture()
+            if image is None:
+                job.finish("error", "No frame available for snapshot.")
+                return
+        job.status = "writing"
+        storage = self._camera.storage
+        fp = fingerprint(image)
+        existing = storage.store_duplicate(job.filepath, fp)
+        if existing is not None:
+            job.filepath = existing
+            job.finish("done")
+            self._notify(job.filepath, image)
+            return
+        with CAMERA_ENCODE_SECONDS.time(consumer="snapshot"):
+            ret, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, job.quality])
+        if not ret:
+            job.finish("error", "Failed to encode snapshot as JPEG.")
+            return
+        os.makedirs(os.path.dirname(job.filepath) or ".", exist_ok=True)
+        # Write to a temporary name first so readers never see a partial file.
+        tmp_path = job.filepath + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(jpeg.tobytes())
+        os.replace(tmp_path, job.filepath)
+        storage.remember(job.filepath, fp)
+        print(f"Snapshot saved to {job.filepath}")
+        job.finish("done")
+        self._notify(job.filepath, image)
+
+    def _notify(self, filepath, image):
+        for callback in self._listeners:
+            try:
+                callback(filepath, image)
+            except Exception as e:
+                print(f"Snapshot listener failed for {filepath}: {e}")
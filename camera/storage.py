@@ -0,0 +1,291 @@
+# File: camera/storage.py
+"""
+Frame storage manager: near-duplicate detection and tiered retention for
+snapshots and timelapse frames.
+
+Every new frame gets a perceptual fingerprint: a 63-bit DCT hash of a
+32x32 grayscale copy (for each of the 8x8 lowest-frequency coefficients
+except the DC term, whether it is above their median) plus its mean
+brightness. A frame whose hash is within a few bits of the last frame
+stored in the same directory, or that is dark like it (overnight frames
+are mostly sensor noise, which the hash cannot see past), is not written
+again: it is hard-linked to that frame, costing no space, or skipped
+entirely.
+
+A background compaction job applies tiered retention by file age:
+full-resolution JPEGs for 'full_days', then re-encoded at a reduced
+width and quality until 'reduced_days', then only one key frame per
+'keyframe_hours' per directory. Finally the oldest frames are deleted
+until the JPEGs fit the byte budget. Files that are hard links of each
+other are handled together, and rewritten files keep their mtime.
+
+Settings live under "camera_storage" in the config store.
+"""
+
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from camera.catalog import THUMB_DIR, THUMB_SIZES, jpeg_dimensions
+from config_store import config_store
+from metrics import CAMERA_FRAMES_DEDUPED, CAMERA_STORAGE_BYTES
+
+HASH_SIZE = 8
+HASH_SAMPLE = 32
+# Mean brightness (0-255) below which a frame counts as dark.
+DARK_LEVEL = 20
+
+DEFAULT_SETTINGS = {
+    "dedupe": "link",
+    "max_distance": 6,
+    "full_days": 7,
+    "reduced_days": 30,
+    "reduced_width": 960,
+    "reduced_quality": 70,
+    "keyframe_hours": 6,
+    "budget_mb": 4096,
+    "compact_hours": 6,
+}
+
+
+def fingerprint(image):
+    """
+    Return (hash, brightness) for a BGR or grayscale frame.
+    """
+    small = cv2.resize(image, (HASH_SAMPLE, HASH_SAMPLE), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    gray = small.astype(np.float32)
+    low = cv2.dct(gray)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term only encodes brightness, which is compared separately.
+    bits = low[1:] > np.median(low[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value, float(gray.mean())
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def is_duplicate(a, b, max_distance):
+    """
+    True if fingerprints 'a' and 'b' look like the same scene.
+    """
+    if a[1] < DARK_LEVEL and b[1] < DARK_LEVEL:
+        return True
+    return hamming(a[0], b[0]) <= max_distance and abs(a[1] - b[1]) < DARK_LEVEL
+
+
+def _frames(root):
+    """
+    Yield (path, stat) for every JPEG below 'root', skipping hidden
+    directories such as the thumbnail cache.
+    """
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = [d for d in subdirs if not d.startswith(".")]
+        for name in files:
+            if name.lower().endswith((".jpg", ".jpeg")):
+                path = os.path.join(directory, name)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    pass
+
+
+class FrameStorage:
+    """
+    Deduplicates new frames and compacts the frames under 'roots'.
+    """
+
+    def __init__(self, roots, settings=None):
+        self.roots = list(roots)
+        self._settings = settings
+        self._reference = {}
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_compaction = None
+
+    @property
+    def settings(self):
+        if self._settings is not None:
+            return dict(DEFAULT_SETTINGS, **self._settings)
+        return dict(DEFAULT_SETTINGS, **config_store.get().get("camera_storage", {}))
+
+    def store_duplicate(self, filepath, fp):
+        """
+        If the frame with fingerprint 'fp' duplicates the last frame
+        stored in the directory of 'filepath', link it there (or skip it) and
+        return the path the frame can be read from. Returns None if the
+        frame should be written normally.
+        """
+        settings = self.settings
+        if settings["dedupe"] not in ("link", "skip"):
+            return None
+        directory = os.path.dirname(os.path.abspath(filepath))
+        with self._lock:
+            reference = self._reference.get(directory)
+        if reference is None or not is_duplicate(fp, reference[1], settings["max_distance"]):
+            return None
+        original = reference[0]
+        if settings["dedupe"] == "skip":
+            if not os.path.exists(original):
+                return None
+            CAMERA_FRAMES_DEDUPED.inc(action="skipped")
+            return original
+        tmp_path = filepath + ".tmp"
+        try:
+            os.link(original, tmp_path)
+            os.replace(tmp_path, filepath)
+        except OSError:
+            # The original is gone or the filesystem has no hard links.
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return None
+        CAMERA_FRAMES_DEDUPED.inc(action="linked")
+        return filepath
+
+    def remember(self, filepath, fp):
+        """
+        Make a newly written frame the reference for its directory.
+        """
+        with self._lock:
+            self._reference[os.path.dirname(os.path.abspath(filepath))] = (filepath, fp)
+
+    def start(self):
+        """
+        Run compact() every 'compact_hours' from a daemon thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="frame-compaction", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # Let the app finish starting before the first pass.
+        delay = 60
+        while not self._stop.wait(delay):
+            try:
+                result = self.compact()
+                if result["reduced"] or result["removed"]:
+                    print(f"Frame compaction: {result['reduced']} reduced, {result['removed']} removed, "
+                          f"{result['bytes'] / 1e6:.0f} MB in use.")
+            except Exception as e:
+                print(f"Frame compaction failed: {e}")
+            delay = max(0.1, float(self.settings["compact_hours"])) * 3600
+
+    def _groups(self):
+        """
+        Frames grouped by inode: {(dev, ino): {"paths", "size", "mtime", "root"}}.
+        """
+        groups = {}
+        for root in self.roots:
+            for path, st in _frames(root):
+                group = groups.setdefault((st.st_dev, st.st_ino), {
+                    "paths": [], "size": st.st_size, "mtime": st.st_mtime, "root": root})
+                group["paths"].append(path)
+        return groups
+
+    def _rewrite(self, group, width, quality):
+        """
+        Re-encode one frame at 'width' and 'quality' and point all of its
+        links at the smaller file. Returns the bytes saved.
+        """
+        first = group["paths"][0]
+        image = cv2.imread(first, cv2.IMREAD_COLOR)
+        if image is None:
+            return 0
+        h, w = image.shape[:2]
+        if w > width:
+            image = cv2.resize(image, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+        ret, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ret or len(jpeg) >= group["size"]:
+            return 0
+        tmp_path = first + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(jpeg.tobytes())
+        # Keep the capture time, which is what retention and the catalog go by.
+        os.utime(tmp_path, (group["mtime"], group["mtime"]))
+        os.replace(tmp_path, first)
+        for path in group["paths"][1:]:
+            try:
+                os.link(first, path + ".tmp")
+                os.replace(path + ".tmp", path)
+            except OSError as e:
+                print(f"Could not relink {path}: {e}")
+        saved = group["size"] - len(jpeg)
+        group["size"] = len(jpeg)
+        return saved
+
+    def _remove(self, root, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        relpath = os.path.relpath(path, root)
+        for size in THUMB_SIZES:
+            try:
+                os.remove(os.path.join(root, THUMB_DIR, str(size), relpath))
+            except OSError:
+                pass
+
+    def compact(self, now=None):
+        """
+        Apply the retention tiers and the byte budget once. Returns
+        {"reduced", "removed", "bytes"}.
+        """
+        settings = self.settings
+        now = time.time() if now is None else now
+        full_before = now - float(settings["full_days"]) * 86400
+        reduced_before = now - float(settings["reduced_days"]) * 86400
+        keyframe_seconds = max(1.0, float(settings["keyframe_hours"]) * 3600)
+        reduced = removed = 0
+        with self._compact_lock:
+            groups = self._groups()
+            # Oldest tier: the first frame per directory and key-frame period stays.
+            keyframes = set()
+            for group in sorted(groups.values(), key=lambda g: g["mtime"]):
+                if group["mtime"] >= reduced_before:
+                    continue
+                for path in list(group["paths"]):
+                    slot = (os.path.dirname(path), int(group["mtime"] // keyframe_seconds))
+                    if slot in keyframes:
+                        self._remove(group["root"], path)
+                        group["paths"].remove(path)
+                        removed += 1
+                    else:
+                        keyframes.add(slot)
+            groups = {key: g for key, g in groups.items() if g["paths"]}
+            # Middle tier, and anything older that is still full size.
+            for group in groups.values():
+                if group["mtime"] < full_before:
+                    width, _ = jpeg_dimensions(group["paths"][0])
+                    if width and width > settings["reduced_width"]:
+                        if self._rewrite(group, settings["reduced_width"], settings["reduced_quality"]):
+                            reduced += 1
+            total = sum(g["size"] for g in groups.values())
+            budget = float(settings["budget_mb"]) * 1024 * 1024
+            for group in sorted(groups.values(), key=lambda g: g["mtime"]):
+                if total <= budget:
+                    break
+                for path in group["paths"]:
+                    self._remove(group["root"], path)
+                    removed += 1
+                total -= group["size"]
+        CAMERA_STORAGE_BYTES.set(total)
+        self.last_compaction = {"time": now, "reduced": reduced, "removed": removed, "bytes": total}
+        return self.last_compaction
+
+    def status(self):
+        return {"settings": self.settings, "last_compaction": self.last_compaction}
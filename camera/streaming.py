@@ -0,0 +1,323 @@
+# File: camera/streaming.py
+"""
+Shared MJPEG broadcaster for the live preview.
+
+A single background thread captures frames while at least one viewer is
+connected and publishes the latest one into a shared slot together with a
+frame sequence number. Every /camera/video_feed client waits on that slot, so
+capture cost does not grow with the number of viewers.
+
+Clients may ask for a lower frame rate, a smaller resolution or a different
+JPEG quality. Encodes are cached per published frame and per (width, quality)
+profile, so viewers that share a profile also share the encode.
+"""
+
+import itertools
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import CAMERA_ENCODE_SECONDS, STREAM_CLIENTS
+
+DEFAULT_QUALITY = 80
+DIFF_THUMB_WIDTH = 64
+# Longest wait between capture attempts while the camera returns nothing.
+MAX_RETRY_DELAY = 5.0
+
+
+class Frame:
+    """
+    A captured frame plus lazily computed, cached encodes and a small
+    grayscale thumbnail used for change detection.
+    """
+
+    def __init__(self, seq, image):
+        self.seq = seq
+        self.image = image
+        self.timestamp = time.time()
+        self._lock = threading.Lock()
+        self._jpegs = {}
+        self._thumb = None
+
+    def jpeg(self, max_width=None, quality=DEFAULT_QUALITY):
+        """
+        Return the frame encoded as JPEG, downscaled to at most 'max_width'.
+        """
+        height, width = self.image.shape[:2]
+        if not max_width or max_width >= width:
+            max_width = None
+        key = (max_width, quality)
+        with self._lock:
+            data = self._jpegs.get(key)
+            if data is not None:
+                return data
+            image = self.image
+            if max_width:
+                size = (max_width, max(1, round(height * max_width / width)))
+                image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            with CAMERA_ENCODE_SECONDS.time(consumer="stream"):
+                ret, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ret:
+                return None
+            data = jpeg.tobytes()
+            self._jpegs[key] = data
+            return data
+
+    def thumbnail(self):
+        """
+        Return a tiny grayscale copy of the frame for cheap frame differencing.
+        """
+        with self._lock:
+            if self._thumb is None:
+                height, width = self.image.shape[:2]
+                size = (DIFF_THUMB_WIDTH, max(1, round(height * DIFF_THUMB_WIDTH / width)))
+                small = cv2.resize(self.image, size, interpolation=cv2.INTER_AREA)
+                if small.ndim == 3:
+                    small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+                self._thumb = small
+            return self._thumb
+
+
+class StreamClient:
+    """
+    Per-viewer streaming settings and counters.
+
+    fps:        maximum frames per second sent to this client (0 = uncapped).
+    max_width:  maximum frame width in pixels (None = full resolution).
+    quality:    JPEG quality, 1-100.
+    threshold:  mean absolute gray-level difference (0-255) below which a
+                frame counts as unchanged and is not sent (0 = send all).
+    keepalive:  seconds after which an unchanged frame is sent anyway.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, fps=10, max_width=None, quality=DEFAULT_QUALITY,
+                 threshold=2.0, keepalive=10.0, remote_addr=None):
+        self.id = next(self._ids)
+        self.fps = max(0.0, min(float(fps), 30.0))
+        self.max_width = int(max_width) if max_width else None
+        if self.max_width is not None:
+            self.max_width = max(160, self.max_width)
+        self.quality = max(10, min(int(quality), 100))
+        self.threshold = max(0.0, float(threshold))
+        self.keepalive = max(1.0, float(keepalive))
+        self.remote_addr = remote_addr
+        self.connected_at = time.time()
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.frames_unchanged = 0
+        self.frames_dropped = 0
+        self._last_thumb = None
+        self._last_sent_at = 0.0
+
+    @classmethod
+    def from_args(cls, args, remote_addr=None):
+        """
+        Build a client from request query parameters
+        (fps, width, quality, threshold, keepalive).
+        Invalid values fall back to the defaults.
+        """
+        kwargs = {}
+        for name, key, cast in (("fps", "fps", float), ("max_width", "width", int),
+                                ("quality", "quality", int), ("threshold", "threshold", float),
+                                ("keepalive", "keepalive", float)):
+            value = args.get(key)
+            if value in (None, ""):
+                continue
+            try:
+                kwargs[name] = cast(value)
+            except ValueError:
+                continue
+        return cls(remote_addr=remote_addr, **kwargs)
+
+    def is_unchanged(self, frame):
+        """
+        Return True if 'frame' is close enough to the last frame sent to this
+        client that it can be skipped.
+        """
+        if self.threshold <= 0 or self._last_thumb is None:
+            return False
+        if time.monotonic() - self._last_sent_at >= self.keepalive:
+            return False
+        thumb = frame.thumbnail()
+        if thumb.shape != self._last_thumb.shape:
+            return False
+        return float(np.mean(cv2.absdiff(thumb, self._last_thumb))) < self.threshold
+
+    def mark_sent(self, frame, nbytes):
+        self.frames_sent += 1
+        self.bytes_sent += nbytes
+        self._last_sent_at = time.monotonic()
+        if self.threshold > 0:
+            self._last_thumb = frame.thumbnail()
+
+    def stats(self):
+        elapsed = max(time.time() - self.connected_at, 1e-6)
+        return {
+            "id": self.id,
+            "remote_addr": self.remote_addr,
+            "fps": self.fps,
+            "max_width": self.max_width,
+            "quality": self.quality,
+            "threshold": self.threshold,
+            "connected_seconds": round(elapsed, 1),
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "frames_unchanged": self.frames_unchanged,
+            "frames_dropped": self.frames_dropped,
+            "avg_kbps": round(self.bytes_sent * 8 / 1000 / elapsed, 1),
+        }
+
+
+class FrameBroadcaster:
+    """
+    Publishes the latest captured frame from 'camera' to any number of viewers.
+    The capture loop only runs while viewers are registered.
+    """
+
+    def __init__(self, camera, retry_delay=0.1, max_retry_delay=MAX_RETRY_DELAY):
+        self._camera = camera
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._clients = {}
+        self._thread = None
+
+    @property
+    def viewers(self):
+        return len(self._clients)
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def add_viewer(self, client):
+        """
+        Register a viewer and make sure the capture loop is running.
+        """
+        with self._cond:
+            self._clients[client.id] = client
+            STREAM_CLIENTS.set(len(self._clients))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def remove_viewer(self, client):
+        """
+        Unregister a viewer. The capture loop idles once the last one leaves.
+        """
+        with self._cond:
+            self._clients.pop(client.id, None)
+            STREAM_CLIENTS.set(len(self._clients))
+
+    def client_stats(self):
+        with self._cond:
+            clients = list(self._clients.values())
+        return [c.stats() for c in clients]
+
+    def latest(self, max_age=1.0):
+        """
+        Return the most recently published Frame if it is at most 'max_age'
+        seconds old and the preview is live, else None.
+        """
+        with self._cond:
+            frame = self._frame
+            if not self._clients or frame is None:
+                return None
+        if time.time() - frame.timestamp > max_age:
+            return None
+        return frame
+
+    def wait_for_frame(self, last_seq=0, timeout=2.0):
+        """
+        Block until a frame newer than 'last_seq' is published.
+        Returns the Frame, or None on timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frame is not None and self._seq != last_seq,
+                                       timeout=timeout):
+                return None
+            return self._frame
+
+    def _publish(self, image):
+        with self._cond:
+            self._seq += 1
+            self._frame = Frame(self._seq, image)
+            self._cond.notify_all()
+
+    def _capture_interval(self):
+        # Capture no faster than the most demanding client needs.
+        rates = [c.fps for c in self._clients.values()]
+        if not rates or 0 in rates:
+            return 0.0
+        return 1.0 / max(rates)
+
+    def _capture_loop(self):
+        next_due = time.monotonic()
+        retry_delay = self._retry_delay
+        while True:
+            with self._cond:
+                # Idle without touching the camera while nobody is watching.
+                self._cond.wait_for(lambda: self._clients)
+                interval = self._capture_interval()
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_due = max(next_due + interval, time.monotonic())
+            image = self._camera.capture_single_frame()
+            if image is None:
+                # Each failed capture re-runs the camera setup; back off
+                # exponentially rather than retry it several times a second.
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, self._max_retry_delay)
+                continue
+            retry_delay = self._retry_delay
+            self._publish(image)
+
+
+def stream_frames(broadcaster, client):
+    """
+    Generator yielding multipart MJPEG chunks for one client, honouring its
+    frame rate cap, resolution, quality and unchanged-frame skipping.
+    """
+    broadcaster.add_viewer(client)
+    try:
+        seq = 0
+        interval = 1.0 / client.fps if client.fps else 0.0
+        next_due = time.monotonic()
+        while True:
+            # Frames published until now went by while the previous one was
+            # being sent; any that follow during the cap's sleep are skipped
+            # on purpose.
+            ready = broadcaster.seq
+            if interval:
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            frame = broadcaster.wait_for_frame(seq)
+            if frame is None:
+                continue
+            if seq:
+                client.frames_dropped += max(0, min(ready, frame.seq - 1) - seq)
+            seq = frame.seq
+            if interval:
+                next_due = max(next_due + interval, time.monotonic())
+            if client.is_unchanged(frame):
+                client.frames_unchanged += 1
+                continue
+            jpeg = frame.jpeg(client.max_width, client.quality)
+            if jpeg is None:
+                continue
+            chunk = (b'--frame\r\n'
+                     b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+            client.mark_sent(frame, len(chunk))
+            yield chunk
+    finally:
+        # Runs when the client disconnects and the response is closed.
+        broadcaster.remove_viewer(client)
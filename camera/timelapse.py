@@ -0,0 +1,238 @@
+# File: camera/timelapse.py
+"""
+Managed timelapse sessions.
+
+Each named session captures on a fixed schedule computed from its start time,
+so intervals do not drift by the time spent capturing and writing. Every
+frame is saved as a JPEG and appended to a rolling MJPEG/AVI video so the
+timelapse can be watched without a batch encode at the end. A segment is
+finalized after SEGMENT_FRAMES frames or SEGMENT_SECONDS (a day), so at
+most the last day is missing from the playable segments.
+"""
+
+import math
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+import cv2
+
+VIDEO_FPS = 24
+VIDEO_SIZE = (1280, 720)
+SEGMENT_FRAMES = 500
+# An AVI is only playable everywhere once released, so segments are also
+# closed after this long, however few frames they hold.
+SEGMENT_SECONDS = 24 * 3600
+
+
+class TimelapseVideo:
+    """
+    Appends frames to numbered video segments in 'directory'
+    (<name>_000.avi, <name>_001.avi, ...). A new segment is started every
+    'segment_frames' frames or 'segment_seconds' seconds, whichever comes
+    first, and when the process restarts.
+    """
+
+    def __init__(self, directory, name, fps=VIDEO_FPS, size=VIDEO_SIZE,
+                 segment_frames=SEGMENT_FRAMES, segment_seconds=SEGMENT_SECONDS):
+        self.directory = directory
+        self.name = name
+        self.fps = fps
+        self.size = size
+        self.segment_frames = segment_frames
+        self.segment_seconds = segment_seconds
+        self._writer = None
+        self._opened_at = None
+        self._segment = self._next_segment_index()
+        self._frames_in_segment = 0
+
+    def _next_segment_index(self):
+        pattern = re.compile(re.escape(self.name) + r"_(\d+)\.avi$")
+        indexes = [int(m.group(1)) for m in map(pattern.match, os.listdir(self.directory)) if m]
+        return max(indexes) + 1 if indexes else 0
+
+    @property
+    def current_path(self):
+        return os.path.join(self.directory, f"{self.name}_{self._segment:03d}.avi")
+
+    def append(self, image):
+        if self._writer is not None and time.monotonic() - self._opened_at >= self.segment_seconds:
+            self._next_segment()
+        if self._writer is None:
+            fourcc = cv2.VideoWriter_fourcc(*"MJPG")
+            self._writer = cv2.VideoWriter(self.current_path, fourcc, self.fps, self.size)
+            if not self._writer.isOpened():
+                self._writer = None
+                raise IOError(f"Could not open video writer for {self.current_path}")
+            self._opened_at = time.monotonic()
+        if (image.shape[1], image.shape[0]) != self.size:
+            image = cv2.resize(image, self.size, interpolation=cv2.INTER_AREA)
+        self._writer.write(image)
+        self._frames_in_segment += 1
+        if self._frames_in_segment >= self.segment_frames:
+            self._next_segment()
+
+    def _next_segment(self):
+        self.close()
+        self._segment += 1
+        self._frames_in_segment = 0
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+
+class TimelapseSession:
+    """
+    One running timelapse. Frames are written to <timelapse_dir>/<name>/.
+    'duration_hours' of None runs until stopped.
+    """
+
+    def __init__(self, camera, name, interval_minutes=60, duration_hours=24, video=True):
+        self.camera = camera
+        self.name = name
+        self.interval = float(interval_minutes) * 60
+        if self.interval <= 0:
+            raise ValueError("interval_minutes must be positive")
+        self.duration_hours = duration_hours
+        self.directory = os.path.join(camera.timelapse_dir, name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.video = TimelapseVideo(self.directory, name) if video else None
+        self.status = "created"
+        self.error = None
+        self.frames_captured = 0
+        self.frames_missed = 0
+        self.started_at = None
+        self.ends_at = None
+        self.last_capture = None
+        self.next_capture = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self.started_at = datetime.now()
+        if self.duration_hours:
+            self.ends_at = self.started_at + timedelta(hours=float(self.duration_hours))
+        self.status = "running"
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        # Schedule slot k at start + k * interval on the monotonic clock so
+        # capture time never accumulates into the schedule.
+        start = time.monotonic()
+        end = start + float(self.duration_hours) * 3600 if self.duration_hours else None
+        slot = 0
+        try:
+            while True:
+                due = start + slot * self.interval
+                if end is not None and due > end:
+                    break
+                self.next_capture = datetime.now() + timedelta(seconds=max(0.0, due - time.monotonic()))
+                if self._stop.wait(max(0.0, due - time.monotonic())):
+                    break
+                self._capture()
+                # If a capture overran one or more slots, skip them rather
+                # than bursting to catch up.
+                next_slot = max(slot + 1, math.ceil((time.monotonic() - start) / self.interval))
+                self.frames_missed += next_slot - slot - 1
+                slot = next_slot
+            self.status = "stopped" if self._stop.is_set() else "finished"
+        except Exception as e:
+            print(f"Timelapse '{self.name}' failed: {e}")
+            self.status = "error"
+            self.error = str(e)
+        finally:
+            self.next_capture = None
+            if self.video is not None:
+                self.video.close()
+
+    def _capture(self):
+        image = self.camera.capture_single_frame()
+        if image is None:
+            print(f"Timelapse '{self.name}': no frame available.")
+            return
+        timestamp = datetime.now()
+        filename = f"{self.name}_{timestamp.strftime('%Y%m%d_%H%M%S')}.jpg"
+        try:
+            self.camera.snapshots.submit(directory=self.directory, filename=filename, image=image)
+        except queue.Full:
+            print(f"Timelapse '{self.name}': snapshot queue full, JPEG skipped.")
+        if self.video is not None:
+            self.video.append(image)
+        self.frames_captured += 1
+        self.last_capture = timestamp
+
+    def to_dict(self):
+        fmt = "%Y-%m-%d %H:%M:%S"
+        return {
+            "name": self.name,
+            "status": self.status,
+            "interval_minutes": self.interval / 60,
+            "duration_hours": self.duration_hours,
+            "frames_captured": self.frames_captured,
+            "frames_missed": self.frames_missed,
+            "started_at": self.started_at.strftime(fmt) if self.started_at else None,
+            "ends_at": self.ends_at.strftime(fmt) if self.ends_at else None,
+            "last_capture": self.last_capture.strftime(fmt) if self.last_capture else None,
+            "next_capture": self.next_capture.strftime(fmt) if self.next_capture else None,
+            "video": self.video.current_path if self.video else None,
+            "error": self.error,
+        }
+
+
+class TimelapseManager:
+    """
+    Keeps track of named timelapse sessions for one camera.
+    Only one session per name may run at a time.
+    """
+
+    def __init__(self, camera):
+        self._camera = camera
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def start(self, name="default", interval_minutes=60, duration_hours=24, video=True):
+        if not re.match(r"^[A-Za-z0-9_-]+$", name or ""):
+            raise ValueError("Session name may only contain letters, digits, '-' and '_'")
+        with self._lock:
+            existing = self._sessions.get(name)
+            if existing is not None and existing.running:
+                raise ValueError(f"Timelapse '{name}' is already running")
+            session = TimelapseSession(self._camera, name, interval_minutes, duration_hours, video)
+            self._sessions[name] = session
+            # Started under the lock: a concurrent start() must see it running.
+            session.start()
+        print(f"Started timelapse '{name}': {interval_minutes} minute intervals"
+              + (f" for {duration_hours} hours" if duration_hours else " until stopped"))
+        return session
+
+    def stop(self, name, timeout=10):
+        with self._lock:
+            session = self._sessions.get(name)
+        if session is None:
+            raise KeyError(name)
+        session.stop(timeout)
+        return session
+
+    def get(self, name):
+        with self._lock:
+            return self._sessions.get(name)
+
+    def status(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [s.to_dict() for s in sessions]
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Module: config_store.py
+Single in-memory configuration service shared by the web app and the control loop.
+
+The current configuration is held as an immutable, versioned snapshot, so
+readers never touch the disk. Changes are merged into a new snapshot,
+written atomically (temp file + rename) and pushed to subscribers. A
+background watcher polls the file's mtime and reloads it when it is edited
+externally, for example by the web app while main.py is running.
+"""
+
+import copy
+import json
+import os
+import tempfile
+import threading
+
+CONFIG_FILE = "config.json"
+POLL_INTERVAL = 2.0
+
+DEFAULT_CONFIG = {
+    "ph_min": 5.8,
+    "ph_max": 6.2,
+    "ec_min": 1.0,
+    "pump_calibration": {},
+    # Upload of sensor and event records to a fleet aggregator (aggregator.py).
+    "fleet": {
+        "enabled": False,
+        "url": "http://localhost:5100/ingest",
+        "node_id": "",  # defaults to the hostname
+        "token": "",
+        "batch_size": 500,
+        "flush_seconds": 30,
+        "max_spool_mb": 50
+    },
+    # Snapshot and timelapse frame retention (camera/storage.py).
+    "camera_storage": {
+        "dedupe": "link",  # "link", "skip" or "off"
+        "max_distance": 6,
+        "full_days": 7,
+        "reduced_days": 30,
+        "reduced_width": 960,
+        "reduced_quality": 70,
+        "keyframe_hours": 6,
+        "budget_mb": 4096,
+        "compact_hours": 6
+    },
+    "automation": {
+        "schedules": {
+            "image_capture": {
+                "enabled": True,
+                "interval_minutes": 60
+            },
+            "timelapse": {
+                "enabled": False,
+                "interval_minutes": 60,
+                "duration_hours": 24
+            }
+        },
+        "triggers": {
+            "plant_health": {
+                "enabled": True,
+                "roi": None,  # [x, y, width, height] as fractions of the frame
+                "thresholds": {
+                    "min_green_percent": 30
+                }
+            },
+            # Evaluated on every reading by controller/rules.py.
+            "sensor_rules": [
+                {"name": "ph_low", "type": "threshold", "column": "ph", "below": 5.5},
+                {"name": "ph_high", "type": "threshold", "column": "ph", "above": 6.5},
+                {"name": "ph_drift", "type": "rate_of_change", "column": "ph",
+                 "window_minutes": 60, "max_change": 0.3},
+                {"name": "ec_low", "type": "sustained", "column": "ec",
+                 "below": 0.8, "window_minutes": 30},
+                {"name": "sensor_silence", "type": "missing_data", "column": "ph",
+                 "max_gap_minutes": 10}
+            ]
+        }
+    }
+}
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict. Still a dict, so it works with json and Jinja's tojson.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("configuration snapshots are read-only; use config_store.update()")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class ConfigSnapshot(FrozenDict):
+    """
+    A frozen configuration plus the version number it was published under.
+    """
+
+    def __init__(self, data, version):
+        dict.__init__(self, data)
+        self.version = version
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """
+    Return a plain, mutable deep copy of a frozen value.
+    """
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def _merge(base, changes):
+    merged = dict(base)
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class ConfigStore:
+    """
+    Holds the current ConfigSnapshot and persists changes to 'path'.
+    """
+
+    def __init__(self, path=CONFIG_FILE, defaults=DEFAULT_CONFIG, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self._defaults = copy.deepcopy(defaults)
+        self._poll_interval = poll_interval
+        self._lock = threading.RLock()
+        self._subscribers = []
+        self._file_stamp = None
+        self._snapshot = None
+        self._notified = None
+        self._watcher = None
+
+    def get(self):
+        """
+        Return the current snapshot. Loads the file on the very first call
+        only; afterwards this is a plain attribute read.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._notified = self._swap(self._read_file())
+                    self._start_watching()
+                snapshot = self._snapshot
+        return snapshot
+
+    @property
+    def version(self):
+        return self.get().version
+
+    def subscribe(self, callback):
+        """
+        Register callback(snapshot, changed_keys) to be called after every
+        change, whether made through update() or by editing the file.
+        Callbacks run in the thread that made the change, after the store's
+        lock is released, so they may block or call update() themselves.
+        """
+        self._subscribers.append(callback)
+
+    def update(self, changes):
+        """
+        Merge 'changes' (nested dicts are merged key by key), persist the
+        result atomically and notify subscribers. Returns the new snapshot.
+        """
+        with self._lock:
+            merged = _merge(thaw(self.get()), changes)
+            self._write_file(merged)
+            snapshot = self._swap(merged)
+        self._notify(snapshot)
+        return snapshot
+
+    def reload(self):
+        """
+        Re-read the file if it changed on disk since it was last read or written.
+        """
+        with self._lock:
+            if self._stamp() == self._file_stamp:
+                return self._snapshot
+            print(f"Config file {self.path} changed on disk, reloading.")
+            snapshot = self._swap(self._read_file())
+        self._notify(snapshot)
+        return snapshot
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read_file(self):
+        data = copy.deepcopy(self._defaults)
+        stamp = self._stamp()
+        if stamp is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = _merge(data, json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Could not read {self.path}, keeping previous values: {e}")
+                if self._snapshot is not None:
+                    data = thaw(self._snapshot)
+        self._file_stamp = stamp
+        return data
+
+    def _write_file(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._file_stamp = self._stamp()
+
+    def _swap(self, data):
+        # Called with the lock held.
+        previous = self._snapshot
+        version = previous.version + 1 if previous is not None else 1
+        self._snapshot = ConfigSnapshot(_freeze(data), version)
+        return self._snapshot
+
+    def _notify(self, snapshot):
+        """
+        Pass 'snapshot' to the subscribers, without holding the lock. A
+        snapshot already overtaken by a newer notification is dropped, so
+        subscribers see versions in order, each with the keys changed
+        since the last one they saw.
+        """
+        with self._lock:
+            previous = self._notified
+            if snapshot.version <= previous.version:
+                return
+            self._notified = snapshot
+        changed = {k for k in set(previous) | set(snapshot) if previous.get(k) != snapshot.get(k)}
+        if changed:
+            for callback in list(self._subscribers):
+                try:
+                    callback(snapshot, changed)
+                except Exception as e:
+                    print(f"Config subscriber failed: {e}")
+
+    def _start_watching(self):
+        if self._watcher is None and self._poll_interval:
+            self._watcher = threading.Thread(target=self._watch, daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        stop = threading.Event()
+        while not stop.wait(self._poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Config reload failed: {e}")
+
+
+config_store = ConfigStore()
@@ -2,6 +2,8 @@
 import time
 import datetime
 from pumps.pumps import dose_pump
+from data.logger import log_event
+from data.events import OUTCOME_DOSED, OUTCOME_LIMIT_REACHED
 
 # Suppose we do daily max of 30s each for pH_up/down, 60s for nutrients
 MAX_DAILY_SECONDS = {
@@ -12,71 +14,104 @@ MAX_DAILY_SECONDS = {
     "nutrientC": 60
 }
 
-daily_counters = {
-    "pH_up": 0,
-    "pH_down": 0,
-    "nutrientA": 0,
-    "nutrientB": 0,
-    "nutrientC": 0
-}
-
-last_reset_date = None
-
-def reset_if_new_day():
-    global last_reset_date, daily_counters
-    today = datetime.date.today().isoformat()
-    if last_reset_date != today:
-        for p in daily_counters:
-            daily_counters[p] = 0
-        last_reset_date = today
+class SystemClock:
+    """
+    Wall-clock time. Replays pass a virtual clock with the same interface.
+    """
 
-def can_dose(pump_name, seconds):
-    if pump_name not in MAX_DAILY_SECONDS:
-        return False
-    return (daily_counters[pump_name] + seconds) <= MAX_DAILY_SECONDS[pump_name]
+    def now(self):
+        return datetime.datetime.now()
 
-def record_dose(pump_name, seconds):
-    daily_counters[pump_name] += seconds
+    def sleep(self, seconds):
+        time.sleep(seconds)
 
-def simple_ph_control(pH, ph_min=5.8, ph_max=6.2):
+class DosingController:
     """
-    If pH < ph_min => dose pH_up for 1s
-    If pH > ph_max => dose pH_down for 1s
-    Otherwise no action
+    Threshold dosing with per-pump daily limits.
+
+    pump:  callable(pump_name, seconds) that runs a pump (default: GPIO).
+    clock: object with now() deciding when the daily limits reset.
+    log:   callable(event, pump=, seconds=, reading=, outcome=) recording
+           every dose and limit hit (default: the structured event log).
     """
-    reset_if_new_day()
 
-    if pH < ph_min:
-        if can_dose("pH_up", 1):
-            dose_pump("pH_up", 1)
-            record_dose("pH_up", 1)
-            return f"pH={pH} => Dosed pH_up 1s"
-        else:
-            return f"pH={pH} => limit reached for pH_up"
-    elif pH > ph_max:
-        if can_dose("pH_down", 1):
-            dose_pump("pH_down", 1)
-            record_dose("pH_down", 1)
-            return f"pH={pH} => Dosed pH_down 1s"
+    def __init__(self, pump=None, clock=None, log=None, max_daily_seconds=MAX_DAILY_SECONDS):
+        self.pump = pump or dose_pump
+        self.clock = clock or SystemClock()
+        self.log = log or log_event
+        self.max_daily_seconds = dict(max_daily_seconds)
+        self.daily_counters = {p: 0 for p in self.max_daily_seconds}
+        self.last_reset_date = None
+
+    def reset_if_new_day(self):
+        today = self.clock.now().date().isoformat()
+        if self.last_reset_date != today:
+            for p in self.daily_counters:
+                self.daily_counters[p] = 0
+            self.last_reset_date = today
+
+    def can_dose(self, pump_name, seconds):
+        if pump_name not in self.max_daily_seconds:
+            return False
+        return (self.daily_counters[pump_name] + seconds) <= self.max_daily_seconds[pump_name]
+
+    def record_dose(self, pump_name, seconds):
+        self.daily_counters[pump_name] += seconds
+
+    def _dose(self, event, pump_name, seconds, label, reading):
+        """
+        Dose if the daily limit allows it and log a structured event either way.
+        """
+        if not self.can_dose(pump_name, seconds):
+            self.log(event, pump=pump_name, reading=reading, outcome=OUTCOME_LIMIT_REACHED)
+            return f"{label} => limit reached for {pump_name}"
+        self.pump(pump_name, seconds)
+        self.record_dose(pump_name, seconds)
+        self.log(event, pump=pump_name, seconds=seconds, reading=reading, outcome=OUTCOME_DOSED)
+        return f"{label} => Dosed {pump_name} {seconds}s"
+
+    def ph_control(self, pH, ph_min=5.8, ph_max=6.2):
+        """
+        If pH < ph_min => dose pH_up for 1s
+        If pH > ph_max => dose pH_down for 1s
+        Otherwise no action
+        """
+        self.reset_if_new_day()
+
+        if pH < ph_min:
+            return self._dose("ph_control", "pH_up", 1, f"pH={pH}", pH)
+        elif pH > ph_max:
+            return self._dose("ph_control", "pH_down", 1, f"pH={pH}", pH)
         else:
-            return f"pH={pH} => limit reached for pH_down"
-    else:
-        return f"pH={pH} => in range, no action"
+            return f"pH={pH} => in range, no action"
 
-def simple_ec_control(ec, ec_min=1.0):
-    """
-    If ec < ec_min => dose nutrientA for 2s
-    Otherwise no action
-    """
-    reset_if_new_day()
+    def ec_control(self, ec, ec_min=1.0):
+        """
+        If ec < ec_min => dose nutrientA for 2s
+        Otherwise no action
+        """
+        self.reset_if_new_day()
 
-    if ec < ec_min:
-        if can_dose("nutrientA", 2):
-            dose_pump("nutrientA", 2)
-            record_dose("nutrientA", 2)
-            return f"EC={ec} => Dosed nutrientA 2s"
+        if ec < ec_min:
+            return self._dose("ec_control", "nutrientA", 2, f"EC={ec}", ec)
         else:
-            return f"EC={ec} => limit reached for nutrientA"
-    else:
-        return f"EC={ec} => in range, no action"
+            return f"EC={ec} => in range, no action"
+
+# The controller used by main.py: real pumps, wall-clock time, event log.
+controller = DosingController()
+daily_counters = controller.daily_counters
+
+def reset_if_new_day():
+    controller.reset_if_new_day()
 
+def can_dose(pump_name, seconds):
+    return controller.can_dose(pump_name, seconds)
+
+def record_dose(pump_name, seconds):
+    controller.record_dose(pump_name, seconds)
+
+def simple_ph_control(pH, ph_min=5.8, ph_max=6.2):
+    return controller.ph_control(pH, ph_min, ph_max)
+
+def simple_ec_control(ec, ec_min=1.0):
+    return controller.ec_control(ec, ec_min)
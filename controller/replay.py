@@ -0,0 +1,237 @@
+# File: controller/replay.py
+"""
+Replay logged sensor readings through the dosing controller.
+
+Logged sampling cycles are fed to a DosingController on main.py's schedule
+(one control cycle every --control-interval seconds, acting on the latest
+reading). It runs on a virtual clock, with simulated pumps that only
+record what they were asked to do. Daily limits therefore reset by the
+simulated date, and a month of history replays in well under a
+second. The readings are the logged ones (open loop): a simulated dose does
+not change later readings.
+
+The simulated decisions are printed per day next to the dosing events that
+were actually logged, so different thresholds or limits can be compared
+against what the controller really did.
+
+Usage:
+    python -m controller.replay --since 2025-01-01 --until 2025-02-01 \\
+        [--ph-min 5.9 --ph-max 6.1 --ec-min 1.1] [--limit pH_up=40] [--control-interval 300] \\
+        [--timeline out.csv]
+"""
+
+import argparse
+import csv
+import datetime
+import sys
+import time
+
+from controller.dosing_logic import MAX_DAILY_SECONDS, DosingController
+from data.events import OUTCOME_DOSED, read_events
+from data.records import read_records
+
+CONTROL_EVENTS = ("ph_control", "ec_control")
+# main.py's control loop: one cycle every 5 minutes, on readings at most 180 s old.
+CONTROL_INTERVAL = 300
+MAX_READING_AGE = 180
+
+
+class VirtualClock:
+    """
+    Clock whose time only moves when set() or sleep() is called.
+    """
+
+    def __init__(self, start=None):
+        self._now = start or datetime.datetime(1970, 1, 1)
+
+    def now(self):
+        return self._now
+
+    def set(self, when):
+        self._now = when
+
+    def sleep(self, seconds):
+        self._now += datetime.timedelta(seconds=seconds)
+
+
+class SimulatedPumps:
+    """
+    Pump interface for replays: advances the virtual clock instead of
+    switching GPIO and keeps the requested run times.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.runs = []
+
+    def __call__(self, pump_name, seconds):
+        self.runs.append((self.clock.now(), pump_name, seconds))
+        self.clock.sleep(seconds)
+
+
+class DecisionLog:
+    """
+    Log interface for replays: collects decisions as event dicts stamped
+    with the virtual time.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.events = []
+
+    def __call__(self, event, details="", pump=None, seconds=None, ml=None, reading=None, outcome=None):
+        self.events.append({
+            "timestamp": self.clock.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "event": event,
+            "pump": pump,
+            "seconds": seconds,
+            "reading": reading,
+            "outcome": outcome,
+            "details": details,
+        })
+
+
+def replay(sensor_csv, ph_min, ph_max, ec_min, since=None, until=None, max_daily_seconds=MAX_DAILY_SECONDS,
+           control_interval=CONTROL_INTERVAL):
+    """
+    Run the logged cycles in [since, until) through a fresh controller the
+    way main.py does: every 'control_interval' seconds (after the previous
+    cycle's doses) it acts once on the latest reading, if that reading is
+    recent and has not been acted on yet. A 'control_interval' of 0 acts on
+    every logged cycle. Returns (decisions, control cycles, simulated_seconds).
+    """
+    clock = VirtualClock()
+    log = DecisionLog(clock)
+    controller = DosingController(pump=SimulatedPumps(clock), clock=clock, log=log,
+                                  max_daily_seconds=max_daily_seconds)
+    state = {"latest": None, "acted": None, "next": None, "cycles": 0}
+
+    def control(tick):
+        clock.set(tick)
+        state["cycles"] += 1
+        latest = state["latest"]
+        if (latest is not None and latest[0] != state["acted"]
+                and (tick - latest[0]).total_seconds() <= MAX_READING_AGE):
+            state["acted"] = latest[0]
+            if latest[1] is not None:
+                controller.ph_control(latest[1], ph_min, ph_max)
+            if latest[2] is not None:
+                controller.ec_control(latest[2], ec_min)
+        state["next"] = clock.now() + datetime.timedelta(seconds=control_interval)
+
+    first = last = None
+    for ts, ph, ec in read_records(sensor_csv, ["ph", "ec"], since=since, until=until):
+        try:
+            last = datetime.datetime.fromisoformat(ts)
+        except ValueError:
+            continue
+        first = first or last
+        # Ticks before this reading act on the previous one.
+        while control_interval and state["next"] is not None and state["next"] < last:
+            control(state["next"])
+        state["latest"] = (last, ph, ec)
+        if state["next"] is None or state["next"] <= last or not control_interval:
+            control(max(last, clock.now()) if control_interval else last)
+    span = (last - first).total_seconds() if first else 0.0
+    return log.events, state["cycles"], span
+
+
+def logged_decisions(events_csv, since=None, until=None):
+    """
+    The dosing events actually logged in [since, until).
+    """
+    return [e for e in read_events(events_csv)
+            if e["event"] in CONTROL_EVENTS
+            and (not since or e["timestamp"] >= since)
+            and (not until or e["timestamp"] < until)]
+
+
+def daily_summary(simulated, logged):
+    """
+    Per day and pump: {"sim_doses", "sim_seconds", "sim_limited",
+    "real_doses", "real_seconds", "real_limited"}.
+    """
+    days = {}
+    for prefix, events in (("sim", simulated), ("real", logged)):
+        for e in events:
+            if not e["pump"]:
+                continue
+            entry = days.setdefault(e["timestamp"][:10], {}).setdefault(e["pump"], {
+                "sim_doses": 0, "sim_seconds": 0.0, "sim_limited": 0,
+                "real_doses": 0, "real_seconds": 0.0, "real_limited": 0})
+            if e["outcome"] == OUTCOME_DOSED:
+                entry[prefix + "_doses"] += 1
+                entry[prefix + "_seconds"] += e["seconds"] or 0
+            else:
+                entry[prefix + "_limited"] += 1
+    return days
+
+
+def write_timeline(path, simulated, logged):
+    """
+    Write simulated and logged decisions as one time-ordered CSV.
+    """
+    rows = [("sim", e) for e in simulated] + [("real", e) for e in logged]
+    rows.sort(key=lambda r: (r[1]["timestamp"], r[0]))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["timestamp", "source", "event", "pump", "seconds", "reading", "outcome"])
+        for source, e in rows:
+            writer.writerow([e["timestamp"], source, e["event"], e["pump"] or "",
+                             "" if e["seconds"] is None else e["seconds"],
+                             "" if e["reading"] is None else e["reading"], e["outcome"] or ""])
+
+
+def _limits(values):
+    limits = dict(MAX_DAILY_SECONDS)
+    for item in values or []:
+        pump, _, seconds = item.partition("=")
+        limits[pump] = float(seconds)
+    return limits
+
+
+def main(argv=None):
+    from config_store import config_store
+    from data.logger import EVENT_LOG, SENSOR_LOG
+    config = config_store.get()
+    parser = argparse.ArgumentParser(description="Replay logged sensor data through the dosing controller.")
+    parser.add_argument("--sensors", default=SENSOR_LOG, help="sensor CSV to replay")
+    parser.add_argument("--events", default=EVENT_LOG, help="event CSV with the real decisions")
+    parser.add_argument("--since", help="first timestamp (or prefix such as 2025-01-01)")
+    parser.add_argument("--until", help="end timestamp, exclusive")
+    parser.add_argument("--ph-min", type=float, default=config["ph_min"])
+    parser.add_argument("--ph-max", type=float, default=config["ph_max"])
+    parser.add_argument("--ec-min", type=float, default=config["ec_min"])
+    parser.add_argument("--limit", action="append", metavar="PUMP=SECONDS",
+                        help="override a pump's daily limit")
+    parser.add_argument("--control-interval", type=float, default=CONTROL_INTERVAL, metavar="SECONDS",
+                        help="seconds between control cycles, as in main.py (0: act on every logged cycle)")
+    parser.add_argument("--timeline", help="write simulated and real decisions to this CSV")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    simulated, cycles, span = replay(args.sensors, args.ph_min, args.ph_max, args.ec_min,
+                                     args.since, args.until, _limits(args.limit), args.control_interval)
+    elapsed = time.perf_counter() - started
+    logged = logged_decisions(args.events, args.since, args.until)
+
+    print(f"{'date':10s} {'pump':10s} {'sim doses':>9s} {'sim s':>7s} {'sim lim':>7s} "
+          f"{'real doses':>10s} {'real s':>7s} {'real lim':>8s}")
+    for day, pumps in sorted(daily_summary(simulated, logged).items()):
+        for pump, s in sorted(pumps.items()):
+            print(f"{day:10s} {pump:10s} {s['sim_doses']:9d} {s['sim_seconds']:7.1f} {s['sim_limited']:7d} "
+                  f"{s['real_doses']:10d} {s['real_seconds']:7.1f} {s['real_limited']:8d}")
+
+    sim_doses = sum(1 for e in simulated if e["outcome"] == OUTCOME_DOSED)
+    real_doses = sum(1 for e in logged if e["outcome"] == OUTCOME_DOSED)
+    print(f"\n{cycles} control cycles replayed in {elapsed:.2f}s: {sim_doses} simulated doses, {real_doses} logged.")
+    if elapsed > 0 and span > 0:
+        print(f"Replay speed: {span / elapsed:,.0f}x real time.")
+    if args.timeline:
+        write_timeline(args.timeline, simulated, logged)
+        print(f"Timeline written to {args.timeline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
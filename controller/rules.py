@@ -0,0 +1,361 @@
+# File: controller/rules.py
+"""
+Streaming alert rules over sensor readings.
+
+Rules come from the "sensor_rules" list under the automation triggers in the
+config store. Each reading published by the acquisition daemon is pushed
+through the engine, which only evaluates the rules indexed under the
+columns present in that reading. Windowed rules share one SlidingWindow
+per (column, span) that keeps its min, max and mean up to date
+incrementally (monotonic deques and a running sum), so a reading costs
+O(1) amortized per rule however long the window.
+
+Rule types (times in minutes):
+
+    threshold       {"column", "below" and/or "above", optional
+                     "statistic": "value" | "mean" | "min" | "max" with
+                     "window_minutes"}
+    rate_of_change  {"column", "window_minutes", "max_change"}: the value
+                     moved more than max_change within the window
+    sustained       {"column", "below" or "above", "window_minutes"}: every
+                     reading over the whole window was out of range
+    missing_data    {"column", "max_gap_minutes"}: no reading for that long
+
+Alerts fire once when a rule's condition starts and once more when it
+clears; both are written to the event log as "alert" events.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from data.events import OUTCOME_CLEARED, OUTCOME_TRIGGERED
+
+TICK_SECONDS = 30
+
+
+class SlidingWindow:
+    """
+    Time-based window over (timestamp, value) pairs with O(1) amortized
+    push and O(1) min, max and mean.
+    """
+
+    def __init__(self, span_seconds):
+        self.span = span_seconds
+        self._items = deque()
+        self._min = deque()
+        self._max = deque()
+        self._sum = 0.0
+
+    def push(self, timestamp, value):
+        self._items.append((timestamp, value))
+        self._sum += value
+        while self._min and self._min[-1][1] > value:
+            self._min.pop()
+        self._min.append((timestamp, value))
+        while self._max and self._max[-1][1] < value:
+            self._max.pop()
+        self._max.append((timestamp, value))
+        self._evict(timestamp - self.span)
+
+    def _evict(self, cutoff):
+        items = self._items
+        while items and items[0][0] < cutoff:
+            ts, value = items.popleft()
+            self._sum -= value
+            if self._min[0][0] == ts and self._min[0][1] == value:
+                self._min.popleft()
+            if self._max[0][0] == ts and self._max[0][1] == value:
+                self._max.popleft()
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+    @property
+    def mean(self):
+        return self._sum / len(self._items) if self._items else None
+
+    @property
+    def oldest(self):
+        return self._items[0] if self._items else None
+
+    def covers(self, now, fraction=0.9):
+        """
+        True once the readings span most of the window, so a rule does not
+        fire on the first few samples after start-up.
+        """
+        return bool(self._items) and now - self._items[0][0] >= self.span * fraction
+
+
+class Rule:
+    """
+    Base class. check() returns an alert message while the condition holds,
+    or None.
+    """
+
+    def __init__(self, spec):
+        self.name = spec.get("name") or f"{spec['type']}_{spec['column']}"
+        self.column = spec["column"]
+        self.spec = spec
+        self.window = None
+        self.active = False
+
+    @property
+    def window_seconds(self):
+        minutes = self.spec.get("window_minutes")
+        return float(minutes) * 60 if minutes else None
+
+    def _require_window(self, why):
+        span = self.window_seconds
+        if not span or span <= 0:
+            raise ValueError(f"Rule '{self.name}': {why} needs a positive window_minutes")
+
+    def check(self, timestamp, value):
+        raise NotImplementedError
+
+    def _label(self):
+        return f"{self.name}: {self.column}"
+
+
+def _out_of_range(value, below, above):
+    if below is not None and value < below:
+        return f"below {below}"
+    if above is not None and value > above:
+        return f"above {above}"
+    return None
+
+
+class ThresholdRule(Rule):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.below = spec.get("below")
+        self.above = spec.get("above")
+        self.statistic = spec.get("statistic", "value")
+        if self.statistic != "value":
+            self._require_window(f"statistic '{self.statistic}'")
+
+    def check(self, timestamp, value):
+        if self.statistic != "value":
+            value = getattr(self.window, self.statistic)
+        problem = _out_of_range(value, self.below, self.above)
+        if problem:
+            stat = "" if self.statistic == "value" else f" {self.statistic}"
+            return f"{self._label()}{stat} {value:.3g} {problem}"
+        return None
+
+
+class RateOfChangeRule(Rule):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self._require_window("rate_of_change")
+        self.max_change = float(spec["max_change"])
+
+    def check(self, timestamp, value):
+        # The spread of the window bounds how far the value moved in it.
+        change = self.window.max - self.window.min
+        if change > self.max_change:
+            return (f"{self._label()} moved {change:.3g} within {self.spec['window_minutes']} min "
+                    f"(limit {self.max_change})")
+        return None
+
+
+class SustainedRule(Rule):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self._require_window("sustained")
+        self.below = spec.get("below")
+        self.above = spec.get("above")
+
+    def check(self, timestamp, value):
+        if not self.window.covers(timestamp):
+            return None
+        # All readings are out of range exactly when the extreme on the
+        # in-range side still is.
+        if self.below is not None and self.window.max < self.below:
+            return f"{self._label()} below {self.below} for {self.spec['window_minutes']} min"
+        if self.above is not None and self.window.min > self.above:
+            return f"{self._label()} above {self.above} for {self.spec['window_minutes']} min"
+        return None
+
+
+class MissingDataRule(Rule):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.max_gap = float(spec["max_gap_minutes"]) * 60
+        self.last_seen = None
+
+    def check(self, timestamp, value):
+        self.last_seen = timestamp
+        return None
+
+    def check_gap(self, now):
+        if self.last_seen is not None and now - self.last_seen > self.max_gap:
+            return f"{self._label()} has had no reading for {(now - self.last_seen) / 60:.0f} min"
+        return None
+
+
+RULE_TYPES = {
+    "threshold": ThresholdRule,
+    "rate_of_change": RateOfChangeRule,
+    "sustained": SustainedRule,
+    "missing_data": MissingDataRule,
+}
+
+WINDOWED = (RateOfChangeRule, SustainedRule)
+
+
+def build_rules(specs):
+    """
+    Create rules from config dicts, skipping disabled and invalid ones.
+    """
+    rules = []
+    for spec in specs or []:
+        if not spec.get("enabled", True):
+            continue
+        try:
+            rules.append(RULE_TYPES[spec["type"]](spec))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Ignoring invalid sensor rule {spec}: {e}")
+    return rules
+
+
+class RulesEngine:
+    """
+    Evaluates rules against a stream of readings.
+
+    on_alert(rule, outcome, message, value, timestamp) is called when a rule
+    starts firing (outcome "triggered") and when it clears ("cleared").
+    """
+
+    def __init__(self, rules, on_alert):
+        self.on_alert = on_alert
+        self._lock = threading.Lock()
+        self.rules = []
+        self._spans = {}
+        self._started = time.time()
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        """
+        Replace the rules. A rule carries over the alert state of the old
+        rule with the same name, type and column, and windows over the same
+        column and span keep their readings, so a rebuild neither repeats
+        a "triggered" alert nor restarts windowed rules from empty.
+        """
+        with self._lock:
+            previous = {r.name: r for r in self.rules}
+            by_column = {}
+            windows = {}
+            for rule in rules:
+                old = previous.get(rule.name)
+                if old is not None and type(old) is type(rule) and old.column == rule.column:
+                    rule.active = old.active
+                    if isinstance(rule, MissingDataRule):
+                        rule.last_seen = old.last_seen
+                span = rule.window_seconds
+                if span and (isinstance(rule, WINDOWED) or getattr(rule, "statistic", "value") != "value"):
+                    key = (rule.column, span)
+                    if key not in windows:
+                        windows[key] = self._spans[key] if key in self._spans else SlidingWindow(span)
+                    rule.window = windows[key]
+                by_column.setdefault(rule.column, []).append(rule)
+            self.rules = list(rules)
+            self._by_column = by_column
+            self._spans = windows
+            self._windows = {}
+            for (column, _), window in windows.items():
+                self._windows.setdefault(column, []).append(window)
+
+    def process(self, timestamp, values):
+        """
+        Feed one reading (Unix timestamp, {column: value}).
+        """
+        with self._lock:
+            for column, value in values.items():
+                if value is None:
+                    continue
+                for window in self._windows.get(column, ()):
+                    window.push(timestamp, value)
+                for rule in self._by_column.get(column, ()):
+                    self._update(rule, rule.check(timestamp, value), value, timestamp)
+        self.tick(timestamp)
+
+    def tick(self, now=None):
+        """
+        Evaluate missing-data rules; called for every reading and by a timer
+        so a silent sensor (or daemon) is noticed.
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            for rule in self.rules:
+                if isinstance(rule, MissingDataRule):
+                    if rule.last_seen is None:
+                        # Count the gap from start-up for a sensor never seen.
+                        rule.last_seen = self._started
+                    self._update(rule, rule.check_gap(now), None, now)
+
+    def _update(self, rule, message, value, timestamp):
+        if message and not rule.active:
+            rule.active = True
+            self.on_alert(rule, OUTCOME_TRIGGERED, message, value, timestamp)
+        elif not message and rule.active:
+            rule.active = False
+            self.on_alert(rule, OUTCOME_CLEARED, f"{rule.name}: back to normal", value, timestamp)
+
+    def status(self):
+        with self._lock:
+            return [{"name": r.name, "type": r.spec["type"], "column": r.column, "active": r.active}
+                    for r in self.rules]
+
+
+def log_alert(rule, outcome, message, value, timestamp):
+    """
+    Default alert sink: an "alert" event in the structured event log.
+    """
+    from data.logger import log_event
+    log_event("alert", details=message, reading=value, outcome=outcome)
+    print(f"[{datetime.fromtimestamp(timestamp):%Y-%m-%d %H:%M:%S}] alert {outcome}: {message}")
+
+
+def sensor_rules_config(snapshot):
+    return snapshot["automation"].get("triggers", {}).get("sensor_rules", [])
+
+
+def start_rules_engine(socket_path=None, on_alert=log_alert):
+    """
+    Subscribe to the acquisition daemon and evaluate the configured sensor
+    rules on every reading. Rules are rebuilt when the sensor rules in the
+    config change. Returns the engine.
+    """
+    from acquisition.client import subscribe
+    from acquisition.daemon import DEFAULT_SOCKET
+    from config_store import config_store
+
+    current = {"specs": sensor_rules_config(config_store.get())}
+    engine = RulesEngine(build_rules(current["specs"]), on_alert)
+
+    def on_config_change(snapshot, changed_keys):
+        # Other automation settings (schedules, plant health) leave the rules alone.
+        specs = sensor_rules_config(snapshot)
+        if "automation" in changed_keys and specs != current["specs"]:
+            current["specs"] = specs
+            engine.set_rules(build_rules(specs))
+
+    def ticker():
+        while True:
+            time.sleep(TICK_SECONDS)
+            engine.tick()
+
+    config_store.subscribe(on_config_change)
+    subscribe(engine.process, socket_path or DEFAULT_SOCKET, name="rules-engine")
+    threading.Thread(target=ticker, name="rules-ticker", daemon=True).start()
+    return engine
@@ -1,9 +1,8 @@
 # File: test_dosing_logic.py
 
-import time
-
 # We'll import your dosing logic from the real module
-from controller.dosing_logic import simple_ph_control, simple_ec_control
+from controller.dosing_logic import DosingController
+from controller.replay import DecisionLog, VirtualClock
 
 
 # We'll mock out pumps by just printing or returning a change in the simulation
@@ -42,6 +41,12 @@ def run_simulated_test():
         "EC": 0.8,  # also below desired
     }
 
+    # The controller runs the mock pump instead of real hardware, on a
+    # virtual clock, and keeps its decisions in memory instead of the event log.
+    clock = VirtualClock()
+    controller = DosingController(pump=lambda pump_name, seconds: mock_dose_pump(pump_name, seconds, sim_state),
+                                  clock=clock, log=DecisionLog(clock))
+
     # We'll run multiple loops to see the logic in action
     for cycle in range(1, 10):
         pH_val = sim_state["pH"]
@@ -51,35 +56,13 @@ def run_simulated_test():
         print(f"Current sim pH={pH_val:.2f}, EC={ec_val:.2f}")
 
         # 1. Use the logic to see if pH needs adjusting
-        ph_status = simple_ph_control(pH_val)
-        if "Dosed" in ph_status:
-            # parse which pump and how many seconds from the logic
-            # E.g. "pH=5.4 -> Dosed pH_up for 1s"
-            # We'll parse out the last part
-            # or you can modify 'simple_ph_control' to return structured data
-            parts = ph_status.split()
-            # e.g. ['pH=5.4', '->', 'Dosed', 'pH_up', 'for', '1s']
-            pump_name = parts[3]
-            sec_string = parts[5]  # '1s'
-            seconds = float(sec_string.replace("s", ""))
-
-            # Call the mock dosing function instead of real hardware
-            mock_dose_pump(pump_name, seconds, sim_state)
+        print(controller.ph_control(pH_val))
 
         # 2. Use the logic to see if EC needs adjusting
-        ec_status = simple_ec_control(ec_val)
-        if "Dosed" in ec_status:
-            parts = ec_status.split()
-            # e.g. ['EC=0.8', '->', 'Dosed', 'nutrientA', 'for', '2s']
-            pump_name = parts[3]
-            sec_string = parts[5]
-            seconds = float(sec_string.replace("s", ""))
-
-            mock_dose_pump(pump_name, seconds, sim_state)
-
-        # 3. Maybe simulate some time passing, stable environment
-        #    We'll just do a short sleep so we can see output
-        time.sleep(1)
+        print(controller.ec_control(ec_val))
+
+        # 3. Simulate five minutes passing, stable environment
+        clock.sleep(300)
 
         # Check if we reached desired range
         if 5.8 <= sim_state["pH"] <= 6.2 and sim_state["EC"] >= 1.0:
@@ -0,0 +1,122 @@
+# File: controller/test_rules.py
+
+import random
+
+import acquisition.client
+import config_store
+from controller.rules import (RulesEngine, SlidingWindow, SustainedRule, ThresholdRule, build_rules,
+                              start_rules_engine)
+from data.events import OUTCOME_CLEARED, OUTCOME_TRIGGERED
+
+
+def collect():
+    alerts = []
+    return alerts, lambda rule, outcome, message, value, timestamp: alerts.append((rule.name, outcome))
+
+
+def test_sliding_window_matches_brute_force():
+    window = SlidingWindow(60)
+    readings = []
+    rng = random.Random(1)
+    for t in range(0, 600, 5):
+        value = rng.uniform(5, 7)
+        window.push(t, value)
+        readings.append((t, value))
+        inside = [v for ts, v in readings if ts >= t - 60]
+        assert len(window) == len(inside)
+        assert window.min == min(inside)
+        assert window.max == max(inside)
+        assert abs(window.mean - sum(inside) / len(inside)) < 1e-9
+
+
+def test_sliding_window_covers():
+    window = SlidingWindow(100)
+    assert not window.covers(0)
+    window.push(0, 1.0)
+    assert not window.covers(50)
+    window.push(95, 1.0)
+    assert window.covers(95)
+
+
+def test_build_rules_skips_invalid_and_disabled():
+    rules = build_rules([
+        {"name": "ok", "type": "threshold", "column": "ph", "below": 5.5},
+        {"name": "off", "type": "threshold", "column": "ph", "below": 5.5, "enabled": False},
+        {"name": "no_window", "type": "sustained", "column": "ec", "below": 0.8},
+        {"name": "bad_window", "type": "rate_of_change", "column": "ph", "window_minutes": -5, "max_change": 1},
+        {"name": "mean_no_window", "type": "threshold", "column": "ph", "statistic": "mean", "below": 5},
+        {"name": "unknown", "type": "nope", "column": "ph"},
+    ])
+    assert [r.name for r in rules] == ["ok"]
+
+
+def test_threshold_triggers_once_and_clears():
+    alerts, on_alert = collect()
+    engine = RulesEngine(build_rules([{"name": "ph_low", "type": "threshold", "column": "ph", "below": 5.5}]),
+                         on_alert)
+    for t, ph in enumerate([6.0, 5.4, 5.3, 5.2, 6.0, 6.1]):
+        engine.process(t, {"ph": ph})
+    assert alerts == [("ph_low", OUTCOME_TRIGGERED), ("ph_low", OUTCOME_CLEARED)]
+
+
+def test_sustained_and_rate_of_change():
+    alerts, on_alert = collect()
+    engine = RulesEngine(build_rules([
+        {"name": "ec_low", "type": "sustained", "column": "ec", "below": 0.8, "window_minutes": 10},
+        {"name": "ph_drift", "type": "rate_of_change", "column": "ph", "window_minutes": 10, "max_change": 0.3},
+    ]), on_alert)
+    for t in range(0, 600, 60):
+        engine.process(t, {"ec": 0.7, "ph": 6.0})
+    assert alerts == [("ec_low", OUTCOME_TRIGGERED)]
+    engine.process(600, {"ph": 6.5})
+    assert alerts[-1] == ("ph_drift", OUTCOME_TRIGGERED)
+
+
+def test_a_bad_rule_does_not_stop_the_others():
+    alerts, on_alert = collect()
+    engine = RulesEngine(build_rules([
+        {"name": "broken", "type": "sustained", "column": "ph", "below": 5.5},
+        {"name": "ph_low", "type": "threshold", "column": "ph", "below": 5.5},
+    ]), on_alert)
+    engine.process(0, {"ph": 5.0})
+    assert alerts == [("ph_low", OUTCOME_TRIGGERED)]
+
+
+def test_missing_data_rule():
+    alerts, on_alert = collect()
+    engine = RulesEngine(build_rules([{"name": "silence", "type": "missing_data", "column": "ph",
+                                       "max_gap_minutes": 10}]), on_alert)
+    engine.process(1000, {"ph": 6.0})
+    engine.tick(1000 + 11 * 60)
+    engine.process(1000 + 12 * 60, {"ph": 6.0})
+    assert alerts == [("silence", OUTCOME_TRIGGERED), ("silence", OUTCOME_CLEARED)]
+
+
+def test_set_rules_keeps_alert_state_and_windows():
+    specs = [{"name": "ph_low", "type": "threshold", "column": "ph", "below": 5.5},
+             {"name": "ec_low", "type": "sustained", "column": "ec", "below": 0.8, "window_minutes": 10}]
+    alerts, on_alert = collect()
+    engine = RulesEngine(build_rules(specs), on_alert)
+    for t in range(0, 600, 60):
+        engine.process(t, {"ph": 5.0, "ec": 0.7})
+    assert len(alerts) == 2
+    engine.set_rules(build_rules(specs))
+    assert isinstance(engine.rules[1], SustainedRule) and len(engine.rules[1].window) == 10
+    engine.process(600, {"ph": 5.0, "ec": 0.7})
+    assert len(alerts) == 2
+    engine.process(660, {"ph": 6.0, "ec": 1.0})
+    assert alerts[2:] == [("ph_low", OUTCOME_CLEARED), ("ec_low", OUTCOME_CLEARED)]
+
+
+def test_rules_rebuilt_only_when_sensor_rules_change(tmp_path, monkeypatch):
+    store = config_store.ConfigStore(path=str(tmp_path / "config.json"), poll_interval=0)
+    monkeypatch.setattr(config_store, "config_store", store)
+    monkeypatch.setattr(acquisition.client, "subscribe", lambda *args, **kwargs: None)
+    engine = start_rules_engine(socket_path=str(tmp_path / "sock"), on_alert=lambda *args: None)
+    rules = engine.rules
+    store.update({"automation": {"schedules": {"timelapse": {"enabled": True}}}})
+    assert engine.rules is rules
+    store.update({"automation": {"triggers": {"sensor_rules": [
+        {"name": "ph_high", "type": "threshold", "column": "ph", "above": 7}]}}})
+    assert [r.name for r in engine.rules] == ["ph_high"]
+    assert isinstance(engine.rules[0], ThresholdRule)
@@ -0,0 +1,351 @@
+# File: data/bulk_import.py
+"""
+Parallel bulk import of historical sensor and event logs.
+
+Large CSV files are split into byte ranges aligned to line boundaries, and
+each range is parsed by a worker process into a columnar batch: sensor
+chunks become an int64 array of Unix timestamps plus one float64 array
+per schema column (NaN where a row has no value), saved as .npz. Rows are
+projected exactly as data.records reads them, so anything the dashboard
+helpers would skip (short rows, unparsable values or timestamps) is
+skipped here too and counted.
+
+The batches are then merged in the parent: deduplicated on (timestamp,
+sensor), with the destination's existing values and earlier sources
+winning, sorted and written atomically as a wide sensor_data.csv. Event
+logs (legacy or structured) are merged the same way, deduplicated on
+(timestamp, event, pump). Sources may be in the wide or the long sensor layout; long
+rows become one wide row per distinct timestamp.
+
+Progress is printed as chunks finish. Finished chunks are recorded in a
+checkpoint next to the destination, so an interrupted import resumes
+where it stopped; the checkpoint is removed once the destination is
+written.
+
+Usage:
+    python -m data.bulk_import sensors OLD.csv [OLD2.csv ...] --dest data/sensor_data.csv
+    python -m data.bulk_import events OLD.csv [...] --dest data/hydro_events.csv
+        [--workers N] [--chunk-mb 16] [--restart]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import numpy as np
+
+from data import schema
+from data.events import EVENT_FIELDS, format_row
+from data.migrate import _rewrite, is_legacy_header, parse_legacy_row
+from data.records import _Layout
+
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+CHECKPOINT_VERSION = 1
+
+
+def split_chunks(path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Return the header row and [(start, end), ...] byte ranges covering the
+    data rows of 'path', each starting at the beginning of a line.
+    """
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        header = next(csv.reader([header_line.decode("utf-8")]), None)
+        data_start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        bounds = [data_start]
+        pos = data_start + chunk_bytes
+        while pos < size:
+            f.seek(pos - 1)
+            f.readline()
+            start = f.tell()
+            if start >= size:
+                break
+            if start > bounds[-1]:
+                bounds.append(start)
+            pos = start + chunk_bytes
+        bounds.append(size)
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+
+def _read_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start).decode("utf-8", errors="replace")
+
+
+def _to_epoch(stamps):
+    """
+    Unix seconds for timestamp strings; -1 where a string does not parse.
+    """
+    try:
+        return np.array(stamps, dtype="datetime64[s]").astype(np.int64)
+    except ValueError:
+        # Some row is malformed: fall back to one at a time for this chunk.
+        result = np.empty(len(stamps), dtype=np.int64)
+        for i, ts in enumerate(stamps):
+            try:
+                result[i] = np.datetime64(ts, "s").astype(np.int64)
+            except ValueError:
+                result[i] = -1
+        return result
+
+
+def parse_sensor_chunk(path, start, end, header, out_path):
+    """
+    Worker: parse one byte range of a sensor log into a columnar batch saved
+    at 'out_path'. Returns (rows, skipped).
+    """
+    names = [c.name for c in schema.columns()]
+    layout = _Layout(header, names)
+    stamps, values, skipped = [], [], 0
+    for row in csv.reader(io.StringIO(_read_range(path, start, end))):
+        if not row:
+            continue
+        record = layout.project(row)
+        if record is None:
+            skipped += 1
+            continue
+        stamps.append(record[0])
+        values.append(record[1:])
+    epoch = _to_epoch(stamps)
+    matrix = np.array(values, dtype=float).reshape(len(values), len(names))
+    good = epoch >= 0
+    skipped += int((~good).sum())
+    np.savez(out_path, timestamp=epoch[good], **{name: matrix[good, i] for i, name in enumerate(names)})
+    return int(good.sum()), skipped
+
+
+def parse_event_chunk(path, start, end, header, out_path, calibration=None):
+    """
+    Worker: parse one byte range of an event log into rows in EVENT_FIELDS
+    order saved at 'out_path'; legacy rows get their dose volume from the
+    pump 'calibration'. Returns (rows, skipped).
+    """
+    legacy = is_legacy_header(header)
+    rows, skipped = [], 0
+    for row in csv.reader(io.StringIO(_read_range(path, start, end))):
+        if not row:
+            continue
+        if legacy:
+            record = parse_legacy_row(row, calibration)
+            row = format_row(record) if record is not None else None
+        if row is None or len(row) < 2 or not row[0]:
+            skipped += 1
+            continue
+        rows.append([str(v) for v in row[:len(EVENT_FIELDS)]] + [""] * (len(EVENT_FIELDS) - len(row)))
+    columns = np.array(rows, dtype=str).reshape(len(rows), len(EVENT_FIELDS))
+    np.savez(out_path, **{name: columns[:, i] for i, name in enumerate(EVENT_FIELDS)})
+    return len(rows), skipped
+
+
+class Checkpoint:
+    """
+    Which chunks of which sources are parsed, stored as JSON beside the
+    batch files in '<dest>.import/'.
+    """
+
+    def __init__(self, dest, kind, restart=False):
+        self.directory = dest + ".import"
+        self.path = os.path.join(self.directory, "checkpoint.json")
+        if restart:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self.state = {"version": CHECKPOINT_VERSION, "kind": kind, "sources": {}}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") == CHECKPOINT_VERSION and state.get("kind") == kind:
+                self.state = state
+
+    def source(self, path, chunk_bytes):
+        """
+        Checkpoint entry for 'path', reset if the file or chunking changed.
+        """
+        st = os.stat(path)
+        identity = [os.path.abspath(path), st.st_size, st.st_mtime_ns, chunk_bytes]
+        sources = self.state["sources"]
+        entry = sources.get(identity[0])
+        if entry is None or entry["identity"] != identity:
+            index = entry["index"] if entry is not None else len(sources)
+            entry = sources[identity[0]] = {"identity": identity, "index": index, "done": {}}
+        return entry
+
+    def batch_path(self, entry, chunk):
+        return os.path.join(self.directory, f"{entry['index']:04d}-{chunk:06d}.npz")
+
+    def mark_done(self, entry, chunk, rows, skipped):
+        entry["done"][str(chunk)] = [rows, skipped]
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _progress(done_bytes, total_bytes, rows, new_rows, started):
+    elapsed = max(time.monotonic() - started, 1e-9)
+    print(f"\r{done_bytes / max(total_bytes, 1):6.1%}  {rows:,} rows  {new_rows / elapsed:,.0f} rows/s",
+          end="", flush=True)
+
+
+def parse_sources(kind, sources, dest, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES, restart=False,
+                  progress=True, calibration=None):
+    """
+    Parse every chunk of 'sources' not already in the checkpoint, in a
+    process pool. Returns (checkpoint, batch paths in source/chunk order,
+    rows, skipped).
+    """
+    parse = parse_sensor_chunk if kind == "sensors" else partial(parse_event_chunk, calibration=calibration)
+    checkpoint = Checkpoint(dest, kind, restart)
+    jobs, batches, total_bytes, done_bytes = [], [], 0, 0
+    rows = skipped = 0
+    for path in sources:
+        entry = checkpoint.source(path, chunk_bytes)
+        header, chunks = split_chunks(path, chunk_bytes)
+        if not header:
+            continue
+        for i, (start, end) in enumerate(chunks):
+            out = checkpoint.batch_path(entry, i)
+            batches.append(out)
+            total_bytes += end - start
+            if str(i) in entry["done"] and os.path.exists(out):
+                done_bytes += end - start
+                rows += entry["done"][str(i)][0]
+                skipped += entry["done"][str(i)][1]
+            else:
+                jobs.append((entry, i, path, start, end, header, out))
+    if done_bytes and progress:
+        print(f"Resuming: {len(batches) - len(jobs)} of {len(batches)} chunks already parsed.")
+    started, resumed_rows = time.monotonic(), rows
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(parse, path, start, end, header, out): (entry, i, end - start)
+                   for entry, i, path, start, end, header, out in jobs}
+        for future in as_completed(futures):
+            entry, i, size = futures[future]
+            chunk_rows, chunk_skipped = future.result()
+            checkpoint.mark_done(entry, i, chunk_rows, chunk_skipped)
+            rows += chunk_rows
+            skipped += chunk_skipped
+            done_bytes += size
+            if progress:
+                _progress(done_bytes, total_bytes, rows, rows - resumed_rows, started)
+    if progress and jobs:
+        print()
+    return checkpoint, batches, rows, skipped
+
+
+def merge_sensor_batches(batches):
+    """
+    Merge columnar sensor batches, keeping the first value seen for each
+    (timestamp, sensor). Returns (timestamps, {column: values}, duplicates).
+    """
+    names = [c.name for c in schema.columns()]
+    loaded = [np.load(path) for path in batches]
+    ts = np.concatenate([b["timestamp"] for b in loaded]) if loaded else np.empty(0, dtype=np.int64)
+    # Stable, so earlier batches come first among equal timestamps.
+    order = np.argsort(ts, kind="stable")
+    ts = ts[order]
+    unique_ts, row_of = np.unique(ts, return_inverse=True)
+    merged, duplicates = {}, 0
+    for name in names:
+        values = np.concatenate([b[name] for b in loaded])[order] if loaded else np.empty(0)
+        present = ~np.isnan(values)
+        column = np.full(len(unique_ts), np.nan)
+        # First present value per timestamp: np.unique returns first indices.
+        slots, first = np.unique(row_of[present], return_index=True)
+        column[slots] = values[present][first]
+        duplicates += int(present.sum()) - len(slots)
+        merged[name] = column
+    return unique_ts, merged, duplicates
+
+
+def write_sensor_log(dest, timestamps, columns):
+    names = list(columns)
+    stamps = np.datetime_as_string(timestamps.astype("datetime64[s]"), unit="s")
+
+    def rows():
+        matrix = np.column_stack([columns[n] for n in names]) if names else np.empty((len(stamps), 0))
+        for ts, values in zip(stamps, matrix.tolist()):
+            yield [ts.replace("T", " ")] + [
+                "" if v != v else schema.format_value(name, v) for name, v in zip(names, values)]
+    _rewrite(dest, [schema.TIMESTAMP] + names, rows())
+
+
+def merge_event_batches(batches):
+    """
+    Merge event batches, keeping the first row seen for each (timestamp,
+    event, pump), so an event imported once from a legacy and once from a
+    structured log is not doubled. Returns (rows sorted by timestamp,
+    duplicates).
+    """
+    seen, rows, total = set(), [], 0
+    for path in batches:
+        batch = np.load(path)
+        for row in zip(*(batch[name].tolist() for name in EVENT_FIELDS)):
+            total += 1
+            if row[:3] not in seen:
+                seen.add(row[:3])
+                rows.append(row)
+    rows.sort(key=lambda r: r[0])
+    return rows, total - len(rows)
+
+
+def bulk_import(kind, sources, dest, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES, restart=False,
+                progress=True, calibration=None):
+    """
+    Import 'sources' into 'dest' ("sensors" or "events"). The current
+    contents of 'dest', if any, are merged in first and win over duplicates.
+    Returns a summary dict.
+    """
+    if kind not in ("sensors", "events"):
+        raise ValueError(f"Unknown import kind '{kind}'")
+    sources = [os.path.abspath(p) for p in sources]
+    if os.path.exists(dest) and os.path.abspath(dest) not in sources:
+        sources.insert(0, os.path.abspath(dest))
+    started = time.monotonic()
+    checkpoint, batches, rows, skipped = parse_sources(kind, sources, dest, workers, chunk_bytes,
+                                                       restart, progress, calibration)
+    if kind == "sensors":
+        timestamps, columns, duplicates = merge_sensor_batches(batches)
+        write_sensor_log(dest, timestamps, columns)
+        written = len(timestamps)
+    else:
+        merged, duplicates = merge_event_batches(batches)
+        _rewrite(dest, EVENT_FIELDS, merged)
+        written = len(merged)
+    checkpoint.remove()
+    return {"rows": rows, "skipped": skipped, "duplicates": duplicates, "written": written,
+            "seconds": round(time.monotonic() - started, 2)}
+
+
+def main(argv=None):
+    from config_store import config_store
+    parser = argparse.ArgumentParser(description="Bulk import historical sensor or event logs.")
+    parser.add_argument("kind", choices=("sensors", "events"))
+    parser.add_argument("sources", nargs="+", help="CSV files to import")
+    parser.add_argument("--dest", required=True, help="log to merge into (created if missing)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / (1024 * 1024))
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args(argv)
+    summary = bulk_import(args.kind, args.sources, args.dest, args.workers,
+                          max(1, int(args.chunk_mb * 1024 * 1024)), args.restart,
+                          calibration=config_store.get().get("pump_calibration"))
+    print(f"Parsed {summary['rows']:,} rows ({summary['skipped']:,} malformed skipped, "
+          f"{summary['duplicates']:,} duplicates dropped); wrote {summary['written']:,} rows "
+          f"to {args.dest} in {summary['seconds']}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# File: data/downsample.py
+"""
+Downsampled sensor series for charts.
+
+Largest-Triangle-Three-Buckets (LTTB) keeps the first and last point and,
+from each of the buckets in between, the point forming the largest triangle
+with the point kept from the previous bucket and the average of the next
+one. Unlike averaging or striding it keeps isolated extremes such as pH
+spikes, so a few hundred points look like the full series.
+
+series() reads one column for a time range and downsamples it. Results for
+closed ranges (ending before now, so no new row can fall inside them) are
+cached per file, since sensor_data.csv is append-only; a range that runs up
+to now reuses the cached part before today.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from data import schema
+from data.records import read_records
+
+DEFAULT_POINTS = 1000
+CACHE_SIZE = 64
+
+
+def lttb(x, y, threshold):
+    """
+    Return the indices of the 'threshold' points LTTB keeps from the series
+    (x, y); x must be increasing. Returns every index when the series is
+    not longer than 'threshold'.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])[:max(threshold, 0)]
+    # threshold - 2 buckets over the interior points; each has >= 1 point.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    # Every bucket's average from prefix sums in one pass.
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    avg_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / sizes
+    avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / sizes
+    # The bucket after the last one is the final point.
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        # Twice the triangle areas for every candidate in the bucket at once.
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def load_series(path, column, since=None, until=None):
+    """
+    Return (timestamps, values) for 'column' in [since, until): the
+    timestamp strings as a NumPy array and the values as float64. Rows
+    whose timestamp does not parse are dropped.
+    """
+    stamps, values = [], []
+    for ts, value in read_records(path, [column], since=since, until=until):
+        if value is not None:
+            stamps.append(ts)
+            values.append(value)
+    stamps, values = np.array(stamps, dtype=object), np.array(values, dtype=float)
+    try:
+        np.array(stamps, dtype="datetime64[s]")
+    except ValueError:
+        # A malformed timestamp (e.g. a torn row): drop those rows only.
+        keep = np.array([_parses(ts) for ts in stamps], dtype=bool)
+        stamps, values = stamps[keep], values[keep]
+    return stamps, values
+
+
+def _parses(ts):
+    try:
+        np.datetime64(ts, "s")
+    except ValueError:
+        return False
+    return True
+
+
+def downsample(stamps, values, points):
+    """
+    LTTB over timestamp strings and values; returns [[timestamp, value], ...].
+    """
+    if len(stamps) > points:
+        # Seconds since the epoch as the x axis, so gaps in logging count.
+        x = np.array(stamps, dtype="datetime64[s]").astype(np.int64)
+        keep = lttb(x, values, points)
+        stamps, values = stamps[keep], values[keep]
+    return [[ts, round(float(v), 4)] for ts, v in zip(stamps, values)]
+
+
+class SeriesCache:
+    """
+    LRU cache of downsampled series for closed ranges, keyed by the file's
+    identity so a migrated or replaced file is never served from cache.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = SeriesCache()
+
+
+def is_closed(until):
+    """
+    True if no row logged from now on can have a timestamp before 'until'.
+    """
+    return bool(until) and until <= datetime.now().strftime(schema.TIMESTAMP_FORMAT)
+
+
+def _closed_series(path, column, since, until, points):
+    key = None
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None
+    if st is not None:
+        key = (os.path.abspath(path), st.st_dev, st.st_ino, column, since, until, points)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    stamps, values = load_series(path, column, since, until)
+    result = {"column": column, "points": downsample(stamps, values, points), "raw_count": len(values)}
+    if key is not None:
+        cache.put(key, result)
+    return result
+
+
+def series(path, column, since=None, until=None, points=DEFAULT_POINTS):
+    """
+    Return {"column", "points": [[timestamp, value], ...], "raw_count"} for
+    'column' in [since, until), reduced to at most 'points' points.
+
+    A range still open at the end is split at midnight: the part before
+    today comes from the cache, and only today's rows are read and merged
+    into it with a second, small LTTB pass.
+    """
+    column = schema.ALIASES.get(column, column)
+    if is_closed(until):
+        return _closed_series(path, column, since, until, points)
+    today = datetime.now().strftime("%Y-%m-%d")
+    if since and since >= today:
+        stamps, values = load_series(path, column, since, until)
+        return {"column": column, "points": downsample(stamps, values, points), "raw_count": len(values)}
+    closed = _closed_series(path, column, since, today, points)
+    stamps, values = load_series(path, column, today, until)
+    merged_stamps = np.array([p[0] for p in closed["points"]] + list(stamps), dtype=object)
+    merged_values = np.concatenate(([p[1] for p in closed["points"]], values))
+    return {"column": column, "points": downsample(merged_stamps, merged_values, points),
+            "raw_count": closed["raw_count"] + len(values)}
@@ -0,0 +1,179 @@
+# File: data/events.py
+"""
+Structured event records for hydro_events.csv.
+
+Every row has the same typed columns (see EVENT_FIELDS). Dosing events fill
+in the pump, run time, dispensed volume, the sensor reading that triggered
+the dose and the outcome; other events leave those columns empty and use
+'details' for free text. Files still in the legacy timestamp,event,details
+layout are read through data.migrate's parser until they are migrated.
+"""
+
+import csv
+import heapq
+import os
+import re
+import time
+
+EVENT_FIELDS = ["timestamp", "event", "pump", "seconds", "ml", "reading", "outcome", "details"]
+NUMERIC_FIELDS = ("seconds", "ml", "reading")
+
+# Values for the 'outcome' column.
+OUTCOME_DOSED = "dosed"
+OUTCOME_LIMIT_REACHED = "limit_reached"
+OUTCOME_ERROR = "error"
+# Alert events (see controller/rules.py).
+OUTCOME_TRIGGERED = "triggered"
+OUTCOME_CLEARED = "cleared"
+
+# Timestamps as the logger writes them; rows torn by a power cut do not match.
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+
+
+def dose_volume_ml(pump_name, seconds, calibration):
+    """
+    Volume dispensed by running 'pump_name' for 'seconds', from the pump's
+    calibration (measured_ml over test_run_seconds). None if uncalibrated.
+    """
+    entry = (calibration or {}).get(pump_name)
+    if not entry or seconds is None:
+        return None
+    try:
+        rate = float(entry["measured_ml"]) / float(entry["test_run_seconds"])
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
+    return round(rate * seconds, 2)
+
+
+def format_row(record):
+    """
+    Return the CSV fields for an event dict, with empty strings for missing values.
+    """
+    return ["" if record.get(name) is None else record[name] for name in EVENT_FIELDS]
+
+
+def _number(value):
+    if value == "" or value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _typed(row):
+    record = dict(zip(EVENT_FIELDS, row))
+    for name in EVENT_FIELDS:
+        record.setdefault(name, "")
+    for name in NUMERIC_FIELDS:
+        record[name] = _number(record[name])
+    for name in ("pump", "outcome"):
+        record[name] = record[name] or None
+    return record
+
+
+def _open_rows(path):
+    """
+    Yield rows in EVENT_FIELDS order, converting legacy rows on the fly.
+    """
+    from data.migrate import is_legacy_header, parse_legacy_row
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is not None and is_legacy_header(header):
+            for row in reader:
+                record = parse_legacy_row(row)
+                if record is not None:
+                    yield format_row(record)
+        else:
+            yield from reader
+
+
+def read_events(path):
+    """
+    Yield each event in 'path' as a dict with typed numeric fields.
+    """
+    if not os.path.exists(path):
+        return
+    for row in _open_rows(path):
+        if len(row) >= 2:
+            yield _typed(row)
+
+
+def recent_events(path, count=5):
+    """
+    Return the 'count' newest events, newest first.
+    """
+    return heapq.nlargest(count, read_events(path), key=lambda e: e["timestamp"])
+
+
+def pump_usage_by_day(path, column="seconds"):
+    """
+    Sum the numeric 'column' ("seconds" or "ml") per day and pump:
+    {"YYYY-MM-DD": {pump: total}}. Only dosed events count.
+    """
+    pump_index = EVENT_FIELDS.index("pump")
+    value_index = EVENT_FIELDS.index(column)
+    outcome_index = EVENT_FIELDS.index("outcome")
+    aggregator = {}
+    if not os.path.exists(path):
+        return aggregator
+    for row in _open_rows(path):
+        if len(row) <= outcome_index or row[outcome_index] != OUTCOME_DOSED:
+            continue
+        if not _TIMESTAMP.match(row[0]):
+            continue
+        pump, value = row[pump_index], row[value_index]
+        if not pump or not value:
+            continue
+        try:
+            value = float(value)
+        except ValueError:
+            # A torn or hand-edited row; skip it like the other readers do.
+            continue
+        day = aggregator.setdefault(row[0][:10], {})
+        day[pump] = day.get(pump, 0) + value
+    return aggregator
+
+
+def follow_events(path, poll=1.0, stop=None):
+    """
+    Yield each event appended to 'path' from now on, like tail -f. Yields
+    None after every idle poll so callers can send keepalives or give up.
+    Starts over from the top when the file is replaced or truncated (e.g.
+    by a migration).
+    """
+    f, inode, buffer = None, None, ""
+    try:
+        while stop is None or not stop():
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                st = None
+            if f is not None and (st is None or st.st_ino != inode or st.st_size < f.tell()):
+                f.close()
+                f = None
+                buffer = ""
+                if st is not None:
+                    # Replaced while followed: its rows are new to us, bar the header.
+                    f = open(path, "r", encoding="utf-8", newline="")
+                    f.readline()
+                    inode = st.st_ino
+            elif f is None and st is not None:
+                f = open(path, "r", encoding="utf-8", newline="")
+                f.seek(0, os.SEEK_END)
+                inode = st.st_ino
+            chunk = f.read() if f is not None else ""
+            if chunk:
+                buffer += chunk
+                # Only complete lines; the writer may be mid-row.
+                complete, _, buffer = buffer.rpartition("\n")
+                for row in csv.reader(complete.splitlines()):
+                    if len(row) >= 2 and row[0] != EVENT_FIELDS[0]:
+                        yield _typed(row)
+            else:
+                yield None
+                time.sleep(poll)
+    finally:
+        if f is not None:
+            f.close()
@@ -1,57 +1,174 @@
 # File: data/logger.py
 
+import csv
 import os
-import time
 import datetime
-from smbus2 import SMBus
+import threading
+
+from data import schema
+from data.events import EVENT_FIELDS, dose_volume_ml, format_row
+from profiling import profiler
 
 EVENT_LOG = os.path.join(os.path.dirname(__file__), "hydro_events.csv")
 SENSOR_LOG = os.path.join(os.path.dirname(__file__), "sensor_data.csv")
+PLANT_HEALTH_LOG = os.path.join(os.path.dirname(__file__), "plant_health.csv")
 
 def init_event_log():
     if not os.path.isfile(EVENT_LOG):
         with open(EVENT_LOG, "w", encoding="utf-8") as f:
-            f.write("timestamp,event,details\n")
+            f.write(",".join(EVENT_FIELDS) + "\n")
+        return
+    # Convert a log written before structured events (keeps a .legacy.bak copy).
+    from data.migrate import migrate_event_log
+    count = migrate_event_log(EVENT_LOG, _pump_calibration())
+    if count is not None:
+        print(f"Migrated {count} legacy events in {EVENT_LOG}.")
+
+# Column order of each sensor log, read from its header once.
+_sensor_columns = {}
 
 def init_sensor_log():
     if not os.path.isfile(SENSOR_LOG):
         with open(SENSOR_LOG, "w", encoding="utf-8") as f:
-            f.write("timestamp,sensor_name,value\n")
+            f.write(",".join(schema.header()) + "\n")
+    else:
+        # Long-format logs become wide; wide logs gain newly registered columns.
+        from data.migrate import migrate_sensor_log
+        count = migrate_sensor_log(SENSOR_LOG)
+        if count is not None:
+            print(f"Rewrote {SENSOR_LOG} with {count} wide sensor records.")
+    _sensor_columns.pop(SENSOR_LOG, None)
 
-def log_event(event, details=""):
-    now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(EVENT_LOG, "a", encoding="utf-8") as f:
-        f.write("{},{},{}\n".format(now_str, event, details))
+def _columns_of(path):
+    columns = _sensor_columns.get(path)
+    if columns is None:
+        if not os.path.isfile(path):
+            init_sensor_log()
+        from data.records import read_header
+        columns = _sensor_columns[path] = read_header(path)[1:]
+    return columns
 
-def log_sensor(sensor_name, value):
-    now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def init_plant_health_log():
+    if not os.path.isfile(PLANT_HEALTH_LOG):
+        with open(PLANT_HEALTH_LOG, "w", encoding="utf-8") as f:
+            f.write("timestamp,source,green_percentage,yellow_brown_percentage\n")
+
+def init_logger():
+    init_event_log()
+    init_sensor_log()
+
+def _pump_calibration():
+    from config_store import config_store
+    return config_store.get().get("pump_calibration")
+
+def _fleet_settings():
+    from config_store import config_store
+    return config_store.get().get("fleet", {})
+
+# Fleet mode: every logged record is also queued for upload to the
+# aggregator (see data/uploader.py). The spool is created on first use.
+_spool = None
+_spool_lock = threading.Lock()
+
+def _fleet_spool():
+    global _spool
+    settings = _fleet_settings()
+    if not settings.get("enabled"):
+        return None
+    if _spool is None:
+        from data.uploader import Spool
+        with _spool_lock:
+            if _spool is None:
+                _spool = Spool(batch_size=settings.get("batch_size", 500),
+                               flush_seconds=settings.get("flush_seconds", 30),
+                               max_bytes=int(settings.get("max_spool_mb", 50) * 1024 * 1024))
+    return _spool
+
+def _forward(kind, record):
+    spool = _fleet_spool()
+    if spool is not None:
+        spool.put(kind, record)
+
+def start_uploader():
+    """
+    Start shipping spooled records to the aggregator if fleet mode is
+    enabled. Returns the Uploader or None.
+    """
+    spool = _fleet_spool()
+    if spool is None:
+        return None
+    from data.uploader import start_uploader as start
+    return start(_fleet_settings(), spool)
+
+def flush_uploads():
+    """
+    Write buffered records to the spool, e.g. before shutting down.
+    """
+    if _spool is not None:
+        _spool.flush()
+
+def log_event(event, details="", pump=None, seconds=None, ml=None, reading=None, outcome=None):
+    """
+    Append a structured event. For pump runs pass 'pump' and 'seconds';
+    'ml' is filled in from the pump calibration when not given.
+    """
+    if ml is None and pump and seconds is not None:
+        ml = dose_volume_ml(pump, seconds, _pump_calibration())
+    record = {
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "event": event,
+        "pump": pump,
+        "seconds": seconds,
+        "ml": ml,
+        "reading": reading,
+        "outcome": outcome,
+        "details": details,
+    }
+    with open(EVENT_LOG, "a", encoding="utf-8", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerow(format_row(record))
+    _forward("event", record)
+
+def log_record(values, timestamp=None):
+    """
+    Append one sampling cycle as a wide row. 'values' maps column names (or
+    aliases such as "pH") to numbers; columns without a value stay empty.
+    """
+    columns = _columns_of(SENSOR_LOG)
+    values = {schema.ALIASES.get(k, k): v for k, v in values.items()}
+    unknown = set(values) - set(columns)
+    if unknown:
+        raise KeyError(f"No column for {sorted(unknown)} in {SENSOR_LOG}; register the probe in data.schema")
+    now_str = timestamp or datetime.datetime.now().strftime(schema.TIMESTAMP_FORMAT)
+    fields = [schema.format_value(name, values.get(name)) for name in columns]
     with open(SENSOR_LOG, "a", encoding="utf-8") as f:
-        f.write("{},{},{}\n".format(now_str, sensor_name, value))
+        f.write(now_str + "," + ",".join(fields) + "\n")
+    _forward("sensor", {"timestamp": now_str, "values": values})
+
+def log_sensor(sensor_name, value):
+    """
+    Append a single reading. Prefer log_record() for a whole cycle.
+    """
+    log_record({sensor_name: float(value)})
+
+def log_plant_health(timestamp, source, green_percentage, yellow_brown_percentage):
+    init_plant_health_log()
+    with open(PLANT_HEALTH_LOG, "a", encoding="utf-8") as f:
+        f.write("{},{},{:.2f},{:.2f}\n".format(timestamp, source, green_percentage, yellow_brown_percentage))
+
+def log_reading(timestamp, values):
+    """
+    Log a cycle published by the acquisition daemon (Unix timestamp, values).
+    """
+    with profiler.iteration("sensor_logger"):
+        log_record(values, datetime.datetime.fromtimestamp(timestamp).strftime(schema.TIMESTAMP_FORMAT))
 
-def start_continuous_logging(sensor_obj, interval=10):
+def start_continuous_logging(socket_path=None):
     """
-    Run in a background thread to continuously read pH & EC from 'sensor_obj'
-    every 'interval' seconds and log to sensor_data.csv.
+    Subscribe to the acquisition daemon and log one wide row to
+    sensor_data.csv for every cycle it publishes. Runs in a background
+    thread that reconnects if the daemon restarts; returns the thread.
     """
+    from acquisition.client import subscribe
+    from acquisition.daemon import DEFAULT_SOCKET
     init_sensor_log()
-    print("Starting continuous sensor logging. Press Ctrl+C to stop.")
-    try:
-        while True:
-            # 1) read pH
-            ph_val = sensor_obj.read_ph_sensor()
-            if ph_val is not None:
-                log_sensor("pH", "{:.2f}".format(ph_val))
-
-            # 2) read EC
-            ec_dict = sensor_obj.read_ec_sensor()  # e.g. {"ec":..., "tds":..., ...}
-            if ec_dict and ec_dict.get("ec") is not None:
-                ec_val = ec_dict["ec"]
-                log_sensor("EC", "{:.2f}".format(ec_val))
-
-            time.sleep(interval)
-
-    except KeyboardInterrupt:
-        print("\nStopped continuous logging.")
-    finally:
-        if hasattr(sensor_obj, "close"):
-            sensor_obj.close()
+    return subscribe(log_reading, socket_path or DEFAULT_SOCKET, name="sensor-logger")
@@ -0,0 +1,196 @@
+# File: data/migrate.py
+"""
+Migrate the data files to their current layouts.
+
+hydro_events.csv: from the legacy timestamp,event,details layout to the
+structured schema in data.events.
+
+Legacy dosing rows carry everything in free text, e.g.
+    2025-02-08 10:00:00,ph_control,pH=5.6 => Dosed pH_up 1s
+which becomes pump=pH_up, seconds=1, reading=5.6, outcome=dosed (and ml
+from the pump calibration, when there is one). Rows that do not match a
+known message are kept with the text in 'details'.
+
+sensor_data.csv: from one long row per sensor (timestamp,sensor_name,value)
+to one wide row per sampling cycle (data.schema). Readings logged within a
+few seconds of each other without repeating a column are one cycle. A wide
+file whose header lacks newly registered columns is rewritten with them.
+
+Usage:
+    python -m data.migrate [path/to/hydro_events.csv [path/to/sensor_data.csv]]
+"""
+
+import csv
+import os
+import re
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+from data import schema
+from data.events import (EVENT_FIELDS, OUTCOME_DOSED, OUTCOME_LIMIT_REACHED,
+                         dose_volume_ml, format_row)
+
+LEGACY_FIELDS = ["timestamp", "event", "details"]
+
+# Messages produced by controller.dosing_logic before structured events.
+_DOSED = re.compile(r"^(?:pH|EC)=(?P<reading>[-+\d.eE]+|None) => Dosed (?P<pump>\w+) (?P<seconds>[\d.]+)s$")
+_LIMIT = re.compile(r"^(?:pH|EC)=(?P<reading>[-+\d.eE]+|None) => limit reached for (?P<pump>\w+)$")
+
+
+def is_legacy_header(header):
+    return [h.strip() for h in header] == LEGACY_FIELDS
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_legacy_row(row, calibration=None):
+    """
+    Convert one legacy CSV row to an event dict, or None if it is unusable.
+    """
+    if len(row) < 2 or not row[0]:
+        return None
+    # Unquoted commas in old free-text details split the field; rejoin them.
+    details = ",".join(row[2:])
+    record = {"timestamp": row[0], "event": row[1]}
+    match = _DOSED.match(details)
+    if match:
+        seconds = float(match["seconds"])
+        record.update(pump=match["pump"], seconds=seconds, reading=_float(match["reading"]),
+                      outcome=OUTCOME_DOSED, ml=dose_volume_ml(match["pump"], seconds, calibration))
+        return record
+    match = _LIMIT.match(details)
+    if match:
+        record.update(pump=match["pump"], reading=_float(match["reading"]),
+                      outcome=OUTCOME_LIMIT_REACHED)
+        return record
+    record["details"] = details
+    return record
+
+
+def migrate_event_log(path, calibration=None, backup=True):
+    """
+    Rewrite a legacy events file in the structured schema. The original is
+    kept as <path>.legacy.bak and the new file replaces it atomically.
+    Returns the number of rows written, or None if 'path' needs no migration.
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None or not is_legacy_header(header):
+            return None
+        records = [r for r in (parse_legacy_row(row, calibration) for row in reader) if r is not None]
+
+    if backup:
+        shutil.copy2(path, path + ".legacy.bak")
+    _rewrite(path, EVENT_FIELDS, (format_row(r) for r in records))
+    return len(records)
+
+
+def _rewrite(path, header, rows):
+    """
+    Replace 'path' atomically with 'header' and 'rows'.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".migrate-", suffix=".csv", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(header)
+            writer.writerows(rows)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _parse_time(ts):
+    try:
+        return datetime.strptime(ts, schema.TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def _long_to_wide(reader, columns, window_seconds):
+    index = {name: i for i, name in enumerate(columns)}
+    current, started = None, None
+    for row in reader:
+        if len(row) < 3:
+            continue
+        name = schema.ALIASES.get(row[1], row[1])
+        value = _float(row[2])
+        if name not in index or value is None:
+            continue
+        when = _parse_time(row[0])
+        if when is None:
+            continue
+        slot = index[name]
+        if (current is None or current[slot] != ""
+                or abs((when - started).total_seconds()) > window_seconds):
+            if current is not None:
+                yield current
+            current, started = [row[0]] + [""] * (len(columns) - 1), when
+        current[slot] = schema.format_value(name, value)
+    if current is not None:
+        yield current
+
+
+def migrate_sensor_log(path, backup=True, window_seconds=10):
+    """
+    Convert a long-format sensor log to wide rows, or add newly registered
+    columns to a wide one. The original is kept as <path>.long.bak (or
+    <path>.bak). Returns the number of rows written, or None if 'path'
+    already has every registered column.
+    """
+    if not os.path.isfile(path):
+        return None
+    header = schema.header()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        existing = next(reader, None)
+        if existing is None or set(header) <= set(existing):
+            return None
+        if schema.is_long_header(existing):
+            suffix = ".long.bak"
+            rows = list(_long_to_wide(reader, header, window_seconds))
+        else:
+            if existing[0] != schema.TIMESTAMP:
+                raise ValueError(f"{path} has an unrecognised header: {existing}")
+            suffix = ".bak"
+            # Keep columns this code no longer registers rather than drop data.
+            header = header + [h for h in existing if h not in header]
+            position = {h: i for i, h in enumerate(existing)}
+            rows = [[row[position[h]] if h in position and position[h] < len(row) else "" for h in header]
+                    for row in reader if row]
+    if backup:
+        shutil.copy2(path, path + suffix)
+    _rewrite(path, header, rows)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from config_store import config_store
+    from data.logger import EVENT_LOG, SENSOR_LOG
+    events_path = sys.argv[1] if len(sys.argv) > 1 else EVENT_LOG
+    sensors_path = sys.argv[2] if len(sys.argv) > 2 else SENSOR_LOG
+    count = migrate_event_log(events_path, config_store.get().get("pump_calibration"))
+    if count is None:
+        print(f"{events_path} is already in the structured format.")
+    else:
+        print(f"Migrated {count} events in {events_path} (backup: {events_path}.legacy.bak).")
+    count = migrate_sensor_log(sensors_path)
+    if count is None:
+        print(f"{sensors_path} already has the current columns.")
+    else:
+        print(f"Wrote {count} wide sensor records to {sensors_path}.")
@@ -0,0 +1,189 @@
+# File: data/records.py
+"""
+Projection readers for sensor_data.csv.
+
+Callers name the columns they need and get (timestamp, value, ...) tuples
+back; only those fields are converted to float. Both the wide layout (one
+row per sampling cycle, see data.schema) and the older long layout
+(timestamp,sensor_name,value) are detected from the header.
+
+Rows are appended in time order, so time-bounded reads binary-search the
+file for their start offset and tail reads scan backwards from the end
+instead of parsing the whole history.
+"""
+
+import csv
+import io
+import os
+import re
+from collections import deque
+
+from data import schema
+
+_TAIL_BLOCK = 8 * 1024
+# Shape of schema.TIMESTAMP_FORMAT; rows torn by a power cut do not match.
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+
+
+def _float(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class _Layout:
+    """
+    How to pull the requested columns out of a row of a given file.
+    """
+
+    def __init__(self, header, names):
+        self.names = [schema.ALIASES.get(n, n) for n in names]
+        self.long = schema.is_long_header(header)
+        if self.long:
+            self.slot = {}
+            for i, name in enumerate(self.names):
+                self.slot.setdefault(name, i)
+        else:
+            positions = {h.strip(): i for i, h in enumerate(header)}
+            self.indices = [positions.get(name) for name in self.names]
+
+    def project(self, row):
+        """
+        Return (timestamp, values...) for 'row', or None if it has none of
+        the requested values.
+        """
+        if len(row) < 2:
+            return None
+        if self.long:
+            slot = self.slot.get(schema.ALIASES.get(row[1], row[1]))
+            if slot is None or len(row) < 3:
+                return None
+            value = _float(row[2])
+            if value is None:
+                return None
+            values = [None] * len(self.names)
+            values[slot] = value
+            return (row[0], *values)
+        values = [_float(row[i]) if i is not None and i < len(row) else None for i in self.indices]
+        if all(v is None for v in values):
+            return None
+        return (row[0], *values)
+
+
+def read_header(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f), None)
+
+
+def _line_start_at_or_after(f, pos, data_start):
+    if pos <= data_start:
+        return data_start
+    f.seek(pos - 1)
+    f.readline()
+    return f.tell()
+
+
+def _offset_since(f, since, data_start, size):
+    """
+    Byte offset of the first row whose timestamp is >= 'since'.
+    """
+    key = since.encode("utf-8")
+    lo, hi = data_start, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start = _line_start_at_or_after(f, mid, data_start)
+        f.seek(start)
+        line = f.readline()
+        # Compare against the next well-formed row, not a torn one.
+        while line and not _TIMESTAMP.match(line.split(b",", 1)[0].decode("utf-8", "replace")):
+            line = f.readline()
+        if not line or line[:len(key)] >= key:
+            hi = mid
+        else:
+            lo = mid + 1
+    return _line_start_at_or_after(f, lo, data_start)
+
+
+def read_records(path, columns, since=None, until=None):
+    """
+    Yield (timestamp, value, ...) for each row that has at least one of
+    'columns' (schema names or aliases such as "pH"). Missing values are
+    None. 'since'/'until' bound the timestamp (inclusive/exclusive) and can
+    be prefixes such as "2025-02-08".
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as raw:
+        header_line = raw.readline()
+        header = next(csv.reader([header_line.decode("utf-8")]), None)
+        if not header:
+            return
+        layout = _Layout(header, columns)
+        data_start = raw.tell()
+        if since:
+            raw.seek(_offset_since(raw, since, data_start, os.fstat(raw.fileno()).st_size))
+        else:
+            raw.seek(data_start)
+        with io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="") as f:
+            for row in csv.reader(f):
+                if not row or not _TIMESTAMP.match(row[0]):
+                    continue
+                if until and row[0] >= until:
+                    break
+                record = layout.project(row)
+                if record is not None:
+                    yield record
+
+
+def tail(path, column, count):
+    """
+    Return the last 'count' [timestamp, value] pairs that have 'column',
+    oldest first. Reads backwards from the end of the file in blocks.
+    """
+    if not os.path.exists(path) or count <= 0:
+        return []
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]), None)
+        if not header:
+            return []
+        layout = _Layout(header, [column])
+        data_start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        block = _TAIL_BLOCK
+        while True:
+            start = max(data_start, size - block)
+            f.seek(start)
+            chunk = f.read(size - start)
+            lines = chunk.split(b"\n")
+            if start > data_start:
+                # The first line is probably cut off; the next pass covers it.
+                lines = lines[1:]
+            found = deque(maxlen=count)
+            # Rows garbled by a torn write are dropped, as in read_records().
+            for row in csv.reader(line.decode("utf-8", errors="replace") for line in lines if line):
+                if not row or not _TIMESTAMP.match(row[0]):
+                    continue
+                record = layout.project(row)
+                if record is not None:
+                    found.append([record[0], record[1]])
+            if len(found) >= count or start == data_start:
+                return list(found)
+            block *= 4
+
+
+def value_range(path, column, since, until=None):
+    """
+    Return (min, max) of 'column' for rows in [since, until), or (None, None).
+    """
+    low = high = None
+    for _, value in read_records(path, [column], since=since, until=until):
+        if value is None:
+            continue
+        if low is None or value < low:
+            low = value
+        if high is None or value > high:
+            high = value
+    return low, high
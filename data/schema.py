@@ -0,0 +1,95 @@
+# File: data/schema.py
+"""
+Column registry for wide sensor records.
+
+sensor_data.csv stores one row per sampling cycle: a timestamp followed by
+one typed column per parameter the probes report. Each probe type registers
+the columns it produces, in the order the device returns them, and the file
+header is the timestamp plus every registered column. Adding a probe type
+(dissolved oxygen, ORP, temperature, ...) therefore only adds columns;
+readers look columns up by name, so older files keep working.
+"""
+
+from collections import namedtuple
+
+TIMESTAMP = "timestamp"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Header of the pre-wide file layout, one row per sensor per cycle.
+LONG_HEADER = ["timestamp", "sensor_name", "value"]
+
+Column = namedtuple("Column", "name probe unit precision label")
+
+_probes = {}
+_columns = {}
+
+
+def register_probe(probe, columns):
+    """
+    Register a probe type and its columns as (name, unit, precision, label)
+    tuples, in the order the device reports them.
+    """
+    entries = []
+    for name, unit, precision, label in columns:
+        existing = _columns.get(name)
+        if existing is not None and existing.probe != probe:
+            raise ValueError(f"Column '{name}' is already registered by probe '{existing.probe}'")
+        entries.append(Column(name, probe, unit, precision, label))
+    _probes[probe] = entries
+    for column in entries:
+        _columns[column.name] = column
+
+
+# Atlas Scientific EZO circuits. The EC circuit reports all four values in
+# one reading, the DO circuit reports mg/L and % saturation.
+register_probe("ph", [("ph", "", 2, "pH")])
+register_probe("ec", [("ec", "", 2, "EC"),
+                      ("tds", "ppm", 1, "TDS"),
+                      ("sal", "PSU", 2, "Salinity"),
+                      ("sg", "", 3, "SG")])
+register_probe("do", [("do", "mg/L", 2, "DO"),
+                      ("do_sat", "%", 1, "DO saturation")])
+register_probe("orp", [("orp", "mV", 1, "ORP")])
+register_probe("rtd", [("temperature", "C", 2, "Temperature")])
+
+# Sensor names used by the long format and the existing app helpers.
+ALIASES = {"pH": "ph", "EC": "ec", "TDS": "tds", "temp": "temperature"}
+
+
+def probe_columns(probe):
+    """
+    Column names of 'probe' in device order.
+    """
+    return [c.name for c in _probes[probe]]
+
+
+def columns():
+    """
+    All registered columns, grouped by probe in registration order.
+    """
+    return [c for entries in _probes.values() for c in entries]
+
+
+def header():
+    return [TIMESTAMP] + [c.name for c in columns()]
+
+
+def column(name):
+    """
+    Return the Column for 'name' (or one of its ALIASES); KeyError if unknown.
+    """
+    return _columns[ALIASES.get(name, name)]
+
+
+def format_value(name, value):
+    """
+    Format a value for the CSV with the column's precision; '' for missing.
+    """
+    if value is None:
+        return ""
+    precision = _columns[name].precision if name in _columns else 3
+    return f"{float(value):.{precision}f}"
+
+
+def is_long_header(row):
+    return [h.strip() for h in row] == LONG_HEADER
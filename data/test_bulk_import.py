@@ -0,0 +1,60 @@
+# File: data/test_bulk_import.py
+
+import numpy as np
+
+from data.bulk_import import merge_event_batches, merge_sensor_batches
+from data.events import EVENT_FIELDS
+from data.schema import columns
+
+
+def save_sensor_batch(path, timestamps, ph=None, ec=None):
+    nan = np.full(len(timestamps), np.nan)
+    values = {c.name: nan for c in columns()}
+    if ph is not None:
+        values["ph"] = np.array(ph, dtype=float)
+    if ec is not None:
+        values["ec"] = np.array(ec, dtype=float)
+    np.savez(path, timestamp=np.array(timestamps, dtype=np.int64), **values)
+    return path
+
+
+def save_event_batch(path, rows):
+    rows = [row + [""] * (len(EVENT_FIELDS) - len(row)) for row in rows]
+    table = np.array(rows, dtype=str).reshape(len(rows), len(EVENT_FIELDS))
+    np.savez(path, **{name: table[:, i] for i, name in enumerate(EVENT_FIELDS)})
+    return path
+
+
+def test_merge_sensor_batches_sorts_and_dedupes(tmp_path):
+    first = save_sensor_batch(tmp_path / "a.npz", [30, 10], ph=[6.3, 6.1])
+    second = save_sensor_batch(tmp_path / "b.npz", [10, 20], ph=[9.9, 6.2], ec=[1.1, np.nan])
+    timestamps, merged, duplicates = merge_sensor_batches([first, second])
+    assert list(timestamps) == [10, 20, 30]
+    # The earlier batch wins for (10, ph); ec at 10 only exists in the later one.
+    assert list(merged["ph"]) == [6.1, 6.2, 6.3]
+    assert merged["ec"][0] == 1.1
+    assert np.isnan(merged["ec"][1:]).all()
+    assert duplicates == 1
+
+
+def test_merge_sensor_batches_empty():
+    timestamps, merged, duplicates = merge_sensor_batches([])
+    assert len(timestamps) == 0
+    assert duplicates == 0
+    assert all(len(v) == 0 for v in merged.values())
+
+
+def test_merge_event_batches_dedupes_on_time_event_pump(tmp_path):
+    first = save_event_batch(tmp_path / "a.npz", [
+        ["2025-02-08 10:05:00", "ph_control", "pH_up", "2.0", "", "5.5", "dosed"],
+        ["2025-02-08 10:00:00", "ph_control", "pH_up", "2.0", "", "5.4", "dosed"],
+    ])
+    second = save_event_batch(tmp_path / "b.npz", [
+        ["2025-02-08 10:00:00", "ph_control", "pH_up", "2.0", "1.5", "5.4", "dosed"],
+        ["2025-02-08 10:00:00", "ec_control", "nutrientA", "1.0", "", "0.8", "dosed"],
+    ])
+    rows, duplicates = merge_event_batches([first, second])
+    assert duplicates == 1
+    assert [r[0] for r in rows] == ["2025-02-08 10:00:00", "2025-02-08 10:00:00", "2025-02-08 10:05:00"]
+    # The first batch's row is kept, not the later copy with a volume.
+    assert ("2025-02-08 10:00:00", "ph_control", "pH_up", "2.0", "", "5.4", "dosed", "") in rows
@@ -0,0 +1,31 @@
+# File: data/test_downsample.py
+
+import numpy as np
+
+from data.downsample import lttb
+
+
+def test_lttb_short_series_is_kept():
+    assert list(lttb([0, 1, 2], [5, 6, 7], 10)) == [0, 1, 2]
+
+
+def test_lttb_small_thresholds():
+    x = np.arange(100)
+    assert list(lttb(x, x, 2)) == [0, 99]
+    assert list(lttb(x, x, 0)) == []
+
+
+def test_lttb_keeps_endpoints_and_order():
+    x = np.arange(1000)
+    y = np.sin(x / 20.0)
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[567] = 10.0
+    assert 567 in lttb(x, y, 20)
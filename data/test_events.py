@@ -0,0 +1,67 @@
+# File: data/test_events.py
+
+import csv
+
+from data.events import (EVENT_FIELDS, OUTCOME_DOSED, OUTCOME_LIMIT_REACHED, dose_volume_ml, format_row,
+                         pump_usage_by_day, read_events, recent_events)
+from data.migrate import parse_legacy_row
+
+CALIBRATION = {"pH_up": {"measured_ml": 10, "test_run_seconds": 5}}
+
+
+def write_events(path, rows, header=EVENT_FIELDS):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+
+def dose(ts, pump, seconds, outcome=OUTCOME_DOSED):
+    return format_row({"timestamp": ts, "event": "ph_control", "pump": pump, "seconds": seconds,
+                       "reading": 5.4, "outcome": outcome})
+
+
+def test_dose_volume_ml():
+    assert dose_volume_ml("pH_up", 3, CALIBRATION) == 6.0
+    assert dose_volume_ml("pH_down", 3, CALIBRATION) is None
+    assert dose_volume_ml("pH_up", 3, {"pH_up": {"measured_ml": 10, "test_run_seconds": 0}}) is None
+
+
+def test_read_events_types_numeric_fields(tmp_path):
+    path = write_events(tmp_path / "events.csv", [dose("2025-02-08 10:00:00", "pH_up", 2.5),
+                                                  ["2025-02-08 10:01:00", "startup", "", "", "", "", "", "hello"]])
+    first, second = read_events(path)
+    assert first["seconds"] == 2.5 and first["reading"] == 5.4 and first["ml"] is None
+    assert first["pump"] == "pH_up" and first["outcome"] == OUTCOME_DOSED
+    assert second["pump"] is None and second["seconds"] is None and second["details"] == "hello"
+    assert [e["event"] for e in recent_events(path, 1)] == ["startup"]
+
+
+def test_legacy_rows_are_parsed():
+    record = parse_legacy_row(["2025-02-08 10:00:00", "ph_control", "pH=5.40 => Dosed pH_up 3.0s"], CALIBRATION)
+    assert record["pump"] == "pH_up" and record["seconds"] == 3.0 and record["ml"] == 6.0
+    assert record["reading"] == 5.4 and record["outcome"] == OUTCOME_DOSED
+    record = parse_legacy_row(["2025-02-08 10:00:00", "ph_control", "pH=5.40 => limit reached for pH_up"])
+    assert record["outcome"] == OUTCOME_LIMIT_REACHED
+    assert parse_legacy_row(["2025-02-08 10:00:00", "note", "a, b"])["details"] == "a, b"
+
+
+def test_legacy_files_are_read(tmp_path):
+    path = write_events(tmp_path / "events.csv", [["2025-02-08 10:00:00", "ph_control",
+                                                   "pH=5.40 => Dosed pH_up 3.0s"]],
+                        header=["timestamp", "event", "details"])
+    assert pump_usage_by_day(path) == {"2025-02-08": {"pH_up": 3.0}}
+
+
+def test_pump_usage_by_day_skips_malformed_rows(tmp_path):
+    path = write_events(tmp_path / "events.csv", [
+        dose("2025-02-08 10:00:00", "pH_up", 2.0),
+        dose("2025-02-08 11:00:00", "pH_up", 1.5),
+        dose("2025-02-08 12:00:00", "pH_up", 9.0, outcome=OUTCOME_LIMIT_REACHED),
+        dose("2025-02-09 10:00:00", "nutrientA", 4.0),
+        dose("2025-02-09 11:00:00", "nutrientA", "4.\0\0"),
+        dose("\0\0\0\0-02-09 11:00", "nutrientA", 4.0),
+        ["2025-02-09 12:00:00", "ph_control"],
+    ])
+    assert pump_usage_by_day(path) == {"2025-02-08": {"pH_up": 3.5}, "2025-02-09": {"nutrientA": 4.0}}
@@ -0,0 +1,42 @@
+# File: data/test_migrate.py
+
+from data.migrate import _long_to_wide
+from data.schema import header
+
+
+def test_long_to_wide_groups_readings_within_window():
+    rows = [
+        ["2025-02-08 10:00:00", "pH", "6.02"],
+        ["2025-02-08 10:00:01", "EC", "1.2"],
+        ["2025-02-08 10:00:30", "pH", "6.05"],
+    ]
+    wide = list(_long_to_wide(iter(rows), header(), 10))
+    columns = header()
+    assert len(wide) == 2
+    assert wide[0][0] == "2025-02-08 10:00:00"
+    assert float(wide[0][columns.index("ph")]) == 6.02
+    assert float(wide[0][columns.index("ec")]) == 1.2
+    assert wide[1][0] == "2025-02-08 10:00:30"
+    assert wide[1][columns.index("ec")] == ""
+
+
+def test_long_to_wide_starts_new_row_on_repeated_sensor():
+    rows = [
+        ["2025-02-08 10:00:00", "ph", "6.0"],
+        ["2025-02-08 10:00:02", "ph", "6.1"],
+    ]
+    wide = list(_long_to_wide(iter(rows), header(), 10))
+    assert [r[0] for r in wide] == ["2025-02-08 10:00:00", "2025-02-08 10:00:02"]
+
+
+def test_long_to_wide_skips_bad_rows():
+    rows = [
+        ["2025-02-08 10:00:00", "ph", "not a number"],
+        ["2025-02-08 10:00:00", "unknown_sensor", "1.0"],
+        ["garbage", "ph", "6.0"],
+        ["2025-02-08 10:00:01"],
+        ["2025-02-08 10:00:02", "ph", "6.0"],
+    ]
+    wide = list(_long_to_wide(iter(rows), header(), 10))
+    assert len(wide) == 1
+    assert wide[0][0] == "2025-02-08 10:00:02"
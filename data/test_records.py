@@ -0,0 +1,71 @@
+# File: data/test_records.py
+
+from datetime import datetime, timedelta
+
+from data.records import _offset_since, read_records, tail
+
+
+def write_log(path, count, torn_every=0):
+    start = datetime(2025, 2, 8)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("timestamp,ph,ec\n")
+        for i in range(count):
+            ts = (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"{ts},{6 + i % 10 / 100:.2f},1.2\n")
+            # A row torn by a power cut: NUL padding, then part of a row.
+            if torn_every and i % torn_every == 0:
+                f.write("\0\0\0-02-08 00:0\n")
+    return path
+
+
+def test_read_records_all_rows(tmp_path):
+    path = write_log(tmp_path / "sensors.csv", 100)
+    records = list(read_records(path, ["pH", "EC"]))
+    assert len(records) == 100
+    assert records[0] == ("2025-02-08 00:00:00", 6.0, 1.2)
+
+
+def test_read_records_bounds(tmp_path):
+    path = write_log(tmp_path / "sensors.csv", 3000)
+    records = list(read_records(path, ["ph"], since="2025-02-08 10:00:00", until="2025-02-09"))
+    assert records[0][0] == "2025-02-08 10:00:00"
+    assert records[-1][0] == "2025-02-08 23:59:00"
+    assert len(records) == 14 * 60
+    # A date prefix works as a bound too.
+    assert len(list(read_records(path, ["ph"], since="2025-02-09"))) == 3000 - 24 * 60
+
+
+def test_read_records_skips_torn_rows(tmp_path):
+    path = write_log(tmp_path / "sensors.csv", 3000, torn_every=7)
+    assert len(list(read_records(path, ["ph"]))) == 3000
+    records = list(read_records(path, ["ph"], since="2025-02-08 10:00:00", until="2025-02-09"))
+    assert len(records) == 14 * 60
+    assert records[0][0] == "2025-02-08 10:00:00"
+
+
+def test_offset_since(tmp_path):
+    path = write_log(tmp_path / "sensors.csv", 500)
+    with open(path, "rb") as f:
+        data_start = len(f.readline())
+        size = path.stat().st_size
+        assert _offset_since(f, "2025-02-08 00:00:00", data_start, size) == data_start
+        assert _offset_since(f, "2030", data_start, size) == size
+        offset = _offset_since(f, "2025-02-08 01:00:00", data_start, size)
+        f.seek(offset)
+        assert f.readline().startswith(b"2025-02-08 01:00:00,")
+
+
+def test_tail(tmp_path):
+    path = write_log(tmp_path / "sensors.csv", 3000)
+    last = tail(path, "ph", 3)
+    assert [r[0] for r in last] == ["2025-02-10 01:57:00", "2025-02-10 01:58:00", "2025-02-10 01:59:00"]
+    assert len(tail(path, "ph", 5000)) == 3000
+
+
+def test_invalid_bytes_drop_the_row(tmp_path):
+    path = write_log(tmp_path / "sensors.csv", 10)
+    with open(path, "ab") as f:
+        f.write(b"2025-02-08 00:10:00,\xff\xfe,1.2\n\xff2025-02-08 00:11:00,6.0,1.2\n")
+        f.write(b"2025-02-08 00:12:00,6.1,1.2\n")
+    assert [r[0] for r in tail(path, "ph", 2)] == ["2025-02-08 00:09:00", "2025-02-08 00:12:00"]
+    assert len(list(read_records(path, ["ph"]))) == 11
@@ -0,0 +1,104 @@
+# File: data/test_uploader.py
+
+import gzip
+import io
+import json
+import os
+import time
+import urllib.error
+
+import pytest
+
+from data import uploader
+from data.uploader import Spool, Uploader
+
+
+def read_batch(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_spool_writes_full_batches(tmp_path):
+    spool = Spool(str(tmp_path), batch_size=2, flush_seconds=60)
+    spool.put("sensor", {"timestamp": "2025-02-08 10:00:00", "values": {"ph": 6.0}})
+    assert spool.batches() == []
+    spool.put("event", {"timestamp": "2025-02-08 10:00:05", "event": "ph_control"})
+    (path,) = spool.batches()
+    assert [r["kind"] for r in read_batch(path)] == ["sensor", "event"]
+    assert spool.flush() is None
+
+
+def test_spool_flushes_on_the_timer(tmp_path):
+    spool = Spool(str(tmp_path), batch_size=100, flush_seconds=0.05)
+    spool.put("sensor", {"timestamp": "2025-02-08 10:00:00", "values": {"ph": 6.0}})
+    deadline = time.monotonic() + 5
+    while not spool.batches() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(spool.batches()) == 1
+
+
+def test_spool_drops_the_oldest_batches_over_the_limit(tmp_path):
+    spool = Spool(str(tmp_path), batch_size=1, max_bytes=10 ** 9)
+    paths = []
+    for i in range(3):
+        spool.put("sensor", {"timestamp": f"2025-02-08 10:00:0{i}", "values": {"ph": 6.0}})
+        paths.append(spool.batches()[-1])
+    assert spool.batches() == paths
+    spool.max_bytes = int(os.path.getsize(paths[0]) * 2.5)
+    spool.put("sensor", {"timestamp": "2025-02-08 10:00:03", "values": {"ph": 6.0}})
+    assert spool.batches()[0] == paths[2]
+    assert len(spool.batches()) == 2
+
+
+class Response(io.BytesIO):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@pytest.fixture
+def batch(tmp_path):
+    spool = Spool(str(tmp_path), batch_size=1)
+    spool.put("sensor", {"timestamp": "2025-02-08 10:00:00", "values": {"ph": 6.0}})
+    return spool, spool.batches()[0]
+
+
+def test_accepted_batches_are_deleted(batch, monkeypatch):
+    spool, path = batch
+    requests = []
+    monkeypatch.setattr(uploader.urllib.request, "urlopen",
+                        lambda req, timeout: requests.append(req) or Response(b"{}"))
+    assert Uploader(spool, "http://aggregator/ingest", "node-1", token="secret").send(path)
+    assert not os.path.exists(path)
+    (req,) = requests
+    assert req.get_header("X-hydro-node") == "node-1"
+    assert req.get_header("X-hydro-batch") == os.path.basename(path)[:-len(uploader.BATCH_SUFFIX)]
+    assert req.get_header("Authorization") == "Bearer secret"
+
+
+@pytest.mark.parametrize("error, kept", [
+    (urllib.error.HTTPError("http://aggregator/ingest", 503, "Unavailable", {}, None), True),
+    (urllib.error.HTTPError("http://aggregator/ingest", 429, "Too Many Requests", {}, None), True),
+    (urllib.error.URLError("connection refused"), True),
+    (urllib.error.HTTPError("http://aggregator/ingest", 400, "Bad Request", {}, None), False),
+])
+def test_failed_uploads(batch, monkeypatch, error, kept):
+    spool, path = batch
+
+    def urlopen(req, timeout):
+        raise error
+
+    monkeypatch.setattr(uploader.urllib.request, "urlopen", urlopen)
+    sent = Uploader(spool, "http://aggregator/ingest", "node-1").send(path)
+    assert sent is not kept
+    assert os.path.exists(path) is kept
+    # Batches rejected for good are set aside, not retried.
+    assert os.path.exists(os.path.join(spool.directory, "rejected", os.path.basename(path))) is not kept
+
+
+def test_missing_batch_counts_as_sent(batch):
+    spool, path = batch
+    os.remove(path)
+    assert Uploader(spool, "http://aggregator/ingest", "node-1").send(path)
@@ -0,0 +1,231 @@
+# File: data/uploader.py
+"""
+Fleet telemetry upload: store-and-forward of sensor and event records to an
+aggregator (see aggregator.py).
+
+data.logger hands every record it writes to a Spool, which only appends to
+an in-memory buffer. The buffer is written out as a gzip-compressed batch
+file (one JSON record per line) when it reaches the batch size or every
+flush interval, so the control loop never waits on the network. An
+Uploader thread ships the batch files oldest first and deletes each one
+once the aggregator accepts it; while the network is down they stay on
+disk and are retried with exponential back-off. The spool is capped in
+size by dropping the oldest batches; the CSV logs remain the complete
+local record either way.
+
+Settings live under "fleet" in the config store.
+"""
+
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from metrics import FLEET_SPOOL_BATCHES, FLEET_UPLOADS
+
+SPOOL_DIR = os.path.join(os.path.dirname(__file__), "outbox")
+BATCH_SUFFIX = ".jsonl.gz"
+RETRY_MIN_SECONDS = 5
+RETRY_MAX_SECONDS = 300
+# Client errors that mean "try again later" rather than "never accept this".
+RETRYABLE_STATUS = (408, 429)
+
+
+def node_name(settings):
+    return settings.get("node_id") or socket.gethostname()
+
+
+class Spool:
+    """
+    Buffers records in memory and writes them to 'directory' in batches.
+    """
+
+    def __init__(self, directory=SPOOL_DIR, batch_size=500, flush_seconds=30, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._timer = None
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, kind, record):
+        """
+        Queue one record ("sensor" or "event"). Never touches the network.
+        """
+        with self._lock:
+            self._buffer.append(dict(record, kind=kind))
+            full = len(self._buffer) >= self.batch_size
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records as one batch file. Returns its path, or
+        None if there was nothing to write.
+        """
+        with self._lock:
+            records, self._buffer = self._buffer, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not records:
+                return None
+            self._seq += 1
+            name = f"{time.time():.6f}-{os.getpid()}-{self._seq}{BATCH_SUFFIX}"
+        payload = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+        path = os.path.join(self.directory, name)
+        # Written under a temporary name, so the uploader never sees half a batch.
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        self._enforce_limit()
+        return path
+
+    def batches(self):
+        """
+        Pending batch files, oldest first.
+        """
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(BATCH_SUFFIX)]
+        except FileNotFoundError:
+            return []
+        names.sort(key=lambda n: float(n.split("-", 1)[0]))
+        FLEET_SPOOL_BATCHES.set(len(names))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _enforce_limit(self):
+        batches = self.batches()
+        sizes = []
+        for path in batches:
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                sizes.append(0)
+        total = sum(sizes)
+        for path, size in zip(batches, sizes):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                FLEET_UPLOADS.inc(status="dropped")
+            except OSError:
+                pass
+            total -= size
+
+
+class Uploader:
+    """
+    Ships spooled batches to 'url', oldest first, from a daemon thread.
+    """
+
+    def __init__(self, spool, url, node_id, token="", timeout=10):
+        self.spool = spool
+        self.url = url
+        self.node_id = node_id
+        self.token = token
+        self.timeout = timeout
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fleet-uploader", daemon=True)
+        self._thread.start()
+        print(f"Uploading telemetry to {self.url} as node '{self.node_id}'.")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def send(self, path):
+        """
+        POST one batch file. Returns True if it was accepted (or rejected for
+        good and set aside), False if it should be retried.
+        """
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+        except OSError:
+            # Dropped by a spool's size limit since it was listed.
+            return True
+        batch_id = os.path.basename(path)[:-len(BATCH_SUFFIX)]
+        req = urllib.request.Request(self.url, data=body, method="POST", headers={
+            "Content-Type": "application/x-ndjson",
+            "Content-Encoding": "gzip",
+            "X-Hydro-Node": self.node_id,
+            "X-Hydro-Batch": batch_id,
+        })
+        if self.token:
+            req.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            if 400 <= e.code < 500 and e.code not in RETRYABLE_STATUS:
+                print(f"Aggregator rejected batch {batch_id} ({e.code}); moved to rejected/.")
+                FLEET_UPLOADS.inc(status="rejected")
+                rejected = os.path.join(self.spool.directory, "rejected")
+                try:
+                    os.makedirs(rejected, exist_ok=True)
+                    os.replace(path, os.path.join(rejected, os.path.basename(path)))
+                except OSError:
+                    pass
+                return True
+            FLEET_UPLOADS.inc(status="failed")
+            return False
+        except (urllib.error.URLError, OSError):
+            FLEET_UPLOADS.inc(status="failed")
+            return False
+        FLEET_UPLOADS.inc(status="ok")
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _run(self):
+        delay = RETRY_MIN_SECONDS
+        warned = False
+        while not self._stop.is_set():
+            sent_all = True
+            try:
+                for path in self.spool.batches():
+                    if self._stop.is_set() or not self.send(path):
+                        sent_all = False
+                        break
+            except Exception as e:
+                # Never let one bad batch end the thread; retry with back-off.
+                print(f"Telemetry upload error: {e}")
+                sent_all = False
+            if sent_all:
+                if warned:
+                    print("Telemetry upload resumed.")
+                delay, warned = RETRY_MIN_SECONDS, False
+                self._stop.wait(self.spool.flush_seconds)
+            else:
+                if not warned:
+                    print(f"Telemetry upload to {self.url} failed; keeping batches on disk and retrying.")
+                    warned = True
+                self._stop.wait(delay)
+                delay = min(delay * 2, RETRY_MAX_SECONDS)
+
+
+def start_uploader(settings, spool):
+    """
+    Start shipping 'spool' according to the "fleet" settings. Returns the
+    Uploader, or None if fleet mode is off.
+    """
+    if not settings.get("enabled") or not settings.get("url"):
+        return None
+    return Uploader(spool, settings["url"], node_name(settings), settings.get("token", "")).start()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Module: hardware.py
+Lazy registry for the hardware subsystems (camera, GPIO pumps, I2C sensors).
+
+Nothing touches a device, or imports its driver, until the first call to
+registry.get(name). Failed initializations are remembered and retried no more
+often than RETRY_INTERVAL seconds, so a missing device costs one attempt
+instead of one per request and the web app can keep serving in degraded mode.
+"""
+
+import threading
+import time
+
+RETRY_INTERVAL = 30
+
+SNAPSHOT_DIR = "data/snapshots"
+TIMELAPSE_DIR = "data/timelapse"
+
+
+class DeviceUnavailable(RuntimeError):
+    """
+    Raised when a hardware subsystem cannot be initialized.
+    """
+
+
+class _Device:
+    def __init__(self, name, factory, close=None):
+        self.name = name
+        self.factory = factory
+        self.close = close
+        self.instance = None
+        self.error = None
+        self.last_attempt = None
+        self.init_seconds = None
+        self.lock = threading.Lock()
+        self.on_ready = []
+
+
+class HardwareRegistry:
+    """
+    Holds one lazily created instance per registered subsystem.
+    """
+
+    def __init__(self, retry_interval=RETRY_INTERVAL):
+        self._devices = {}
+        self._retry_interval = retry_interval
+
+    def register(self, name, factory, close=None):
+        """
+        Register 'factory' (a no-argument callable returning the device
+        object) under 'name'. 'close' is called with the instance on shutdown.
+        """
+        self._devices[name] = _Device(name, factory, close)
+
+    def on_ready(self, name, callback):
+        """
+        Run callback(instance) once the device is initialized (immediately if
+        it already is).
+        """
+        device = self._devices[name]
+        with device.lock:
+            device.on_ready.append(callback)
+            instance = device.instance
+        if instance is not None:
+            callback(instance)
+
+    def get(self, name):
+        """
+        Return the device instance, initializing it on first use.
+        Raises DeviceUnavailable if it cannot be initialized.
+        """
+        device = self._devices[name]
+        instance = device.instance
+        if instance is not None:
+            return instance
+        with device.lock:
+            if device.instance is not None:
+                return device.instance
+            now = time.time()
+            if device.error and now - device.last_attempt < self._retry_interval:
+                raise DeviceUnavailable(f"{name} unavailable: {device.error}")
+            device.last_attempt = now
+            start = time.monotonic()
+            try:
+                instance = device.factory()
+            except Exception as e:
+                device.error = str(e) or e.__class__.__name__
+                print(f"Hardware '{name}' initialization failed: {device.error}")
+                raise DeviceUnavailable(f"{name} unavailable: {device.error}") from e
+            device.init_seconds = round(time.monotonic() - start, 3)
+            device.error = None
+            device.instance = instance
+            callbacks = list(device.on_ready)
+        for callback in callbacks:
+            try:
+                callback(instance)
+            except Exception as e:
+                print(f"Hardware '{name}' ready callback failed: {e}")
+        return instance
+
+    def peek(self, name):
+        """
+        Return the device instance if it is already initialized, else None.
+        """
+        return self._devices[name].instance
+
+    def status(self):
+        """
+        Health summary for every registered subsystem.
+        """
+        result = {}
+        for name, device in self._devices.items():
+            if device.instance is not None:
+                state = "ready"
+            elif device.error:
+                state = "unavailable"
+            else:
+                state = "not_initialized"
+            result[name] = {
+                "state": state,
+                "error": device.error,
+                "init_seconds": device.init_seconds,
+                "last_attempt": device.last_attempt,
+            }
+        return result
+
+    def close_all(self):
+        for device in self._devices.values():
+            with device.lock:
+                instance, device.instance = device.instance, None
+            if instance is not None and device.close is not None:
+                try:
+                    device.close(instance)
+                except Exception as e:
+                    print(f"Error closing {device.name}: {e}")
+
+
+_camera_attempted = False
+
+
+def _make_camera():
+    global _camera_attempted
+    from camera.camera import PlantCamera
+    # Killing stale camera processes takes seconds of sudo pkill and sleeps;
+    # do it on the first attempt only, not on every retry from a request.
+    first, _camera_attempted = not _camera_attempted, True
+    camera = PlantCamera(snapshot_dir=SNAPSHOT_DIR, timelapse_dir=TIMELAPSE_DIR, cleanup_stale=first)
+    if not camera.available:
+        raise DeviceUnavailable("camera not detected")
+    camera.start()
+    return camera
+
+
+def _make_pumps():
+    from pumps.pumps import init_pumps
+    return init_pumps()
+
+
+def _close_pumps(gpio):
+    gpio.cleanup()
+
+
+def _make_sensors():
+    from sensors import SensorReader
+    return SensorReader()
+
+
+def _close_sensors(sensor):
+    sensor.close()
+
+
+registry = HardwareRegistry()
+registry.register("camera", _make_camera)
+registry.register("pumps", _make_pumps, _close_pumps)
+registry.register("sensors", _make_sensors, _close_sensors)
+
+
+def get_camera():
+    return registry.get("camera")
+
+
+def get_sensors():
+    return registry.get("sensors")
@@ -1,41 +1,81 @@
 # main.py
-import time
-import RPi.GPIO as GPIO
+import threading
 
-from data.logger import init_logger, log_event, log_sensor
-from pumps.pumps import init_pumps
-from sensors.ph_sensor import read_ph
-from sensors.ec_sensor import read_ec
+from acquisition.client import is_running, latest
+from acquisition.daemon import AcquisitionDaemon
+from data.logger import flush_uploads, init_logger, start_continuous_logging, start_uploader
+from hardware import DeviceUnavailable, registry
+from config_store import config_store
 from controller.dosing_logic import simple_ph_control, simple_ec_control
+from controller.rules import start_rules_engine
+from profiling import profiler
+
+# Set by the config store when settings change so the next control cycle
+# runs immediately with the new thresholds.
+config_changed = threading.Event()
+
+# Readings older than this are not acted on (the daemon samples every 10 s).
+MAX_READING_AGE = 180
+
+def on_config_change(snapshot, changed_keys):
+    if changed_keys & {"ph_min", "ph_max", "ec_min"}:
+        config_changed.set()
 
 def main():
     init_logger()
-    init_pumps()
+    config_store.subscribe(on_config_change)
+    # "kill -USR1" (or POST /profiling/loops on the web app) profiles the next cycles.
+    profiler.install_signal_handler()
+    # Pumps are set up by the hardware registry on first use.
+    registry.get("pumps")
+    # The acquisition daemon owns the sensors. Run it in this process unless
+    # a standalone one (python -m acquisition.daemon) is already serving.
+    daemon = None if is_running() else AcquisitionDaemon().start()
+    # One wide row per published cycle goes to sensor_data.csv.
+    start_continuous_logging()
+    # Alert rules run on every published cycle, not just the control cycles.
+    start_rules_engine()
+    # Fleet mode: ship spooled records to the aggregator in the background.
+    start_uploader()
+    last_timestamp = None
 
     try:
         while True:
-            pH_val = read_ph()   # mock or real
-            ec_val = read_ec()   # mock or real
+            with profiler.iteration("control"):
+                config = config_store.get()
+                try:
+                    # Waits for the first cycle after start-up; later calls get
+                    # the last published one straight away.
+                    timestamp, record = latest(timeout=30, max_age=MAX_READING_AGE)
+                except DeviceUnavailable as e:
+                    print(f"Skipping control cycle: {e}")
+                    timestamp, record = None, {}
+                if timestamp is not None and timestamp == last_timestamp:
+                    # Woken early by a config change: never dose twice on one reading.
+                    record = {}
+                last_timestamp = timestamp or last_timestamp
+                pH_val = record.get("ph")
+                ec_val = record.get("ec")
 
-            log_sensor("pH", pH_val)
-            log_sensor("EC", ec_val)
+                if pH_val is not None:
+                    # pH logic; doses and limit hits are logged as structured events
+                    simple_ph_control(pH_val, config["ph_min"], config["ph_max"])
 
-            # pH logic
-            ph_status = simple_ph_control(pH_val)
-            if "Dosed" in ph_status or "limit reached" in ph_status:
-                log_event("ph_control", ph_status)
+                if ec_val is not None:
+                    # EC logic
+                    simple_ec_control(ec_val, config["ec_min"])
 
-            # EC logic
-            ec_status = simple_ec_control(ec_val)
-            if "Dosed" in ec_status or "limit reached" in ec_status:
-                log_event("ec_control", ec_status)
-
-            time.sleep(300)  # wait 5 minutes
+            # wait 5 minutes, or less if the thresholds change
+            config_changed.wait(300)
+            config_changed.clear()
     except KeyboardInterrupt:
         print("Interrupted.")
     finally:
-        GPIO.cleanup()
+        if daemon is not None:
+            daemon.stop()
+        flush_uploads()
+        profiler.remove_pid_file()
+        registry.close_all()
 
 if __name__ == "__main__":
     main()
-
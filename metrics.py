@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Module: metrics.py
+Lightweight in-process instrumentation: counters, gauges and fixed-bucket
+histograms, exposed in Prometheus text format and as JSON.
+
+Recording a value is a dict lookup, a bisect and a few additions under a
+lock, so it is cheap enough to leave on in production hot paths.
+
+Each process only sees what it records itself. 'metrics' holds what the
+web app records and is served at its /metrics. 'acquisition_metrics' holds
+the I2C and sampling metrics, which only the sensor acquisition daemon
+records (in main.py or standalone); the daemon serves them on its own port
+(see serve()).
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Seconds. Covers sub-millisecond CSV scans up to multi-second I2C reads.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    parts = []
+    for name, value in items:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count.
+    """
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def to_dict(self):
+        with self._lock:
+            return {_format_labels(k) or "": v for k, v in self._values.items()}
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down.
+    """
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    samples = Counter.samples
+    to_dict = Counter.to_dict
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram of observed values (usually seconds).
+    """
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, plus sum and count.
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        result = []
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                result.append((self.name + "_bucket", key, cumulative, ("le", _format_value(bound))))
+            result.append((self.name + "_sum", key, total))
+            result.append((self.name + "_count", key, count))
+        return result
+
+    def to_dict(self):
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        result = {}
+        for key, counts, total, count in items:
+            cumulative, buckets = 0, {}
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                buckets[_format_value(bound)] = cumulative
+            result[_format_labels(key) or ""] = {
+                "count": count,
+                "sum": round(total, 6),
+                "avg": round(total / count, 6) if count else None,
+                "buckets": buckets,
+            }
+        return result
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def render_prometheus(self):
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for sample in metric.samples():
+                name, key, value = sample[:3]
+                extra = sample[3] if len(sample) > 3 else None
+                lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return {m.name: {"type": m.type_name, "help": m.help, "values": m.to_dict()} for m in metrics}
+
+
+metrics = MetricsRegistry()
+acquisition_metrics = MetricsRegistry()
+
+
+def serve(registry, port, host="127.0.0.1"):
+    """
+    Serve 'registry' at /metrics and /metrics.json on 'port' from a daemon
+    thread, for processes without a web app. Returns the server.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, mimetype = registry.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, mimetype = json.dumps(registry.to_dict()).encode("utf-8"), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", mimetype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def timed(histogram, **labels):
+    """
+    Decorator recording the wrapped function's duration in 'histogram'.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+# Recorded by the acquisition daemon, which alone talks to the probes.
+I2C_READ_SECONDS = acquisition_metrics.histogram(
+    "hydro_i2c_read_seconds", "Duration of a complete sensor read including retries")
+I2C_RETRIES = acquisition_metrics.counter(
+    "hydro_i2c_retries_total", "Sensor read attempts that had to be retried")
+I2C_FAILURES = acquisition_metrics.counter(
+    "hydro_i2c_failures_total", "Sensor reads that failed after all retries")
+I2C_TIMEOUTS = acquisition_metrics.counter(
+    "hydro_i2c_timeouts_total", "I2C transactions abandoned at their deadline")
+I2C_DEADLINE_MISSES = acquisition_metrics.counter(
+    "hydro_i2c_deadline_misses_total", "Sensor reads given up because their deadline passed")
+I2C_RECOVERIES = acquisition_metrics.counter(
+    "hydro_i2c_recoveries_total", "I2C device re-opens after a failed transaction")
+I2C_CIRCUIT_OPEN = acquisition_metrics.gauge(
+    "hydro_i2c_circuit_open", "1 while an I2C address is backing off after repeated failures")
+SENSOR_CYCLE_SECONDS = acquisition_metrics.histogram(
+    "hydro_sensor_cycle_seconds", "Duration of a full sampling cycle over every probe")
+ACQUISITION_SUBSCRIBERS = acquisition_metrics.gauge(
+    "hydro_acquisition_subscribers", "Consumers connected to the sensor acquisition daemon")
+ACQUISITION_SAMPLES = acquisition_metrics.counter(
+    "hydro_acquisition_samples_total", "Sampling cycles run by the acquisition daemon")
+
+# Recorded in whichever process runs the code; the web app serves its own.
+CSV_SCAN_SECONDS = metrics.histogram(
+    "hydro_csv_scan_seconds", "Time spent scanning CSV data files")
+CAMERA_CAPTURE_SECONDS = metrics.histogram(
+    "hydro_camera_capture_seconds", "Frame capture time")
+CAMERA_ENCODE_SECONDS = metrics.histogram(
+    "hydro_camera_encode_seconds", "JPEG encode time")
+CAMERA_FRAMES_DEDUPED = metrics.counter(
+    "hydro_camera_frames_deduped_total", "Near-duplicate frames linked or skipped instead of written")
+CAMERA_STORAGE_BYTES = metrics.gauge(
+    "hydro_camera_storage_bytes", "Bytes used by stored snapshot and timelapse JPEGs")
+STREAM_CLIENTS = metrics.gauge(
+    "hydro_stream_clients", "Connected live preview clients")
+PUMP_DOSE_SECONDS = metrics.histogram(
+    "hydro_pump_dose_seconds", "Wall-clock duration of pump doses",
+    buckets=(0.5, 1, 2, 5, 10, 30, 60))
+PUMP_DOSES = metrics.counter(
+    "hydro_pump_doses_total", "Pump dose operations")
+FLEET_UPLOADS = metrics.counter(
+    "hydro_fleet_uploads_total", "Telemetry batches by upload result")
+FLEET_SPOOL_BATCHES = metrics.gauge(
+    "hydro_fleet_spool_batches", "Telemetry batches waiting on disk for upload")
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "hydro_http_request_seconds", "Flask request latency by endpoint")
+HTTP_REQUESTS = metrics.counter(
+    "hydro_http_requests_total", "Flask requests by endpoint and status")
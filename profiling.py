@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Module: profiling.py
+On-demand sampling profiler for Flask requests and the controller loops.
+
+Nothing is sampled until profiling is armed, and while it is not, the
+request hook is one flag check and a header lookup and a loop iteration
+is one dict lookup. Once armed, a sampler thread reads the stack of each
+profiled thread every few milliseconds with sys._current_frames(), so the
+profiled code itself is not instrumented. Each profile is saved with its
+route or loop name and timing to PROFILE_DIR and can be downloaded in the
+collapsed-stack format ("a;b;c 12" per line) that flamegraph.pl and
+speedscope read.
+
+Arming:
+  - requests: send "X-Hydro-Profile: 1" with a request, or set a sampled
+    fraction of requests through POST /profiling/requests;
+  - loops: arm_loop(name, iterations), POST /profiling/loops, or
+    "kill -USR1 <pid>" on a process that called install_signal_handler().
+"""
+
+import atexit
+import json
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+PROFILE_DIR = "data/profiles"
+PROFILE_HEADER = "X-Hydro-Profile"
+SAMPLE_INTERVAL = 0.002
+MAX_PROFILES = 200
+# Iterations profiled per loop on SIGUSR1 unless an arm file says otherwise.
+LOOP_ITERATIONS = 5
+ARM_FILE = "arm.json"
+PID_FILE = "controller.pid"
+PROFILE_ID = re.compile(r"^\d{8}_\d{6}_[0-9a-f]{6}$")
+
+_NULL = nullcontext()
+
+
+class Profile:
+    """
+    Stack samples for one request or loop iteration.
+    """
+
+    def __init__(self, kind, name, meta=None, interval=SAMPLE_INTERVAL):
+        self.id = datetime.now().strftime("%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:6]
+        self.kind = kind
+        self.name = name
+        self.meta = dict(meta or {})
+        self.interval = interval
+        self.started = time.time()
+        self.duration = None
+        self.stacks = Counter()
+        self._start = time.perf_counter()
+
+    def add(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.duration = time.perf_counter() - self._start
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "started": datetime.fromtimestamp(self.started).strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+            "samples": sum(self.stacks.values()),
+            "interval_ms": self.interval * 1000,
+            "meta": self.meta,
+        }
+
+    def to_dict(self):
+        return dict(self.summary(), stacks=dict(self.stacks))
+
+
+def collapsed(stacks):
+    """
+    Collapsed-stack text for a {stack: count} mapping, heaviest first.
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in
+                   sorted(stacks.items(), key=lambda item: item[1], reverse=True))
+
+
+class Sampler:
+    """
+    One thread sampling the stacks of every registered thread. It runs only
+    while at least one profile is active.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, thread_id, profile):
+        with self._lock:
+            self._targets[thread_id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                targets = list(self._targets.items())
+            frames = sys._current_frames()
+            for thread_id, profile in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.add(frame)
+            del frames
+            time.sleep(self.interval)
+
+
+class ProfileStore:
+    """
+    Saved profiles as JSON files in 'directory', newest MAX_PROFILES kept.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, keep=MAX_PROFILES):
+        self.directory = directory
+        self.keep = keep
+
+    def _path(self, profile_id):
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def save(self, profile):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(profile.id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(profile.to_dict(), f)
+        os.replace(tmp_path, path)
+        self._prune()
+
+    def _ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted((n[:-5] for n in names if n.endswith(".json") and PROFILE_ID.match(n[:-5])), reverse=True)
+
+    def _prune(self):
+        for profile_id in self._ids()[self.keep:]:
+            try:
+                os.remove(self._path(profile_id))
+            except OSError:
+                pass
+
+    def load(self, profile_id):
+        """
+        The saved profile as a dict, or None if there is no such profile.
+        """
+        if not PROFILE_ID.match(profile_id or ""):
+            return None
+        try:
+            with open(self._path(profile_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list(self):
+        """
+        Summaries of the saved profiles, newest first.
+        """
+        result = []
+        for profile_id in self._ids():
+            data = self.load(profile_id)
+            if data is not None:
+                data.pop("stacks", None)
+                result.append(data)
+        return result
+
+
+class Profiler:
+    """
+    Arming state plus the sampler and store. Use the module-level 'profiler'.
+    """
+
+    def __init__(self, store=None, sampler=None):
+        self.store = store or ProfileStore()
+        self.sampler = sampler or Sampler()
+        self.request_fraction = 0.0
+        self.requests_left = 0
+        self.loops = set()
+        self._loops_armed = {}
+        self._lock = threading.Lock()
+
+    # --- requests -----------------------------------------------------------
+
+    def arm_requests(self, fraction, limit=None):
+        """
+        Profile 'fraction' (0-1) of requests, until 'limit' have been
+        profiled if given. A fraction of 0 disarms.
+        """
+        with self._lock:
+            self.request_fraction = min(max(float(fraction), 0.0), 1.0)
+            self.requests_left = int(limit) if limit else -1
+
+    def _take_request(self, forced):
+        if forced:
+            return True
+        with self._lock:
+            if not self.request_fraction or random.random() >= self.request_fraction:
+                return False
+            if self.requests_left > 0:
+                self.requests_left -= 1
+                if self.requests_left == 0:
+                    self.request_fraction = 0.0
+            return True
+
+    def init_app(self, app):
+        """
+        Install request hooks on a Flask app.
+        """
+        from flask import g, request
+
+        @app.before_request
+        def start_request_profile():
+            if not self.request_fraction and PROFILE_HEADER not in request.headers:
+                return
+            if not self._take_request(request.headers.get(PROFILE_HEADER) not in (None, "", "0")):
+                return
+            profile = Profile("request", request.endpoint or "unmatched",
+                              {"method": request.method, "path": request.path})
+            g.profile = profile
+            self.sampler.add(threading.get_ident(), profile)
+
+        @app.after_request
+        def note_profile_status(response):
+            profile = g.get("profile")
+            if profile is not None:
+                profile.meta["status"] = response.status_code
+                response.headers["X-Hydro-Profile-Id"] = profile.id
+            return response
+
+        @app.teardown_request
+        def finish_request_profile(exc):
+            profile = g.pop("profile", None)
+            if profile is not None:
+                self._finish(profile, exc)
+
+    # --- loops --------------------------------------------------------------
+
+    def arm_loop(self, name, iterations=LOOP_ITERATIONS):
+        with self._lock:
+            self._loops_armed[name] = int(iterations)
+
+    def iteration(self, name):
+        """
+        Context manager around one iteration of loop 'name'; profiles it
+        while the loop is armed.
+        """
+        self.loops.add(name)
+        if name not in self._loops_armed:
+            return _NULL
+        return self._profile_iteration(name)
+
+    @contextmanager
+    def _profile_iteration(self, name):
+        with self._lock:
+            left = self._loops_armed.get(name, 0)
+            if left <= 1:
+                self._loops_armed.pop(name, None)
+            else:
+                self._loops_armed[name] = left - 1
+        profile = Profile("loop", name, {"thread": threading.current_thread().name})
+        self.sampler.add(threading.get_ident(), profile)
+        error = None
+        try:
+            yield profile
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(profile, error)
+
+    def _finish(self, profile, error=None):
+        self.sampler.remove(threading.get_ident())
+        profile.stop()
+        if error is not None:
+            profile.meta["error"] = repr(error)
+        try:
+            self.store.save(profile)
+        except OSError as e:
+            print(f"Could not save profile {profile.id}: {e}")
+
+    def status(self):
+        with self._lock:
+            return {
+                "request_fraction": self.request_fraction,
+                "requests_left": self.requests_left if self.request_fraction else 0,
+                "loops": sorted(self.loops),
+                "loops_armed": dict(self._loops_armed),
+            }
+
+    # --- other processes ----------------------------------------------------
+
+    def install_signal_handler(self):
+        """
+        Arm this process's loops on SIGUSR1 and record its pid and program
+        so the web app can signal it (see signal_controller()). The record
+        is removed at exit.
+        """
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self._arm_from_file())
+        os.makedirs(self.store.directory, exist_ok=True)
+        with open(os.path.join(self.store.directory, PID_FILE), "w", encoding="utf-8") as f:
+            f.write(f"{os.getpid()}\n{os.path.basename(sys.argv[0])}\n")
+        atexit.register(self.remove_pid_file)
+
+    def remove_pid_file(self):
+        path = os.path.join(self.store.directory, PID_FILE)
+        try:
+            if self._read_pid_file()[0] == os.getpid():
+                os.remove(path)
+        except (OSError, ValueError, IndexError):
+            pass
+
+    def _read_pid_file(self):
+        with open(os.path.join(self.store.directory, PID_FILE), "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        return int(lines[0]), lines[1] if len(lines) > 1 else ""
+
+    def _arm_from_file(self):
+        path = os.path.join(self.store.directory, ARM_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                loops = json.load(f).get("loops", {})
+            os.remove(path)
+        except (OSError, ValueError, AttributeError):
+            loops = {}
+        # No file (a bare "kill -USR1"): every loop seen so far.
+        for name, iterations in (loops or {n: LOOP_ITERATIONS for n in self.loops}).items():
+            self.arm_loop(name, iterations)
+
+    def signal_controller(self, loops):
+        """
+        Ask the process that called install_signal_handler() to profile
+        'loops' ({name: iterations}). Returns False if it is not running,
+        or if its pid now belongs to a different program.
+        """
+        try:
+            pid, program = self._read_pid_file()
+            # A stale pid may now belong to another process, which SIGUSR1 would kill.
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                args = [os.path.basename(a.decode("utf-8", "replace")) for a in f.read().split(b"\0")]
+            if not program or program not in args:
+                return False
+            path = os.path.join(self.store.directory, ARM_FILE)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"loops": loops}, f)
+            os.replace(path + ".tmp", path)
+            os.kill(pid, signal.SIGUSR1)
+        except (OSError, ValueError):
+            return False
+        return True
+
+
+profiler = Profiler()
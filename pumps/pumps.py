@@ -2,10 +2,12 @@
 """
 Module: pumps.py
 This module provides functionality to initialize and control pumps using Raspberry Pi GPIO.
+RPi.GPIO is imported and the pins are set up on first use through the hardware registry.
 """
 
 import time
-import RPi.GPIO as GPIO
+from hardware import registry
+from metrics import PUMP_DOSE_SECONDS, PUMP_DOSES
 
 # Define pump GPIO pins as (enable_pin, input_pin)
 pump_pins = {
@@ -18,8 +20,9 @@ pump_pins = {
 
 def init_pumps():
     """
-    Initializes GPIO settings for all pumps.
+    Initializes GPIO settings for all pumps and returns the GPIO module.
     """
+    import RPi.GPIO as GPIO
     GPIO.setmode(GPIO.BCM)
     GPIO.setwarnings(False)
     for (en_pin, in_pin) in pump_pins.values():
@@ -27,12 +30,19 @@ def init_pumps():
         GPIO.setup(in_pin, GPIO.OUT)
         GPIO.output(en_pin, GPIO.LOW)
         GPIO.output(in_pin, GPIO.LOW)
+    return GPIO
+
+def _gpio():
+    # Initializes the pins on the first call; raises DeviceUnavailable
+    # when GPIO is not available on this machine.
+    return registry.get("pumps")
 
 def pump_on(pump_name):
     """
     Activates the specified pump.
     """
     en_pin, in_pin = pump_pins[pump_name]
+    GPIO = _gpio()
     GPIO.output(in_pin, GPIO.HIGH)
     GPIO.output(en_pin, GPIO.HIGH)
 
@@ -41,6 +51,7 @@ def pump_off(pump_name):
     Deactivates the specified pump.
     """
     en_pin, in_pin = pump_pins[pump_name]
+    GPIO = _gpio()
     GPIO.output(in_pin, GPIO.LOW)
     GPIO.output(en_pin, GPIO.LOW)
 
@@ -48,15 +59,18 @@ def dose_pump(pump_name, seconds):
     """
     Turns on the specified pump for 'seconds' seconds, then turns it off.
     """
+    start = time.perf_counter()
     pump_on(pump_name)
     time.sleep(seconds)
     pump_off(pump_name)
+    PUMP_DOSE_SECONDS.observe(time.perf_counter() - start, pump=pump_name)
+    PUMP_DOSES.inc(pump=pump_name)
 
 if __name__ == "__main__":
     print("Initializing pumps...")
-    init_pumps()
+    _gpio()
     print("Dosing pump pH_up for 3 seconds...")
     dose_pump("pH_up", 3)
     print("Done.")
-    GPIO.cleanup()
+    registry.close_all()
 
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Module: render_cache.py
+Version-keyed render cache for template fragments and whole pages.
+
+Each fragment is cached together with the version of the data it was
+rendered from (for CSV-backed data, the file's mtime and size). A fragment
+is only re-rendered when that version changes. Whole pages get an ETag built
+from the same versions, so a client that already has the current page gets
+a 304 before any data is read or any template is rendered.
+"""
+
+import hashlib
+import os
+import threading
+
+from flask import make_response, request
+from markupsafe import Markup
+
+
+def file_version(path):
+    """
+    Cheap version stamp for a data file: (mtime_ns, size), or None if missing.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+
+
+class RenderCache:
+    """
+    Keeps the latest rendering of each named fragment and page.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fragments = {}
+        self._pages = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self._pages.clear()
+
+    def fragment(self, name, version, render):
+        """
+        Return the cached HTML for 'name' if it was rendered at 'version',
+        otherwise call render() and cache the result.
+        """
+        with self._lock:
+            cached = self._fragments.get(name)
+            if cached is not None and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        html = Markup(render())
+        with self._lock:
+            self._fragments[name] = (version, html)
+        return html
+
+    def page(self, name, versions, render):
+        """
+        Serve a whole page keyed on 'versions' (a tuple of data versions).
+        Answers 304 when the client's If-None-Match matches, reuses the
+        cached body when nothing changed, and otherwise calls render().
+        """
+        etag = make_etag(name, versions)
+        if request.if_none_match.contains(etag):
+            response = make_response("", 304)
+        else:
+            with self._lock:
+                cached = self._pages.get(name)
+            if cached is not None and cached[0] == etag:
+                body = cached[1]
+            else:
+                body = render()
+                with self._lock:
+                    self._pages[name] = (etag, body)
+            response = make_response(body)
+        response.set_etag(etag)
+        # Let browsers keep the page but always revalidate it.
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+render_cache = RenderCache()
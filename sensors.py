@@ -4,18 +4,29 @@ Module: sensors.py
 This module provides the SensorReader class to interface with Atlas Scientific sensors for pH and EC.
 """
 
+import threading
 import time
-from atlas_i2c import AtlasI2C
+from atlas_i2c import AtlasI2C, CircuitOpen
+from data.schema import probe_columns
+from metrics import (I2C_DEADLINE_MISSES, I2C_FAILURES, I2C_READ_SECONDS, I2C_RETRIES,
+                     SENSOR_CYCLE_SECONDS, timed)
+
+# Seconds one probe read, retries included, may take.
+READ_DEADLINE = 12.0
 
 class SensorReader:
     """
     A class for reading pH and EC values using Atlas Scientific EZO sensors.
     """
 
-    def __init__(self, i2c_bus=1, ph_address=0x63, ec_address=0x64):
+    def __init__(self, i2c_bus=1, ph_address=0x63, ec_address=0x64, read_deadline=READ_DEADLINE):
+        self.read_deadline = read_deadline
         self.ph_dev = AtlasI2C(address=ph_address, bus=i2c_bus, moduletype="PH", name="pH_sensor")
         self.ec_dev = AtlasI2C(address=ec_address, bus=i2c_bus, moduletype="EC", name="EC_sensor")
+        # Held by callers that share one reader between threads.
+        self.lock = threading.Lock()
         self.wake_up_sensors()
+        print(f"Sensor sampling cycle bounded at {self.cycle_deadline:.0f}s.")
 
     def wake_up_sensors(self):
         """
@@ -28,60 +39,101 @@ class SensorReader:
         except Exception as e:
             print("Error waking up sensors:", e)
 
-    def read_ph_sensor(self, retries=3):
+    def _read_probe(self, dev, sensor, wait, parse, retries):
         """
-        Reads the pH sensor, retrying if necessary.
-        Returns:
-            float: pH value if successful, else None.
+        Send "R" to 'dev', wait 'wait' seconds and parse the answer, retrying
+        up to 'retries' times. Gives up once read_deadline seconds have
+        passed, so a read never takes much longer than that.
         """
+        deadline = time.monotonic() + self.read_deadline
         for attempt in range(retries):
+            if attempt:
+                I2C_RETRIES.inc(sensor=sensor)
+            # Only start an attempt that can finish in time even if the write,
+            # the read and the bus recovery after a failure all hit their
+            # transaction timeout.
+            if time.monotonic() + wait + 3 * dev.transaction_timeout + 0.5 > deadline:
+                print(f"{sensor} sensor read deadline of {self.read_deadline}s reached.")
+                I2C_DEADLINE_MISSES.inc(sensor=sensor)
+                break
             try:
-                self.ph_dev.write("R")
-                time.sleep(1.8)
-                raw_response = self.ph_dev.read()
+                dev.write("R")
+                time.sleep(wait)
+                raw_response = dev.read()
                 reading_str = raw_response.split(":", 1)[-1].replace("\x00", "").strip()
                 if reading_str in ["254", "255"]:
-                    print(f"pH sensor status {reading_str} (Attempt {attempt+1}/{retries})... retrying.")
+                    print(f"{sensor} sensor status {reading_str} (Attempt {attempt+1}/{retries})... retrying.")
                     time.sleep(0.5)
                     continue
-                return float(reading_str)
+                value = parse(reading_str)
+                if value is not None:
+                    return value
+                print(f"Unexpected {sensor} response: {reading_str} (Attempt {attempt+1}/{retries})... retrying.")
+                time.sleep(0.5)
+            except CircuitOpen as e:
+                # Not touching the device at all until the back-off expires.
+                print(f"{sensor} sensor skipped: {e}")
+                I2C_FAILURES.inc(sensor=sensor)
+                return None
             except Exception as e:
-                print("Error reading pH sensor:", e)
-        print("pH sensor failed after multiple attempts.")
+                print(f"Error reading {sensor} sensor:", e)
+        print(f"{sensor} sensor failed after multiple attempts.")
+        I2C_FAILURES.inc(sensor=sensor)
         return None
 
+    @timed(I2C_READ_SECONDS, sensor="pH")
+    def read_ph_sensor(self, retries=3):
+        """
+        Reads the pH sensor, retrying if necessary.
+        Returns:
+            float: pH value if successful, else None.
+        """
+        return self._read_probe(self.ph_dev, "pH", 1.8, float, retries)
+
+    @timed(I2C_READ_SECONDS, sensor="EC")
     def read_ec_sensor(self, retries=3):
         """
         Reads the EC sensor and parses its output.
         Returns:
             dict: Dictionary with keys 'ec', 'tds', 'sal', 'sg' if successful, else None.
         """
-        for attempt in range(retries):
-            try:
-                self.ec_dev.write("R")
-                time.sleep(2)
-                raw_response = self.ec_dev.read()
-                reading_str = raw_response.split(":", 1)[-1].replace("\x00", "").strip()
-                if reading_str in ["254", "255"]:
-                    print(f"EC sensor status {reading_str} (Attempt {attempt+1}/{retries})... retrying.")
-                    time.sleep(0.5)
-                    continue
-                parts = reading_str.split(",")
-                if len(parts) == 4:
-                    return {
-                        "ec": float(parts[0]),
-                        "tds": float(parts[1]),
-                        "sal": float(parts[2]),
-                        "sg":  float(parts[3])
-                    }
-                else:
-                    print(f"Unexpected EC response: {reading_str} (Attempt {attempt+1}/{retries})... retrying.")
-                    time.sleep(0.5)
-                    continue
-            except Exception as e:
-                print("Error reading EC sensor:", e)
-        print("EC sensor failed after multiple attempts.")
-        return None
+        columns = probe_columns("ec")
+
+        def parse(reading_str):
+            parts = reading_str.split(",")
+            if len(parts) == len(columns):
+                return dict(zip(columns, map(float, parts)))
+            return None
+        return self._read_probe(self.ec_dev, "EC", 2, parse, retries)
+
+    @property
+    def cycle_deadline(self):
+        """
+        Upper bound in seconds on one read_record() call.
+        """
+        return 2 * self.read_deadline
+
+    def status(self):
+        return {dev.label: {"circuit_open": dev.breaker.is_open,
+                            "failures": dev.breaker.failures,
+                            "retry_in": round(dev.breaker.retry_in(), 1)}
+                for dev in (self.ph_dev, self.ec_dev)}
+
+    @timed(SENSOR_CYCLE_SECONDS)
+    def read_record(self):
+        """
+        Reads every probe once and returns one sampling cycle keyed by
+        data.schema column names, e.g. {"ph": 6.0, "ec": 1.2, "tds": 610, ...}.
+        Probes that failed are left out; returns an empty dict if all failed.
+        """
+        record = {}
+        ph = self.read_ph_sensor()
+        if ph is not None:
+            record["ph"] = ph
+        ec = self.read_ec_sensor()
+        if ec:
+            record.update(ec)
+        return record
 
     def close(self):
         """
@@ -0,0 +1,31 @@
+// static/js/alerts.js
+// Shows rule alerts from /automation/alerts/stream as toasts on every page.
+document.addEventListener('DOMContentLoaded', function() {
+  if (typeof EventSource === "undefined") return;
+  const container = document.getElementById("alertToasts");
+  if (!container) return;
+
+  function show(event) {
+    const cleared = event.outcome === "cleared";
+    const toast = document.createElement("div");
+    toast.className = "toast align-items-center border-0 text-white " + (cleared ? "bg-success" : "bg-danger");
+    toast.setAttribute("role", "alert");
+    const body = document.createElement("div");
+    body.className = "toast-body";
+    body.textContent = event.timestamp + " " + (event.details || event.event);
+    toast.appendChild(body);
+    container.appendChild(toast);
+    toast.addEventListener("hidden.bs.toast", () => toast.remove());
+    new bootstrap.Toast(toast, { autohide: cleared, delay: 10000 }).show();
+    toast.addEventListener("click", () => bootstrap.Toast.getInstance(toast).hide());
+  }
+
+  const source = new EventSource(container.dataset.stream);
+  source.onmessage = function(message) {
+    try {
+      show(JSON.parse(message.data));
+    } catch (e) {
+      console.log("Bad alert message", e);
+    }
+  };
+});
@@ -1,5 +1,46 @@
 // static/js/dashboard.js
 document.addEventListener('DOMContentLoaded', function() {
   console.log("Dashboard JS loaded.");
-  // Initialize charts, AJAX calls, and other interactivity here.
+  // Chart data is inlined by the dashboard's charts fragment.
+  const data = window.dashboardData;
+  if (!data || typeof Chart === "undefined") {
+    return;
+  }
+
+  function lineChart(canvasId, label, rows, color) {
+    const canvas = document.getElementById(canvasId);
+    if (!canvas) return;
+    new Chart(canvas.getContext('2d'), {
+      type: 'line',
+      data: {
+        labels: rows.map(r => r[0]),
+        datasets: [{ label: label, data: rows.map(r => r[1]), borderColor: color, tension: 0.2 }]
+      },
+      options: { responsive: true, animation: false }
+    });
+  }
+
+  lineChart("phChart", "pH", data.phData, "green");
+  lineChart("ecChart", "EC", data.ecData, "blue");
+
+  const usageCanvas = document.getElementById("pumpUsageChart");
+  if (usageCanvas) {
+    const colors = ['blue', 'green', 'purple', 'orange', 'red', 'gray', 'teal', 'navy'];
+    new Chart(usageCanvas.getContext('2d'), {
+      type: 'bar',
+      data: {
+        labels: data.usageBarData.dates,
+        datasets: data.allPumps.map((pump, idx) => ({
+          label: pump,
+          data: data.usageBarData.usage_data[pump],
+          backgroundColor: colors[idx % colors.length]
+        }))
+      },
+      options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        scales: { x: { stacked: true }, y: { stacked: true, beginAtZero: true } }
+      }
+    });
+  }
 });
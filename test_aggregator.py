@@ -0,0 +1,100 @@
+# File: test_aggregator.py
+
+import gzip
+import io
+import json
+import urllib.error
+
+import pytest
+
+import aggregator
+from aggregator import Fleet
+from data import uploader
+from data.events import read_events
+from data.records import read_records
+from data.uploader import Spool, Uploader
+
+SENSOR = {"kind": "sensor", "timestamp": "2025-02-08 10:00:00", "values": {"pH": 6.1, "ec": 1.2}}
+EVENT = {"kind": "event", "timestamp": "2025-02-08 10:00:05", "event": "ph_control", "pump": "pH_up",
+         "seconds": 1, "ml": 1.5, "reading": 5.6, "outcome": "dosed", "details": ""}
+
+
+def ndjson(*records):
+    return gzip.compress("".join(json.dumps(r) + "\n" for r in records).encode())
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(aggregator, "fleet", Fleet(str(tmp_path)))
+    monkeypatch.setattr(aggregator, "FLEET_TOKEN", "")
+    return aggregator.app.test_client()
+
+
+def post(client, body, node="node-1", batch="b1", **headers):
+    return client.post("/ingest", data=body, headers=dict({
+        "Content-Encoding": "gzip", "X-Hydro-Node": node, "X-Hydro-Batch": batch}, **headers))
+
+
+def test_ingest_appends_to_the_node_logs(client):
+    response = post(client, ndjson(SENSOR, EVENT, {"kind": "sensor", "timestamp": "yesterday"}))
+    assert response.get_json() == {"status": "success", "accepted": 2, "skipped": 1, "duplicate": False}
+    store = aggregator.fleet.node("node-1")
+    assert list(read_records(store.sensor_csv, ["ph", "ec"])) == [("2025-02-08 10:00:00", 6.1, 1.2)]
+    (event,) = read_events(store.events_csv)
+    assert (event["pump"], event["seconds"], event["outcome"]) == ("pH_up", 1.0, "dosed")
+
+
+def test_resent_batches_are_stored_once(client):
+    assert not post(client, ndjson(SENSOR)).get_json()["duplicate"]
+    assert post(client, ndjson(SENSOR)).get_json() == {
+        "status": "success", "accepted": 0, "skipped": 0, "duplicate": True}
+    # The seen batch ids survive a restart of the aggregator.
+    aggregator.fleet = Fleet(aggregator.fleet.root)
+    assert post(client, ndjson(SENSOR)).get_json()["duplicate"]
+    store = aggregator.fleet.node("node-1")
+    assert len(list(read_records(store.sensor_csv, ["ph"]))) == 1
+
+
+def test_ingest_rejects_bad_requests(client, monkeypatch):
+    assert post(client, ndjson(SENSOR), node="../etc").status_code == 400
+    assert post(client, b"not gzip").status_code == 400
+    monkeypatch.setattr(aggregator, "FLEET_TOKEN", "secret")
+    assert post(client, ndjson(SENSOR)).status_code == 401
+    assert post(client, ndjson(SENSOR), Authorization="Bearer secret").status_code == 200
+    monkeypatch.setattr(aggregator, "MAX_BATCH_BYTES", 10)
+    assert post(client, ndjson(SENSOR), Authorization="Bearer secret").status_code == 413
+
+
+def test_node_pages_serve_the_node_logs(client):
+    post(client, ndjson(SENSOR, EVENT))
+    (node,) = client.get("/nodes.json").get_json()["nodes"]
+    assert node["node_id"] == "node-1" and node["ph"][1] == 6.1
+    assert client.get("/nodes/node-1/events/").status_code == 200
+    assert client.get("/nodes/missing/events/").status_code == 404
+
+
+class Response(io.BytesIO):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def test_uploader_round_trip(client, tmp_path, monkeypatch):
+    def urlopen(req, timeout):
+        response = client.post("/ingest", data=req.data, headers=dict(req.header_items()))
+        if response.status_code != 200:
+            raise urllib.error.HTTPError(req.full_url, response.status_code, "", {}, None)
+        return Response(response.data)
+
+    monkeypatch.setattr(uploader.urllib.request, "urlopen", urlopen)
+    spool = Spool(str(tmp_path / "outbox"), batch_size=2)
+    spool.put("sensor", {"timestamp": "2025-02-08 10:00:00", "values": {"ph": 6.1}})
+    spool.put("event", {k: v for k, v in EVENT.items() if k != "kind"})
+    (path,) = spool.batches()
+    sender = Uploader(spool, "http://aggregator/ingest", "node-1")
+    assert sender.send(path)
+    assert spool.batches() == []
+    store = aggregator.fleet.node("node-1")
+    assert len(list(read_events(store.events_csv))) == 1
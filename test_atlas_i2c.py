@@ -0,0 +1,194 @@
+# File: test_atlas_i2c.py
+
+import threading
+import time
+
+import pytest
+
+import sensors
+from atlas_i2c import AtlasI2C, CircuitBreaker, CircuitOpen, I2CTimeout
+from sensors import SensorReader
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_breaker_opens_after_repeated_failures():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+    breaker.failure()
+    breaker.failure()
+    assert breaker.allow() and not breaker.is_open
+    breaker.failure()
+    assert breaker.is_open and not breaker.allow()
+    assert breaker.retry_in() == 30
+    clock.now += 30
+    # One trial is let through once the back-off has passed.
+    assert breaker.allow()
+    breaker.success()
+    assert not breaker.is_open and breaker.failures == 0
+
+
+def test_failed_trials_double_the_back_off():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, max_reset_timeout=100, clock=clock)
+    breaker.failure()
+    for expected in (60, 100, 100):
+        clock.now += breaker.retry_in()
+        assert breaker.allow()
+        breaker.failure()
+        assert breaker.retry_in() == expected
+    clock.now += 100
+    breaker.success()
+    breaker.failure()
+    assert breaker.retry_in() == 30
+
+
+class Bus:
+    """
+    Stands in for /dev/i2c-N: counts opens and answers reads with
+    'response', or blocks while 'hang' is set.
+    """
+
+    def __init__(self, response=b"\x017.00\x00"):
+        self.response = response
+        self.opens = 0
+        self.writes = []
+        self.hang = threading.Event()
+        self.release = threading.Event()
+
+    def open_files(self, device):
+        self.opens += 1
+        return FakeFile(self), FakeFile(self)
+
+
+class FakeFile:
+    def __init__(self, bus):
+        self.bus = bus
+        self.closed = False
+
+    def read(self, num_of_bytes):
+        if self.bus.hang.is_set():
+            self.bus.release.wait(5)
+        if isinstance(self.bus.response, Exception):
+            raise self.bus.response
+        return self.bus.response
+
+    def write(self, data):
+        self.bus.writes.append(data)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    bus = Bus()
+    monkeypatch.setattr(AtlasI2C, "_open_files", lambda self: bus.open_files(self))
+    yield bus
+    bus.release.set()
+
+
+def test_transactions_run_on_the_worker(bus):
+    dev = AtlasI2C(address=0x63, moduletype="PH", name="pH_sensor")
+    dev.write("R")
+    assert bus.writes == [b"R\x00"]
+    assert dev.read() == "Success PH 99 pH_sensor: 7.00\x00"
+    dev.close()
+
+
+def test_hung_read_times_out_and_recovers(bus):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    dev = AtlasI2C(address=0x63, name="pH_sensor", transaction_timeout=0.05, breaker=breaker)
+    bus.hang.set()
+    started = time.monotonic()
+    with pytest.raises(I2CTimeout):
+        dev.read()
+    assert time.monotonic() - started < 1
+    # The stuck worker is abandoned and the device re-opened on a new one.
+    assert bus.opens == 2
+    bus.hang.clear()
+    assert dev.read().startswith("Success")
+    assert breaker.failures == 0
+
+
+def test_open_breaker_skips_the_device(bus):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    dev = AtlasI2C(address=0x63, name="pH_sensor", breaker=breaker)
+    bus.response = OSError("Remote I/O error")
+    for _ in range(2):
+        with pytest.raises(OSError):
+            dev.read()
+    opens = bus.opens
+    with pytest.raises(CircuitOpen):
+        dev.read()
+    assert bus.opens == opens
+    assert breaker.is_open
+
+
+class FakeProbe:
+    def __init__(self, address=None, moduletype="", name="", bus=None):
+        self.label = name
+        self.transaction_timeout = 1.0
+        self.breaker = CircuitBreaker()
+        self.responses = []
+        self.writes = 0
+
+    def write(self, cmd, timeout=None):
+        self.writes += 1
+
+    def read(self, num_of_bytes=31, timeout=None):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sensors, "AtlasI2C", FakeProbe)
+    monkeypatch.setattr(sensors.time, "monotonic", clock)
+    monkeypatch.setattr(sensors.time, "sleep", clock.sleep)
+    reader = SensorReader()
+    reader.clock = clock
+    # Forget the wake-up commands sent by the constructor.
+    reader.ph_dev.writes = reader.ec_dev.writes = 0
+    return reader
+
+
+def test_reads_retry_busy_and_malformed_answers(reader):
+    reader.ph_dev.responses = ["Success PH 99: 254", OSError("nack"), "Success PH 99: 6.02"]
+    assert reader.read_ph_sensor() == 6.02
+    reader.ec_dev.responses = ["Success EC 100: 1200,600", "Success EC 100: 1200,600,0.6,1.0"]
+    assert reader.read_ec_sensor() == {"ec": 1200.0, "tds": 600.0, "sal": 0.6, "sg": 1.0}
+    reader.ph_dev.responses = ["Success PH 99: 255"] * 3
+    assert reader.read_ph_sensor() is None
+
+
+def test_open_circuit_gives_up_at_once(reader):
+    reader.ph_dev.responses = [CircuitOpen("backing off"), "Success PH 99: 6.02"]
+    assert reader.read_ph_sensor() is None
+    assert reader.ph_dev.writes == 1
+
+
+def test_reads_stop_at_the_deadline(reader):
+    reader.read_deadline = 6.0
+    reader.ph_dev.responses = [OSError("nack")] * 3
+    started = reader.clock.now
+    assert reader.read_ph_sensor() is None
+    # A second attempt could not have finished within the deadline.
+    assert reader.ph_dev.writes == 1
+    assert reader.clock.now - started <= reader.read_deadline
+    assert reader.cycle_deadline == 12.0
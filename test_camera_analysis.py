@@ -0,0 +1,54 @@
+# File: test_camera_analysis.py
+
+import os
+
+import cv2
+import numpy as np
+
+from camera.analysis import analyze_frame, analyze_snapshot, evaluate_plant_health
+
+GREEN = (0, 200, 0)
+YELLOW = (0, 200, 200)
+GREY = (128, 128, 128)
+
+
+def plant_image(width=640, height=480):
+    # Left half green foliage, top right quarter yellow, the rest grey.
+    image = np.full((height, width, 3), GREY, dtype=np.uint8)
+    image[:, :width // 2] = GREEN
+    image[:height // 2, width // 2:] = YELLOW
+    return image
+
+
+def test_analyze_frame_measures_coverage():
+    result = analyze_frame(plant_image())
+    assert abs(result["green_percentage"] - 50) < 1
+    assert abs(result["yellow_brown_percentage"] - 25) < 1
+
+
+def test_analyze_frame_roi():
+    result = analyze_frame(plant_image(), roi=(0.5, 0, 0.5, 0.5))
+    assert result["green_percentage"] == 0
+    assert result["yellow_brown_percentage"] == 100
+    # An empty region falls back to the whole frame.
+    assert analyze_frame(plant_image(), roi=(1, 1, 0, 0))["green_percentage"] > 49
+
+
+def test_analyze_snapshot_caches_by_file(tmp_path):
+    path = str(tmp_path / "plant.jpg")
+    cv2.imwrite(path, plant_image())
+    first = analyze_snapshot(path, log=False)
+    assert first["source"] == "plant.jpg"
+    assert analyze_snapshot(path, log=False) is first
+    cv2.imwrite(path, np.full((480, 640, 3), GREEN, dtype=np.uint8))
+    os.utime(path, ns=(0, 10 ** 9))
+    assert analyze_snapshot(path, log=False)["green_percentage"] > 99
+    assert analyze_snapshot(str(tmp_path / "missing.jpg"), log=False) is None
+
+
+def test_evaluate_plant_health():
+    result = {"green_percentage": 20.0, "yellow_brown_percentage": 40.0}
+    trigger = {"enabled": True, "thresholds": {"min_green_percent": 30, "max_yellow_brown_percent": 25}}
+    assert len(evaluate_plant_health(result, trigger)) == 2
+    assert evaluate_plant_health(result, dict(trigger, enabled=False)) == []
+    assert evaluate_plant_health({"green_percentage": 50.0, "yellow_brown_percentage": 5.0}, trigger) == []
@@ -0,0 +1,78 @@
+# File: test_camera_catalog.py
+
+import os
+
+import cv2
+import numpy as np
+from flask import Flask
+
+import blueprints.camera
+from camera.catalog import SnapshotCatalog, jpeg_dimensions
+
+
+def write_jpeg(path, width=320, height=240):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cv2.imwrite(str(path), np.random.randint(0, 255, (height, width, 3), dtype=np.uint8))
+    return path
+
+
+def test_jpeg_dimensions(tmp_path):
+    assert jpeg_dimensions(write_jpeg(tmp_path / "a.jpg", 123, 45)) == (123, 45)
+    (tmp_path / "b.jpg").write_bytes(b"not a jpeg")
+    assert jpeg_dimensions(tmp_path / "b.jpg") == (None, None)
+
+
+def test_catalog_pages_newest_first(tmp_path):
+    for name in ("snapshot_20250208_100000.jpg", "snapshot_20250208_120000.jpg", "day/frame_20250208_110000.jpg"):
+        write_jpeg(tmp_path / name)
+    catalog = SnapshotCatalog(str(tmp_path))
+    entries, total = catalog.page(1, 2)
+    assert total == 3
+    assert [e["timestamp"] for e in entries] == ["2025-02-08 12:00:00", "2025-02-08 11:00:00"]
+    assert entries[1]["path"] == os.path.join("day", "frame_20250208_110000.jpg")
+    assert (entries[0]["width"], entries[0]["height"]) == (320, 240)
+    assert catalog.page(2, 2)[0][0]["timestamp"] == "2025-02-08 10:00:00"
+
+
+def test_catalog_version_follows_contents(tmp_path):
+    write_jpeg(tmp_path / "snapshot_20250208_100000.jpg")
+    catalog = SnapshotCatalog(str(tmp_path))
+    catalog.refresh()
+    version = catalog.version
+    # Another process (or a restart) sees the same listing under the same version.
+    other = SnapshotCatalog(str(tmp_path))
+    other.refresh()
+    assert other.version == version
+    os.remove(tmp_path / "snapshot_20250208_100000.jpg")
+    catalog.refresh()
+    assert catalog.version != version
+    assert catalog.page()[1] == 0
+
+
+def test_thumbnails_are_generated_once(tmp_path):
+    write_jpeg(tmp_path / "snapshot_20250208_100000.jpg", 1280, 960)
+    catalog = SnapshotCatalog(str(tmp_path))
+    catalog.refresh()
+    thumb = catalog.thumbnail_path("snapshot_20250208_100000.jpg", 160)
+    assert cv2.imread(thumb).shape[1] == 160
+    mtime = os.stat(thumb).st_mtime_ns
+    assert catalog.thumbnail_path("snapshot_20250208_100000.jpg", 160) == thumb
+    assert os.stat(thumb).st_mtime_ns == mtime
+    assert catalog.thumbnail_path("missing.jpg", 160) is None
+    # The thumbnail cache is hidden from the listing.
+    assert catalog.page()[1] == 1
+
+
+def test_gallery_answers_304_while_unchanged(tmp_path, monkeypatch):
+    write_jpeg(tmp_path / "snapshot_20250208_100000.jpg")
+    monkeypatch.setitem(blueprints.camera.catalogs, "snapshots", SnapshotCatalog(str(tmp_path)))
+    app = Flask(__name__)
+    app.register_blueprint(blueprints.camera.camera_bp, url_prefix="/camera")
+    client = app.test_client()
+    response = client.get("/camera/gallery")
+    assert response.status_code == 200
+    assert response.get_json()["total"] == 1
+    etag = response.headers["ETag"]
+    assert client.get("/camera/gallery", headers={"If-None-Match": etag}).status_code == 304
+    write_jpeg(tmp_path / "snapshot_20250208_110000.jpg")
+    assert client.get("/camera/gallery", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,80 @@
+# File: test_camera_snapshots.py
+
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from camera.snapshots import SnapshotService
+from camera.storage import FrameStorage
+
+
+class FakeCamera:
+    def __init__(self, snapshot_dir, preview=None, frame=True, gate=None):
+        self.snapshot_dir = str(snapshot_dir)
+        self.storage = FrameStorage([self.snapshot_dir], settings={"dedupe": "off"})
+        self.preview = preview
+        self.frame = frame
+        self.gate = gate
+        self.captures = 0
+
+    def latest_preview_frame(self, max_age):
+        return self.preview
+
+    def capture_single_frame(self):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.captures += 1
+        if not self.frame:
+            return None
+        return np.random.randint(0, 255, (120, 160, 3), dtype=np.uint8)
+
+
+def test_snapshot_is_written_in_the_background(tmp_path):
+    camera = FakeCamera(tmp_path)
+    service = SnapshotService(camera)
+    written = []
+    service.add_listener(lambda path, image: written.append((path, image.shape)))
+    job = service.submit(filename="a.jpg")
+    assert service.get_job(job.id) is job
+    path = job.wait(5)
+    assert path == os.path.join(str(tmp_path), "a.jpg")
+    assert job.to_dict()["status"] == "done" and job.to_dict()["filepath"] == path
+    assert cv2.imread(path).shape == (120, 160, 3)
+    assert not os.path.exists(path + ".tmp")
+    assert written == [(path, (120, 160, 3))]
+
+
+def test_live_preview_frame_is_reused(tmp_path):
+    preview = np.zeros((60, 80, 3), dtype=np.uint8)
+    camera = FakeCamera(tmp_path, preview=preview)
+    path = SnapshotService(camera).submit(filename="p.jpg").wait(5)
+    assert camera.captures == 0
+    assert cv2.imread(path).shape == (60, 80, 3)
+
+
+def test_failed_capture_finishes_with_an_error(tmp_path):
+    job = SnapshotService(FakeCamera(tmp_path, frame=False)).submit(filename="x.jpg")
+    assert job.wait(5) is None
+    assert job.status == "error" and job.to_dict()["filepath"] is None
+    assert not os.path.exists(tmp_path / "x.jpg")
+
+
+def test_full_backlog_raises_queue_full(tmp_path):
+    gate = threading.Event()
+    service = SnapshotService(FakeCamera(tmp_path, gate=gate), workers=1, max_pending=2)
+    try:
+        # One job held by the worker, two pending: the next one does not fit.
+        jobs = [service.submit(filename="0.jpg")]
+        while jobs[0].status == "queued":
+            time.sleep(0.01)
+        jobs += [service.submit(filename=f"{i}.jpg") for i in (1, 2)]
+        with pytest.raises(queue.Full):
+            service.submit(filename="overflow.jpg")
+    finally:
+        gate.set()
+    assert all(job.wait(5) for job in jobs)
@@ -0,0 +1,102 @@
+# File: test_camera_storage.py
+
+import os
+
+import cv2
+import numpy as np
+
+from camera.storage import FrameStorage, fingerprint, hamming, is_duplicate
+
+DAY = 86400
+NOW = 1_750_000_000
+
+
+def scene(seed, brightness=0):
+    rng = np.random.default_rng(seed)
+    image = cv2.resize(rng.integers(0, 255, (8, 8, 3), dtype=np.uint8), (640, 480),
+                       interpolation=cv2.INTER_LINEAR)
+    return cv2.add(image, np.full_like(image, brightness))
+
+
+def write_frame(path, image, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cv2.imwrite(str(path), image)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_fingerprints_match_similar_frames():
+    a = fingerprint(scene(1))
+    noisy = scene(1) + np.random.default_rng(0).integers(0, 3, (480, 640, 3), dtype=np.uint8)
+    assert hamming(a[0], fingerprint(noisy)[0]) <= 6
+    assert not is_duplicate(a, fingerprint(scene(2)), 6)
+    # Same scene with the lights brighter is a new frame.
+    assert not is_duplicate(a, fingerprint(scene(1, brightness=60)), 6)
+    # Dark frames all count as the same, whatever their noise.
+    dark = [fingerprint(np.random.default_rng(s).integers(0, 10, (480, 640), dtype=np.uint8)) for s in (1, 2)]
+    assert is_duplicate(dark[0], dark[1], 0)
+
+
+def test_duplicates_are_linked(tmp_path):
+    storage = FrameStorage([str(tmp_path)], settings={"dedupe": "link"})
+    first = write_frame(tmp_path / "day" / "frame_1.jpg", scene(1))
+    fp = fingerprint(scene(1))
+    second = str(tmp_path / "day" / "frame_2.jpg")
+    assert storage.store_duplicate(second, fp) is None
+    storage.remember(first, fp)
+    assert storage.store_duplicate(second, fp) == second
+    assert os.path.samefile(first, second)
+    assert storage.store_duplicate(str(tmp_path / "day" / "frame_3.jpg"), fingerprint(scene(2))) is None
+    # References are per directory.
+    assert storage.store_duplicate(str(tmp_path / "other" / "frame_1.jpg"), fp) is None
+
+
+def test_duplicates_are_skipped(tmp_path):
+    storage = FrameStorage([str(tmp_path)], settings={"dedupe": "skip"})
+    first = write_frame(tmp_path / "snapshot_1.jpg", scene(1))
+    fp = fingerprint(scene(1))
+    storage.remember(first, fp)
+    assert storage.store_duplicate(str(tmp_path / "snapshot_2.jpg"), fp) == first
+    assert not os.path.exists(tmp_path / "snapshot_2.jpg")
+    os.remove(first)
+    assert storage.store_duplicate(str(tmp_path / "snapshot_2.jpg"), fp) is None
+    storage = FrameStorage([str(tmp_path)], settings={"dedupe": "off"})
+    storage.remember(first, fp)
+    assert storage.store_duplicate(str(tmp_path / "snapshot_2.jpg"), fp) is None
+
+
+def test_compaction_tiers(tmp_path):
+    storage = FrameStorage([str(tmp_path)], settings={
+        "full_days": 7, "reduced_days": 30, "reduced_width": 320, "keyframe_hours": 6, "budget_mb": 100})
+    recent = write_frame(tmp_path / "recent.jpg", scene(1), NOW - DAY)
+    middle = write_frame(tmp_path / "middle.jpg", scene(2), NOW - 10 * DAY)
+    link = str(tmp_path / "middle_link.jpg")
+    os.link(middle, link)
+    # Two old frames in one 6-hour key-frame slot, a third in the next.
+    slot = 6 * 3600
+    start = (NOW - 40 * DAY) // slot * slot
+    old = [write_frame(tmp_path / f"old_{i}.jpg", scene(3 + i), start + offset)
+           for i, offset in enumerate((0, 3600, slot + 60))]
+    result = storage.compact(now=NOW)
+    assert result["removed"] == 1
+    assert [os.path.exists(p) for p in old] == [True, False, True]
+    # Full size while recent; reduced (keeping links and mtime) once older.
+    assert cv2.imread(recent).shape[1] == 640
+    assert cv2.imread(middle).shape[1] == 320
+    assert os.path.samefile(middle, link)
+    assert os.stat(middle).st_mtime == NOW - 10 * DAY
+    # The surviving key frames are reduced too.
+    assert result["reduced"] == 3
+
+
+def test_compaction_enforces_the_budget(tmp_path):
+    paths = [write_frame(tmp_path / f"frame_{i}.jpg", scene(i), NOW - (3 - i) * 3600) for i in range(3)]
+    thumb = write_frame(tmp_path / ".thumbs" / "160" / "frame_0.jpg", scene(0))
+    # Room for the two newest frames only.
+    budget_mb = (os.path.getsize(paths[1]) + os.path.getsize(paths[2])) / (1024 * 1024)
+    storage = FrameStorage([str(tmp_path)], settings={"budget_mb": budget_mb})
+    result = storage.compact(now=NOW)
+    assert [os.path.exists(p) for p in paths] == [False, True, True]
+    assert not os.path.exists(thumb)
+    assert result["removed"] == 1 and result["bytes"] <= budget_mb * 1024 * 1024
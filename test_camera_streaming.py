@@ -0,0 +1,123 @@
+# File: test_camera_streaming.py
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from camera.streaming import Frame, FrameBroadcaster, StreamClient, stream_frames
+
+
+class FakeCamera:
+    """
+    Returns None for the first 'failures' captures, then small random frames.
+    """
+
+    def __init__(self, failures=0, delay=0.005):
+        self.failures = failures
+        self.delay = delay
+        self.calls = []
+
+    def capture_single_frame(self):
+        self.calls.append(time.monotonic())
+        time.sleep(self.delay)
+        if len(self.calls) <= self.failures:
+            return None
+        return np.random.randint(0, 255, (48, 64, 3), dtype=np.uint8)
+
+
+def pull(generator, count, pause=0.0):
+    for _ in range(count):
+        next(generator)
+        time.sleep(pause)
+
+
+def test_viewers_share_one_capture_loop():
+    camera = FakeCamera()
+    broadcaster = FrameBroadcaster(camera)
+    viewers = [StreamClient(fps=20, threshold=0) for _ in range(4)]
+    threads = [threading.Thread(target=pull, args=(stream_frames(broadcaster, v), 10)) for v in viewers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(v.frames_sent == 10 for v in viewers)
+    # Four viewers at 20 fps cost one 20 fps capture loop, not four.
+    assert len(camera.calls) < 25
+
+
+def test_capture_backs_off_while_the_camera_is_unavailable():
+    camera = FakeCamera(failures=6, delay=0)
+    broadcaster = FrameBroadcaster(camera, retry_delay=0.01, max_retry_delay=0.05)
+    pull(stream_frames(broadcaster, StreamClient(fps=0, threshold=0)), 3)
+    gaps = [b - a for a, b in zip(camera.calls, camera.calls[1:7])]
+    assert gaps[0] < gaps[2] < gaps[4]
+    assert max(gaps) < 0.1
+    # A successful capture resets the delay.
+    assert camera.calls[8] - camera.calls[7] < 0.03
+
+
+def test_frames_dropped_counts_only_falling_behind():
+    camera = FakeCamera(delay=0.01)
+    broadcaster = FrameBroadcaster(camera)
+    fast = StreamClient(fps=30, threshold=0)
+    capped = StreamClient(fps=5, threshold=0)
+    slow = StreamClient(fps=30, threshold=0)
+    threads = [threading.Thread(target=pull, args=(stream_frames(broadcaster, fast), 45)),
+               threading.Thread(target=pull, args=(stream_frames(broadcaster, capped), 6)),
+               threading.Thread(target=pull, args=(stream_frames(broadcaster, slow), 6, 0.2))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert capped.frames_dropped == 0
+    assert slow.frames_dropped > 0
+
+
+def test_client_from_args_clamps_and_ignores_bad_values():
+    client = StreamClient.from_args({"fps": "100", "width": "50", "quality": "abc", "threshold": "", "keepalive": "0"})
+    assert client.fps == 30.0
+    assert client.max_width == 160
+    assert client.quality == 80
+    assert client.threshold == 2.0
+    assert client.keepalive == 1.0
+
+
+def test_frame_encodes_are_cached_per_profile():
+    frame = Frame(1, np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8))
+    small = frame.jpeg(320, 50)
+    assert frame.jpeg(320, 50) is small
+    assert cv2.imdecode(np.frombuffer(small, np.uint8), cv2.IMREAD_COLOR).shape == (240, 320, 3)
+    # A width at or above the frame's is full resolution, shared with max_width=None.
+    assert frame.jpeg(1920, 80) is frame.jpeg(None, 80)
+
+
+def test_unchanged_frames_are_skipped_until_keepalive(monkeypatch):
+    image = np.full((48, 64, 3), 100, dtype=np.uint8)
+    client = StreamClient(threshold=2.0, keepalive=10.0)
+    first = Frame(1, image)
+    assert not client.is_unchanged(first)
+    now = [1000.0]
+    monkeypatch.setattr("camera.streaming.time.monotonic", lambda: now[0])
+    client.mark_sent(first, 100)
+    assert client.is_unchanged(Frame(2, image + 1))
+    assert not client.is_unchanged(Frame(3, image + 50))
+    now[0] += 10
+    assert not client.is_unchanged(Frame(4, image))
+
+
+def test_fps_cap_limits_frames_per_client():
+    camera = FakeCamera()
+    broadcaster = FrameBroadcaster(camera)
+    fast = StreamClient(fps=20, threshold=0)
+    slow = StreamClient(fps=4, threshold=0)
+    threads = [threading.Thread(target=pull, args=(stream_frames(broadcaster, fast), 20)),
+               threading.Thread(target=pull, args=(stream_frames(broadcaster, slow), 3))]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    threads[1].join()
+    # Three frames at 4 fps take at least two intervals.
+    assert time.monotonic() - started >= 0.45
+    threads[0].join()
@@ -0,0 +1,94 @@
+# File: test_camera_timelapse.py
+
+import os
+import threading
+
+import numpy as np
+from flask import Flask
+
+import blueprints.automation
+from camera.timelapse import TimelapseManager, TimelapseSession, TimelapseVideo
+
+
+class FakeSnapshots:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, directory, filename, image):
+        self.submitted.append(os.path.join(directory, filename))
+
+
+class FakeCamera:
+    def __init__(self, timelapse_dir):
+        self.timelapse_dir = str(timelapse_dir)
+        self.snapshots = FakeSnapshots()
+        self.timelapse = TimelapseManager(self)
+
+    def capture_single_frame(self):
+        return np.zeros((72, 128, 3), dtype=np.uint8)
+
+
+def test_concurrent_starts_run_one_session(tmp_path):
+    camera = FakeCamera(tmp_path)
+    barrier = threading.Barrier(8)
+    started, refused = [], []
+
+    def start():
+        barrier.wait()
+        try:
+            started.append(camera.timelapse.start("race", interval_minutes=60, video=False))
+        except ValueError:
+            refused.append(True)
+
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert len(started) == 1 and len(refused) == 7
+        assert camera.timelapse.get("race") is started[0]
+    finally:
+        camera.timelapse.stop("race")
+
+
+def test_session_captures_first_frame_and_stops(tmp_path):
+    camera = FakeCamera(tmp_path)
+    session = TimelapseSession(camera, "quick", interval_minutes=60, duration_hours=None, video=False)
+    session.start()
+    session.stop(timeout=5)
+    assert not session.running
+    assert session.status == "stopped"
+    assert session.frames_captured == 1
+    assert len(camera.snapshots.submitted) == 1
+
+
+def test_video_segments_roll_over(tmp_path, monkeypatch):
+    video = TimelapseVideo(str(tmp_path), "tl", size=(64, 48), segment_frames=3, segment_seconds=3600)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    for _ in range(4):
+        video.append(frame)
+    assert video.current_path.endswith("tl_001.avi")
+    # A segment older than segment_seconds is closed before the next frame.
+    now = [1e6]
+    monkeypatch.setattr("camera.timelapse.time.monotonic", lambda: now[0])
+    video._opened_at = now[0]
+    now[0] += 3600
+    video.append(frame)
+    video.close()
+    assert sorted(os.listdir(tmp_path)) == ["tl_000.avi", "tl_001.avi", "tl_002.avi"]
+    # A restart continues after the existing segments.
+    assert TimelapseVideo(str(tmp_path), "tl").current_path.endswith("tl_003.avi")
+
+
+def test_timelapse_start_rejects_non_numeric_values(tmp_path, monkeypatch):
+    camera = FakeCamera(tmp_path)
+    monkeypatch.setattr(blueprints.automation, "get_camera", lambda: camera)
+    app = Flask(__name__)
+    app.register_blueprint(blueprints.automation.automation_bp, url_prefix="/automation")
+    client = app.test_client()
+    for body in ({"interval_minutes": None}, {"duration_hours": {"hours": 1}}, {"interval_minutes": "often"}):
+        response = client.post("/automation/timelapse/start", json=body)
+        assert response.status_code == 400
+        assert response.get_json()["status"] == "error"
+    assert camera.timelapse.status() == []
@@ -0,0 +1,82 @@
+# File: test_config_store.py
+
+import json
+import os
+import threading
+
+import pytest
+
+from config_store import ConfigStore
+
+DEFAULTS = {"ph_min": 5.8, "ph_max": 6.2, "automation": {"schedules": {"timelapse": {"enabled": False}}}}
+
+
+def make_store(tmp_path):
+    return ConfigStore(path=str(tmp_path / "config.json"), defaults=DEFAULTS, poll_interval=0)
+
+
+def test_update_merges_persists_and_versions(tmp_path):
+    store = make_store(tmp_path)
+    first = store.get()
+    assert first["ph_min"] == 5.8
+    snapshot = store.update({"ph_min": 5.9, "automation": {"schedules": {"timelapse": {"enabled": True}}}})
+    assert snapshot.version == first.version + 1
+    assert snapshot["ph_min"] == 5.9 and snapshot["ph_max"] == 6.2
+    assert snapshot["automation"]["schedules"]["timelapse"]["enabled"] is True
+    # The old snapshot is untouched and the file holds the merged config.
+    assert first["ph_min"] == 5.8
+    with open(tmp_path / "config.json", encoding="utf-8") as f:
+        assert json.load(f)["ph_min"] == 5.9
+    assert make_store(tmp_path).get()["ph_min"] == 5.9
+
+
+def test_snapshots_are_read_only(tmp_path):
+    snapshot = make_store(tmp_path).get()
+    with pytest.raises(TypeError):
+        snapshot["ph_min"] = 1
+    with pytest.raises(TypeError):
+        snapshot["automation"]["schedules"].update({})
+
+
+def test_subscribers_get_changed_keys(tmp_path):
+    store = make_store(tmp_path)
+    store.get()
+    calls = []
+    store.subscribe(lambda snapshot, changed: calls.append((snapshot.version, changed)))
+    store.update({"ph_min": 5.9})
+    store.update({"ph_min": 5.9})
+    store.update({"automation": {"schedules": {"timelapse": {"enabled": True}}}})
+    assert calls == [(2, {"ph_min"}), (4, {"automation"})]
+
+
+def test_reload_picks_up_external_edits(tmp_path):
+    store = make_store(tmp_path)
+    store.update({"ph_min": 5.9})
+    calls = []
+    store.subscribe(lambda snapshot, changed: calls.append(changed))
+    with open(tmp_path / "config.json", "w", encoding="utf-8") as f:
+        json.dump({"ph_max": 6.4}, f)
+    os.utime(tmp_path / "config.json", ns=(0, 0))
+    snapshot = store.reload()
+    assert snapshot["ph_max"] == 6.4 and snapshot["ph_min"] == 5.8
+    assert calls == [{"ph_min", "ph_max"}]
+    assert store.reload() is snapshot
+
+
+def test_subscriber_may_wait_on_another_update(tmp_path):
+    store = make_store(tmp_path)
+    store.get()
+    done = []
+
+    def on_change(snapshot, changed):
+        if "ph_min" in changed:
+            # Waits for an update made by another thread, which must not block on the store.
+            worker = threading.Thread(target=store.update, args=({"ph_max": 6.3},))
+            worker.start()
+            worker.join(5)
+            done.append(not worker.is_alive())
+
+    store.subscribe(on_change)
+    store.update({"ph_min": 5.9})
+    assert done == [True]
+    assert store.get()["ph_max"] == 6.3
@@ -0,0 +1,80 @@
+# File: test_hardware.py
+
+import pytest
+
+import camera.camera
+import hardware
+from hardware import DeviceUnavailable, HardwareRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_devices_are_created_on_first_use_only():
+    created, closed = [], []
+    registry = HardwareRegistry()
+    registry.register("pumps", lambda: created.append("pumps") or "gpio", closed.append)
+    assert created == [] and registry.peek("pumps") is None
+    assert registry.status()["pumps"]["state"] == "not_initialized"
+    assert registry.get("pumps") == "gpio"
+    assert registry.get("pumps") == "gpio"
+    assert created == ["pumps"]
+    assert registry.status()["pumps"]["state"] == "ready"
+    registry.close_all()
+    assert closed == ["gpio"] and registry.peek("pumps") is None
+
+
+def test_failures_are_retried_after_the_interval(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(hardware.time, "time", clock)
+    attempts = []
+
+    def factory():
+        attempts.append(clock.now)
+        if len(attempts) < 2:
+            raise OSError("no device")
+        return "sensor"
+
+    registry = HardwareRegistry(retry_interval=30)
+    registry.register("sensors", factory)
+    for _ in range(3):
+        with pytest.raises(DeviceUnavailable):
+            registry.get("sensors")
+    assert len(attempts) == 1
+    status = registry.status()["sensors"]
+    assert status["state"] == "unavailable" and status["error"] == "no device"
+    clock.now += 30
+    assert registry.get("sensors") == "sensor"
+    assert len(attempts) == 2 and registry.status()["sensors"]["error"] is None
+
+
+def test_on_ready_callbacks():
+    ready = []
+    registry = HardwareRegistry()
+    registry.register("camera", lambda: "cam")
+    registry.on_ready("camera", ready.append)
+    assert ready == []
+    registry.get("camera")
+    registry.on_ready("camera", lambda instance: ready.append(instance.upper()))
+    assert ready == ["cam", "CAM"]
+
+
+def test_camera_cleanup_runs_on_the_first_attempt_only(monkeypatch):
+    calls = []
+
+    class FakeCamera:
+        def __init__(self, snapshot_dir, timelapse_dir, cleanup_stale):
+            calls.append(cleanup_stale)
+            self.available = False
+
+    monkeypatch.setattr(camera.camera, "PlantCamera", FakeCamera)
+    monkeypatch.setattr(hardware, "_camera_attempted", False)
+    for _ in range(3):
+        with pytest.raises(DeviceUnavailable):
+            hardware._make_camera()
+    assert calls == [True, False, False]
@@ -0,0 +1,70 @@
+# File: test_metrics.py
+
+import pytest
+
+from metrics import MetricsRegistry, timed
+
+
+def test_counter_and_gauge():
+    registry = MetricsRegistry()
+    doses = registry.counter("doses_total", "Doses")
+    doses.inc(pump="pH_up")
+    doses.inc(2, pump="pH_up")
+    doses.inc(pump="pH_down")
+    assert registry.counter("doses_total") is doses
+    assert doses.to_dict() == {'{pump="pH_up"}': 3, '{pump="pH_down"}': 1}
+    clients = registry.gauge("clients")
+    clients.inc()
+    clients.inc()
+    clients.dec()
+    clients.set(5, kind="admin")
+    assert clients.to_dict() == {"": 1, '{kind="admin"}': 5}
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, route="index")
+    summary = latency.to_dict()['{route="index"}']
+    assert summary["buckets"] == {"0.1": 2, "1.0": 3, "+Inf": 4}
+    assert summary["count"] == 4 and summary["sum"] == pytest.approx(3.65)
+    assert summary["avg"] == pytest.approx(3.65 / 4)
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests").inc(path='a"b\\c')
+    registry.histogram("read_seconds", buckets=(1.0,)).observe(0.5)
+    text = registry.render_prometheus()
+    assert "# HELP requests_total Requests\n# TYPE requests_total counter\n" in text
+    assert 'requests_total{path="a\\"b\\\\c"} 1\n' in text
+    assert 'read_seconds_bucket{le="1.0"} 1\n' in text
+    assert 'read_seconds_bucket{le="+Inf"} 1\n' in text
+    assert "read_seconds_sum 0.5\nread_seconds_count 1\n" in text
+
+
+def test_timed_records_failures_too():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("call_seconds")
+
+    @timed(histogram, helper="work")
+    def work(fail):
+        if fail:
+            raise ValueError("boom")
+        return 42
+
+    assert work(False) == 42
+    with pytest.raises(ValueError):
+        work(True)
+    assert histogram.to_dict()['{helper="work"}']["count"] == 2
+
+
+def test_app_records_request_metrics():
+    from app import app
+    client = app.test_client()
+    assert client.get("/health").status_code == 200
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'hydro_http_requests_total{endpoint="health",status="200"}' in text
+    assert 'hydro_http_request_seconds_count{endpoint="health"}' in text
+    assert client.get("/metrics.json").get_json()["hydro_http_requests_total"]["type"] == "counter"
@@ -0,0 +1,131 @@
+# File: test_profiling.py
+
+import os
+import signal
+import sys
+import time
+
+import pytest
+from flask import Flask
+
+import profiling
+from profiling import PID_FILE, Profile, ProfileStore, Profiler, collapsed
+
+
+def busy(seconds=0.05):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    return Profiler(store=ProfileStore(str(tmp_path)))
+
+
+def test_collapsed_stacks_heaviest_first():
+    profile = Profile("loop", "control")
+    frame = sys._getframe()
+    profile.add(frame)
+    profile.add(frame)
+    assert list(profile.stacks.values()) == [2]
+    (stack,) = profile.stacks
+    code = frame.f_code
+    assert stack.endswith(f"{code.co_name} (test_profiling.py:{code.co_firstlineno})")
+    assert collapsed({"a;b": 1, "a;c": 3}) == "a;c 3\na;b 1\n"
+
+
+def test_store_keeps_the_newest_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=2)
+    profiles = []
+    for i in range(3):
+        profile = Profile("request", f"route{i}")
+        profile.id = f"20250208_10000{i}_abcdef"
+        profile.stacks["main;work"] = 2
+        profile.stop()
+        store.save(profile)
+        profiles.append(profile)
+    assert [p["name"] for p in store.list()] == ["route2", "route1"]
+    assert "stacks" not in store.list()[0]
+    assert store.load(profiles[2].id)["stacks"] == {"main;work": 2}
+    assert store.load(profiles[0].id) is None
+    assert store.load("../secrets") is None
+
+
+def test_requests_are_profiled_on_demand(profiler):
+    app = Flask(__name__)
+
+    @app.route("/work")
+    def work():
+        busy()
+        return "done"
+
+    profiler.init_app(app)
+    client = app.test_client()
+    assert "X-Hydro-Profile-Id" not in client.get("/work").headers
+    response = client.get("/work", headers={"X-Hydro-Profile": "1"})
+    profile = profiler.store.load(response.headers["X-Hydro-Profile-Id"])
+    assert profile["name"] == "work" and profile["meta"]["status"] == 200
+    assert profile["samples"] > 0
+    assert any("work (test_profiling.py" in stack for stack in profile["stacks"])
+
+
+def test_request_sampling_stops_after_the_limit(profiler, monkeypatch):
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.0)
+    profiler.arm_requests(0.5, limit=2)
+    assert [profiler._take_request(False) for _ in range(3)] == [True, True, False]
+    assert profiler.status()["request_fraction"] == 0.0
+    profiler.arm_requests(0.5)
+    assert all(profiler._take_request(False) for _ in range(5))
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.9)
+    assert not profiler._take_request(False)
+    assert profiler._take_request(True)
+
+
+def test_loops_are_profiled_for_the_armed_iterations(profiler):
+    with profiler.iteration("control") as profile:
+        assert profile is None
+    profiler.arm_loop("control", 2)
+    for _ in range(3):
+        with profiler.iteration("control"):
+            busy(0.01)
+    assert [p["name"] for p in profiler.store.list()] == ["control", "control"]
+    profiler.arm_loop("control", 1)
+    with pytest.raises(ValueError):
+        with profiler.iteration("control"):
+            raise ValueError("bad reading")
+    assert any("bad reading" in p["meta"].get("error", "") for p in profiler.store.list())
+    assert profiler.status()["loops"] == ["control"] and profiler.status()["loops_armed"] == {}
+
+
+@pytest.fixture
+def own_pid_file(profiler):
+    # Registered as whatever program this test process runs as.
+    with open(f"/proc/{os.getpid()}/cmdline", "rb") as f:
+        program = os.path.basename(f.read().split(b"\0")[0].decode())
+    previous = signal.getsignal(signal.SIGUSR1)
+    profiler.install_signal_handler()
+    with open(os.path.join(profiler.store.directory, PID_FILE), "w") as f:
+        f.write(f"{os.getpid()}\n{program}\n")
+    yield profiler
+    signal.signal(signal.SIGUSR1, previous)
+    profiler.remove_pid_file()
+
+
+def test_signal_controller_arms_loops(own_pid_file):
+    profiler = own_pid_file
+    assert profiler.signal_controller({"sampling": 3})
+    deadline = time.monotonic() + 5
+    while not profiler.status()["loops_armed"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert profiler.status()["loops_armed"] == {"sampling": 3}
+
+
+def test_signal_controller_refuses_stale_pids(own_pid_file):
+    profiler = own_pid_file
+    with open(os.path.join(profiler.store.directory, PID_FILE), "w") as f:
+        f.write(f"{os.getpid()}\nsome-other-program\n")
+    assert not profiler.signal_controller({"sampling": 3})
+    os.remove(os.path.join(profiler.store.directory, PID_FILE))
+    assert not profiler.signal_controller({"sampling": 3})
+    assert profiler.status()["loops_armed"] == {}
@@ -0,0 +1,56 @@
+# File: test_render_cache.py
+
+from flask import Flask
+
+from render_cache import RenderCache, file_version
+
+
+def test_file_version_changes_with_the_file(tmp_path):
+    path = tmp_path / "sensor_data.csv"
+    assert file_version(path) is None
+    path.write_text("timestamp,ph\n")
+    first = file_version(path)
+    with open(path, "a") as f:
+        f.write("2025-02-08 10:00:00,6.0\n")
+    assert file_version(path) != first
+
+
+def test_fragments_render_once_per_version():
+    cache = RenderCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return f"<p>{len(renders)}</p>"
+
+    assert cache.fragment("stats", (1, 10), render) == "<p>1</p>"
+    assert cache.fragment("stats", (1, 10), render) == "<p>1</p>"
+    assert cache.fragment("stats", (2, 12), render) == "<p>2</p>"
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.clear()
+    assert cache.fragment("stats", (2, 12), render) == "<p>3</p>"
+
+
+def test_pages_answer_304_while_versions_match():
+    cache = RenderCache()
+    renders = []
+    version = [(1, 10)]
+    app = Flask(__name__)
+
+    @app.route("/")
+    def index():
+        return cache.page("dashboard", tuple(version), lambda: renders.append(1) or "page")
+
+    client = app.test_client()
+    response = client.get("/")
+    assert response.status_code == 200 and response.data == b"page"
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+    # Without the validator the cached body is served, not re-rendered.
+    assert client.get("/").data == b"page"
+    assert len(renders) == 1
+    version[0] = (2, 12)
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert len(renders) == 2